@@ -0,0 +1,227 @@
+"""End-to-end benchmarks for `doc2map` on synthetic itineraries.
+
+A .docx itinerary is generated with a configurable number of days, cities, tables
+and links. Every stage of the pipeline is then timed, and its peak memory measured:
+parsing with both parsers, resolving the points (with short links redirected by a
+local stand-in server with configurable latency), categorizing them, and writing the
+map.
+
+    python -m benchmarks.pipeline --days 30 --output before.json
+    python -m benchmarks.pipeline --days 30 --compare before.json
+
+Results are stored as JSON along with the parameters and git commit they came from.
+"""
+
+import json
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+from typing import Annotated, Any
+
+import attrs
+import typer
+
+from support.docx_factory import Entry, Heading, Hyperlink, Table, write_document
+from support.redirect_server import RedirectServer
+from support.urls import PLACE_URL_COORDS
+from trip_planner.trip_planner import (
+    DocumentParser,
+    MapMaker,
+    categorize_point,
+    iter_document_links,
+)
+
+_NAMES = ["Castle", "Museum", "Station", "Park", "Shrine", "Market"]
+
+
+@attrs.frozen
+class Params:
+    days: int = 10
+    cities_per_day: int = 3
+    links_per_city: int = 10
+    table_rows: int = 5
+    short_link_ratio: float = 0.5
+    latency: float = 0.01
+
+
+def make_itinerary(params: Params) -> tuple[list[Entry], dict[str, str]]:
+    """Generate document entries, and the redirects for their short links."""
+    entries: list[Entry] = [Heading(1, "Bookings")]
+    redirects: dict[str, str] = {}
+    index = 0
+
+    def _link() -> Hyperlink:
+        nonlocal index
+        index += 1
+        name = f"{_NAMES[index % len(_NAMES)]} {index}"
+        place_url = PLACE_URL_COORDS[index % len(PLACE_URL_COORDS)][0]
+        # Spread the short links evenly through the document
+        if int(index * params.short_link_ratio) > int(
+            (index - 1) * params.short_link_ratio
+        ):
+            short_url = f"https://goo.gl/maps/{index:08x}"
+            redirects[short_url] = place_url
+            return Hyperlink(name, short_url)
+        return Hyperlink(name, place_url)
+
+    entries.append(_link())
+    for day in range(1, params.days + 1):
+        entries.append(Heading(1, f"Day {day}"))
+        for city in range(1, params.cities_per_day + 1):
+            entries.append(Heading(2, f"City {day}.{city}"))
+            entries.extend(_link() for _ in range(params.links_per_city))
+            if params.table_rows:
+                entries.append(
+                    Table([[_link(), _link()] for _ in range(params.table_rows)])
+                )
+    return entries, redirects
+
+
+_DEFAULTS = Params()
+
+
+@attrs.frozen
+class StageResult:
+    seconds: float
+    peak_bytes: int
+
+
+def measure(stage: Callable[[], Any]) -> StageResult:
+    """Time a stage, then run it again under tracemalloc for its peak memory.
+
+    Stages must be repeatable; they are run separately because tracing allocations
+    distorts the timings.
+    """
+    start = time.perf_counter()
+    stage()
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    try:
+        stage()
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return StageResult(seconds=seconds, peak_bytes=peak_bytes)
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(params: Params, workdir: Path) -> dict[str, Any]:
+    entries, redirects = make_itinerary(params)
+    document = write_document(workdir / "itinerary.docx", entries)
+    links = list(iter_document_links(document))
+
+    with RedirectServer(latency=params.latency) as server:
+        for short_url, place_url in redirects.items():
+            server.add(short_url, place_url)
+        cache_count = 0
+
+        def _cold_map_maker() -> MapMaker:
+            nonlocal cache_count
+            cache_count += 1
+            return MapMaker.with_cache(
+                workdir / f"cache-{cache_count}", transport=server.transport()
+            )
+
+        def _resolve_cold():
+            with _cold_map_maker() as map_maker:
+                return map_maker._features_from_links(links)
+
+        with _cold_map_maker() as warm_map_maker:
+            points = warm_map_maker._features_from_links(links)
+
+            stages = {
+                "parse_python_docx": lambda: list(
+                    iter_document_links(document, DocumentParser.PythonDocx)
+                ),
+                "parse_stream": lambda: list(
+                    iter_document_links(document, DocumentParser.Stream)
+                ),
+                "resolve_cold": _resolve_cold,
+                "resolve_warm": lambda: warm_map_maker._features_from_links(links),
+                "categorize": lambda: list(map(categorize_point, points)),
+                "write_kml": lambda: warm_map_maker._save_map(
+                    points, workdir / "map.kml"
+                ),
+                "write_kmz": lambda: warm_map_maker._save_map(
+                    points, workdir / "map.kmz"
+                ),
+            }
+            results = {name: measure(stage) for name, stage in stages.items()}
+
+    return {
+        "commit": _git_commit(),
+        "params": attrs.asdict(params),
+        "links": len(links),
+        "short_links": len(redirects),
+        "points": len(points),
+        "stages": {name: attrs.asdict(result) for name, result in results.items()},
+    }
+
+
+def _print_results(results: dict[str, Any], previous: dict[str, Any] | None) -> None:
+    typer.echo(f"{results['links']} links, {results['points']} points")
+    for name, stage in results["stages"].items():
+        line = (
+            f"{name:20} {stage['seconds'] * 1000:10.1f} ms"
+            f" {stage['peak_bytes'] / 2**20:10.2f} MiB"
+        )
+        if previous is not None and name in previous["stages"]:
+            before = previous["stages"][name]
+            line += (
+                f"  time {stage['seconds'] / before['seconds']:5.2f}x"
+                f"  memory {stage['peak_bytes'] / max(before['peak_bytes'], 1):5.2f}x"
+            )
+        typer.echo(line)
+
+
+def main(
+    days: Annotated[int, typer.Option()] = _DEFAULTS.days,
+    cities_per_day: Annotated[int, typer.Option()] = _DEFAULTS.cities_per_day,
+    links_per_city: Annotated[int, typer.Option()] = _DEFAULTS.links_per_city,
+    table_rows: Annotated[
+        int, typer.Option(help="Rows of links in the table of every city")
+    ] = _DEFAULTS.table_rows,
+    short_link_ratio: Annotated[
+        float, typer.Option(help="Fraction of links that are short goo.gl links")
+    ] = _DEFAULTS.short_link_ratio,
+    latency: Annotated[
+        float, typer.Option(help="Seconds the stand-in server waits per redirect")
+    ] = _DEFAULTS.latency,
+    output: Annotated[Path | None, typer.Option(help="Write results as JSON")] = None,
+    compare: Annotated[
+        Path | None, typer.Option(help="Compare against results of a previous run")
+    ] = None,
+):
+    params = Params(
+        days=days,
+        cities_per_day=cities_per_day,
+        links_per_city=links_per_city,
+        table_rows=table_rows,
+        short_link_ratio=short_link_ratio,
+        latency=latency,
+    )
+    with tempfile.TemporaryDirectory() as workdir:
+        results = run(params, Path(workdir))
+
+    previous = json.loads(compare.read_text()) if compare is not None else None
+    _print_results(results, previous)
+
+    if output is not None:
+        output.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -0,0 +1,167 @@
+"""Micro-benchmarks for URL classification and Maps data parsing.
+
+The URL corpus from the tests is scaled up synthetically, and each stage is timed
+against the previous implementation, which is kept here as a reference.
+
+    python -m benchmarks.url_parsing --scale 100 --output bench.json
+    python -m benchmarks.url_parsing --baseline bench.json
+
+With `--baseline`, the run fails if any stage got slower than the stored results by
+more than the allowed tolerance.
+"""
+
+import json
+import re
+import timeit
+from collections.abc import Callable
+from pathlib import Path
+from typing import Annotated
+
+import typer
+import urllib3
+
+from support.urls import PLACE_URL_COORDS
+from trip_planner.trip_planner import (
+    MapUrlKind,
+    classify_url,
+    coords_from_data,
+    get_coords_from_url,
+    get_data_from_url,
+)
+
+
+def _legacy_classify_url(url: str) -> MapUrlKind:
+    if re.match("https://goo.gl/maps/.*", url):
+        return MapUrlKind.Short
+    if re.match("https://www.google.com/maps/place/.*", url):
+        return MapUrlKind.Place
+    if re.match("https://www.google.com/maps/dir/.*", url):
+        return MapUrlKind.Directions
+    if re.match("https://www.google.com/maps/.*", url):
+        return MapUrlKind.Long
+    return MapUrlKind.Other
+
+
+def _legacy_get_data_from_url(url: str) -> str:
+    path = urllib3.util.parse_url(url).path
+    assert path is not None, "a path should always exist"
+    return path.rpartition("/")[-1]
+
+
+def _legacy_coords_from_data(data: str) -> tuple[float, float]:
+    tag_dict = {
+        match.group("tag"): match.group("value")
+        for match in re.finditer(r"!(?P<tag>\d[a-z])(?P<value>[^!]+)", data)
+    }
+    return float(tag_dict["3d"]), float(tag_dict["4d"])
+
+
+def make_corpus(scale: int) -> list[str]:
+    """Mix the real place URLs with short, directions and unrelated links."""
+    corpus = []
+    for i in range(scale):
+        for url, _ in PLACE_URL_COORDS:
+            corpus.append(url)
+        corpus.append(f"https://goo.gl/maps/{i:08x}")
+        corpus.append(
+            f"https://www.google.com/maps/dir/A/B/@35.5,137.5,14z/data=!4m2!{i}"
+        )
+        corpus.append(f"https://example.com/{i}")
+    return corpus
+
+
+def _time(function: Callable[[], object], repeat: int) -> float:
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+def run(scale: int, repeat: int) -> dict[str, dict[str, float]]:
+    corpus = make_corpus(scale)
+    urls = [url for url, _ in PLACE_URL_COORDS] * scale
+    data = list(map(get_data_from_url, urls))
+
+    assert [_legacy_classify_url(url) for url in corpus] == list(
+        map(classify_url, corpus)
+    )
+    assert [_legacy_coords_from_data(d) for d in data] == [
+        (coords.lat, coords.lon) for coords in map(coords_from_data, data)
+    ]
+
+    stages: dict[str, tuple[Callable[[], object], Callable[[], object]]] = {
+        "classify_url": (
+            lambda: [_legacy_classify_url(url) for url in corpus],
+            lambda: [classify_url(url) for url in corpus],
+        ),
+        "coords_from_data": (
+            lambda: [_legacy_coords_from_data(d) for d in data],
+            lambda: [coords_from_data(d) for d in data],
+        ),
+        "get_coords_from_url": (
+            lambda: [
+                _legacy_coords_from_data(_legacy_get_data_from_url(url)) for url in urls
+            ],
+            lambda: [get_coords_from_url(url) for url in urls],
+        ),
+    }
+
+    results = {}
+    for name, (legacy, current) in stages.items():
+        legacy_time = _time(legacy, repeat)
+        current_time = _time(current, repeat)
+        results[name] = {
+            "items": len(corpus) if name == "classify_url" else len(urls),
+            "legacy_seconds": legacy_time,
+            "seconds": current_time,
+            "speedup": legacy_time / current_time,
+        }
+    return results
+
+
+def find_regressions(
+    results: dict[str, dict[str, float]],
+    baseline: dict[str, dict[str, float]],
+    tolerance: float,
+) -> list[str]:
+    # Compare speedups rather than raw times, so that runs on different machines
+    # are still comparable.
+    return [
+        name
+        for name, result in results.items()
+        if name in baseline
+        and result["speedup"] < baseline[name]["speedup"] * (1 - tolerance)
+    ]
+
+
+def main(
+    scale: Annotated[
+        int, typer.Option(help="How many times to repeat the corpus")
+    ] = 100,
+    repeat: Annotated[int, typer.Option(help="Timing repetitions per stage")] = 5,
+    output: Annotated[Path | None, typer.Option(help="Write results as JSON")] = None,
+    baseline: Annotated[
+        Path | None, typer.Option(help="Fail on regressions against these results")
+    ] = None,
+    tolerance: Annotated[
+        float, typer.Option(help="Allowed relative slowdown against the baseline")
+    ] = 0.25,
+):
+    results = run(scale, repeat)
+    for name, result in results.items():
+        typer.echo(
+            f"{name:20} {result['seconds'] * 1e9 / result['items']:8.0f} ns/item"
+            f"  ({result['speedup']:.2f}x vs. legacy)"
+        )
+
+    if output is not None:
+        output.write_text(json.dumps(results, indent=2))
+
+    if baseline is not None:
+        regressions = find_regressions(
+            results, json.loads(baseline.read_text()), tolerance
+        )
+        if regressions:
+            typer.echo(f"Regressions: {', '.join(regressions)}", err=True)
+            raise typer.Exit(code=1)
+
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -1,7 +1,7 @@
 import nox
 from nox import Session
 
-SOURCE_LOCATIONS = ("src", "tests", "noxfile.py")
+SOURCE_LOCATIONS = ("src", "tests", "benchmarks", "support", "noxfile.py")
 
 nox.options.sessions = ["format", "lint", "test"]
 
@@ -24,3 +24,9 @@ def lint(session: Session) -> None:
 @nox.session(python=False)
 def test(session: Session) -> None:
     session.run("pytest", *session.posargs)
+
+
+@nox.session(python=False)
+def bench(session: Session) -> None:
+    session.run("python", "-m", "benchmarks.url_parsing")
+    session.run("python", "-m", "benchmarks.pipeline", *session.posargs)
@@ -0,0 +1,199 @@
+"""Sort points into categories, using rules from a TOML file.
+
+The keywords of all categories are compiled into one regular expression per scope
+(point names, headings), so the text of a point is scanned in a single pass rather
+than once per category. The expression still tries the keywords one by one at each
+position, so the cost does grow with the number of keywords. See `categories.toml`
+for the format and the default rules.
+"""
+
+import functools
+import importlib.resources
+import re
+import tomllib
+import typing
+from pathlib import Path
+
+import attrs
+
+from trip_planner.google_maps_helpers import get_icon_code
+from trip_planner.google_maps_icons import ICON_NUMBERS
+from trip_planner.headings import HeadingPath
+
+_COLOR = re.compile(r"[0-9a-fA-F]{6}")
+_MAX_CACHED_HEADINGS = 4096
+
+
+class CategoryError(ValueError):
+    pass
+
+
+@attrs.frozen
+class Category:
+    name: str
+    icon: str
+    color: str
+    priority: int = 0
+    name_keywords: tuple[str, ...] = attrs.field(default=(), converter=tuple)
+    heading_keywords: tuple[str, ...] = attrs.field(default=(), converter=tuple)
+
+    @property
+    def icon_code(self) -> str:
+        return get_icon_code(self.icon, self.color)
+
+
+def _compile(keywords: dict[str, Category]) -> re.Pattern[str] | None:
+    """Match the keywords at every position, preferring higher-priority ones.
+
+    The alternatives are in priority order inside a lookahead, so each match is
+    empty and reports the best keyword starting at that position, without hiding
+    keywords that overlap it.
+    """
+    if not keywords:
+        return None
+    alternatives = "|".join(f"({re.escape(keyword)})" for keyword in keywords)
+    return re.compile(f"(?=(?:{alternatives}))")
+
+
+def _best_match(pattern: re.Pattern[str] | None, text: str) -> int | None:
+    """The index of the best keyword in the text."""
+    if pattern is None:
+        return None
+    groups = [match.lastindex for match in pattern.finditer(text.lower())]
+    if not groups:
+        return None
+    return min(typing.cast(list[int], groups)) - 1
+
+
+@attrs.define
+class Categorizer:
+    default: Category
+    categories: tuple[Category, ...]
+    # The category of each keyword, in the order they are compiled in.
+    _name_categories: list[Category] = attrs.field(init=False)
+    _heading_categories: list[Category] = attrs.field(init=False)
+    _name_pattern: re.Pattern[str] | None = attrs.field(init=False)
+    _heading_pattern: re.Pattern[str] | None = attrs.field(init=False)
+    # Points share their headings with many others, so match each set once.
+    _heading_matches: dict[HeadingPath | tuple[str, ...], int | None] = attrs.field(
+        factory=dict, init=False
+    )
+
+    def __attrs_post_init__(self) -> None:
+        # `sorted` is stable, so equal priorities keep the order of the file.
+        by_priority = sorted(self.categories, key=lambda c: -c.priority)
+        name_keywords: dict[str, Category] = {}
+        heading_keywords: dict[str, Category] = {}
+        for category in by_priority:
+            for keyword in category.name_keywords:
+                name_keywords.setdefault(keyword.lower(), category)
+            for keyword in category.heading_keywords:
+                heading_keywords.setdefault(keyword.lower(), category)
+
+        self._name_categories = list(name_keywords.values())
+        self._heading_categories = list(heading_keywords.values())
+        self._name_pattern = _compile(name_keywords)
+        self._heading_pattern = _compile(heading_keywords)
+
+    def _match_headings(
+        self, headings: HeadingPath | tuple[str, ...]
+    ) -> Category | None:
+        try:
+            index = self._heading_matches[headings]
+        except KeyError:
+            if len(self._heading_matches) >= _MAX_CACHED_HEADINGS:
+                self._heading_matches.clear()
+            index = self._heading_matches[headings] = _best_match(
+                self._heading_pattern, "\n".join(headings)
+            )
+        return None if index is None else self._heading_categories[index]
+
+    def categorize(self, name: str, *headings: typing.Sequence[str]) -> Category:
+        """The category of a point with the name, under any of the heading paths."""
+        index = _best_match(self._name_pattern, name)
+        candidates = [
+            None if index is None else self._name_categories[index],
+            *(
+                self._match_headings(
+                    path if isinstance(path, HeadingPath) else tuple(path)
+                )
+                for path in headings
+            ),
+        ]
+        matches = [category for category in candidates if category is not None]
+        if not matches:
+            return self.default
+        return min(matches, key=lambda c: (-c.priority, self.categories.index(c)))
+
+
+# The type of every field of a category, and how to describe it.
+_FIELD_TYPES: dict[str, tuple[type, str]] = {
+    "name": (str, "a string"),
+    "icon": (str, "a string"),
+    "color": (str, "a string"),
+    "priority": (int, "an integer"),
+    "name_keywords": (list, "a list of strings"),
+    "heading_keywords": (list, "a list of strings"),
+}
+
+
+def _check_types(table: dict[str, typing.Any], where: str) -> None:
+    for field, value in table.items():
+        if field not in _FIELD_TYPES:
+            # Reported by `Category` itself.
+            continue
+        expected, description = _FIELD_TYPES[field]
+        valid = isinstance(value, expected) and not isinstance(value, bool)
+        if valid and expected is list:
+            valid = all(isinstance(item, str) for item in value)
+        if not valid:
+            raise CategoryError(
+                f"{where}: {field} must be {description}, got {value!r}"
+            )
+
+
+def _category(table: typing.Any, where: str) -> Category:
+    if not isinstance(table, dict):
+        raise CategoryError(f"{where} must be a table")
+    _check_types(table, where)
+    try:
+        category = Category(**table)
+    except TypeError as e:
+        raise CategoryError(f"{where}: {e}") from None
+    if category.icon not in ICON_NUMBERS:
+        raise CategoryError(f"{where}: unknown icon {category.icon!r}")
+    if not _COLOR.fullmatch(category.color):
+        raise CategoryError(f"{where}: color must be RGB hex, got {category.color!r}")
+    return category
+
+
+def loads(text: str) -> Categorizer:
+    try:
+        config = tomllib.loads(text)
+    except tomllib.TOMLDecodeError as e:
+        raise CategoryError(str(e)) from None
+
+    if "default" not in config:
+        raise CategoryError("missing the [default] category")
+    if not isinstance(config.get("category", []), list):
+        raise CategoryError("categories must be given as [[category]] tables")
+    return Categorizer(
+        default=_category(config["default"], "default"),
+        categories=tuple(
+            _category(table, f"category {i}")
+            for i, table in enumerate(config.get("category", []), 1)
+        ),
+    )
+
+
+def load(path: Path) -> Categorizer:
+    return loads(path.read_text(encoding="utf-8"))
+
+
+@functools.cache
+def default_categorizer() -> Categorizer:
+    return loads(
+        importlib.resources.files("trip_planner")
+        .joinpath("categories.toml")
+        .read_text(encoding="utf-8")
+    )
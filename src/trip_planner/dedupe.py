@@ -0,0 +1,72 @@
+"""Merge points that refer to the same place.
+
+The same place is often linked several times in a document, under different
+headings or with slightly different coordinates. Points within a radius of each
+other are merged into one, which stays under the headings of the point it takes
+its name from but is categorized by the headings of all of them.
+"""
+
+import enum
+import typing
+
+import attrs
+
+from trip_planner.geometry import GridIndex
+
+if typing.TYPE_CHECKING:
+    from trip_planner.trip_planner import Point
+
+
+class NamePolicy(enum.Enum):
+    First = "first"
+    Shortest = "shortest"
+    Longest = "longest"
+
+
+def _choose(cluster: list["Point"], policy: NamePolicy) -> "Point":
+    # `min` and `max` return the first of equal items, so ties go to the point that
+    # appears first in the document.
+    match policy:
+        case NamePolicy.First:
+            return cluster[0]
+        case NamePolicy.Shortest:
+            return min(cluster, key=lambda point: len(point.name))
+        case NamePolicy.Longest:
+            return max(cluster, key=lambda point: len(point.name))
+
+
+def merge_nearby_points(
+    points: typing.Iterable["Point"],
+    radius_m: float,
+    name_policy: NamePolicy = NamePolicy.First,
+) -> list["Point"]:
+    """Merge every point into the first earlier point within `radius_m` of it.
+
+    Clusters are built greedily in document order around their first point, so the
+    result is deterministic and points are never chained across long distances.
+    The merged point takes its name, coordinates and headings from the point chosen
+    by `name_policy`, and keeps the other distinct heading paths of the cluster to
+    be categorized by.
+    """
+    index: GridIndex[list[Point]] = GridIndex(radius_m)
+    clusters: list[list[Point]] = []
+    for point in points:
+        nearby = index.nearby(point.coords)
+        if nearby:
+            nearby[0].append(point)
+        else:
+            cluster = [point]
+            clusters.append(cluster)
+            index.add(point.coords, cluster)
+
+    merged = []
+    for cluster in clusters:
+        chosen = _choose(cluster, name_policy)
+        others = dict.fromkeys(
+            path
+            for point in cluster
+            for path in (point.headings, *point.merged_headings)
+            if path != chosen.headings
+        )
+        merged.append(attrs.evolve(chosen, merged_headings=list(others)))
+    return merged
@@ -0,0 +1,49 @@
+"""The readers of the documents links are taken from, by file type.
+
+Every reader takes the path of a document and yields its links in document order,
+each with the headings it is nested under. .docx files are read with the parser
+chosen on the command line instead, and are the default for unknown file types.
+"""
+
+import typing
+import xml.etree.ElementTree as ET
+import zipfile
+from pathlib import Path
+
+import docx.opc.exceptions
+
+from trip_planner import html_stream, markdown_stream, odt_stream
+from trip_planner.document_parser import Link
+
+DOCX_SUFFIX = ".docx"
+
+Reader = typing.Callable[[Path], typing.Iterator[Link]]
+
+READERS: dict[str, Reader] = {
+    ".md": markdown_stream.iter_links_with_headings,
+    ".markdown": markdown_stream.iter_links_with_headings,
+    ".html": html_stream.iter_links_with_headings,
+    ".htm": html_stream.iter_links_with_headings,
+    ".odt": odt_stream.iter_links_with_headings,
+}
+
+SUFFIXES = (DOCX_SUFFIX, *READERS)
+
+# What reading a document that is not valid raises, or one that is still being
+# written.
+INVALID_DOCUMENT_ERRORS = (
+    zipfile.BadZipFile,
+    docx.opc.exceptions.PackageNotFoundError,
+    KeyError,
+    ET.ParseError,
+    UnicodeDecodeError,
+)
+
+
+def reader_for(document: Path) -> Reader | None:
+    """The reader of the document, or None if it is to be read as a .docx."""
+    return READERS.get(document.suffix.lower())
+
+
+def is_supported(document: Path) -> bool:
+    return document.suffix.lower() in SUFFIXES
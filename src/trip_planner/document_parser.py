@@ -7,18 +7,20 @@ import docx.text
 import docx.text.hyperlink
 import docx.text.paragraph
 
+from trip_planner.headings import ROOT, HeadingPath, heading_path
+
 
 @attrs.frozen(kw_only=True)
 class Link:
     address: str
     text: str
-    headings: list[str]
+    headings: HeadingPath = attrs.field(converter=heading_path)
 
 
 @attrs.frozen(kw_only=True)
 class ContentWithHierarchy:
     content: typing.Any
-    headings: list[str]
+    headings: HeadingPath
 
 
 def _table_cell_paragraphs(table: docx.table.Table):
@@ -41,8 +43,7 @@ def _iter_all(d):
 def iter_content_with_headings(
     document: docx.document.Document,
 ) -> typing.Iterator[ContentWithHierarchy]:
-    headings: list[str] = []
-    levels: list[int] = []
+    headings = ROOT
 
     for content in _iter_all(document):
         match content:
@@ -51,13 +52,8 @@ def iter_content_with_headings(
             ) if style is not None:
                 if style.name.startswith("Heading"):
                     heading_level = int(style.name.split(" ")[-1])
-
-                    while levels and heading_level <= levels[-1]:
-                        levels.pop()
-                        headings.pop()
-                    levels.append(heading_level)
-                    headings.append(text)
-        yield ContentWithHierarchy(content=content, headings=headings.copy())
+                    headings = headings.enter(text, heading_level)
+        yield ContentWithHierarchy(content=content, headings=headings)
 
 
 def iter_links_with_headings(document: docx.document.Document) -> typing.Iterator[Link]:
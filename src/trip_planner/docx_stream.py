@@ -0,0 +1,193 @@
+"""Extract links from .docx files without building the python-docx object model.
+
+`word/document.xml` is streamed straight out of the zip with an incremental XML
+parser, so memory stays flat regardless of document size. The links produced match
+`document_parser.iter_links_with_headings`: only paragraphs in the body and in
+top-level tables are visited, and heading levels come from `Heading N` styles.
+
+The one known difference is merged table cells. python-docx repeats a merged cell
+once for every grid column it spans, producing duplicate links; here each cell is
+visited once.
+"""
+
+import typing
+import xml.etree.ElementTree as ET
+import zipfile
+from pathlib import Path
+
+import attrs
+import docx.styles
+
+from trip_planner.document_parser import Link
+from trip_planner.headings import ROOT, HeadingPath
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_R = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_RELS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+_DOCUMENT = _W + "document"
+_BODY = _W + "body"
+_TABLE = _W + "tbl"
+_ROW = _W + "tr"
+_CELL = _W + "tc"
+_PARAGRAPH = _W + "p"
+_PARAGRAPH_PROPERTIES = _W + "pPr"
+_PARAGRAPH_STYLE = _W + "pStyle"
+_RUN = _W + "r"
+_HYPERLINK = _W + "hyperlink"
+
+# The paths from the root to the paragraphs python-docx visits.
+_BODY_PARAGRAPH = (_DOCUMENT, _BODY, _PARAGRAPH)
+_CELL_PARAGRAPH = (_DOCUMENT, _BODY, _TABLE, _ROW, _CELL, _PARAGRAPH)
+_VISITED_PARAGRAPHS = {_BODY_PARAGRAPH, _CELL_PARAGRAPH}
+
+_FIXED_RUN_TEXT = {
+    _W + "tab": "\t",
+    _W + "ptab": "\t",
+    _W + "cr": "\n",
+    _W + "noBreakHyphen": "-",
+}
+
+DocxSource = str | Path | typing.IO[bytes]
+
+
+@attrs.define
+class _HyperlinkState:
+    address: str
+    text: list[str] = attrs.field(factory=list)
+
+
+@attrs.define
+class _ParagraphState:
+    style_id: str | None = None
+    text: list[str] = attrs.field(factory=list)
+    hyperlinks: list[_HyperlinkState] = attrs.field(factory=list)
+
+
+def _read_relationships(package: zipfile.ZipFile) -> dict[str, str]:
+    with package.open("word/_rels/document.xml.rels") as f:
+        return {
+            element.attrib["Id"]: element.attrib["Target"]
+            for _, element in ET.iterparse(f)
+            if element.tag == _RELS + "Relationship"
+        }
+
+
+def _read_style_names(package: zipfile.ZipFile) -> dict[str, str]:
+    """Map style IDs to the UI names python-docx reports (e.g. `Heading 1`)."""
+    if "word/styles.xml" not in package.namelist():
+        return {}
+
+    names = {}
+    with package.open("word/styles.xml") as f:
+        parents: list[ET.Element] = []
+        for event, element in ET.iterparse(f, events=("start", "end")):
+            if event == "start":
+                parents.append(element)
+                continue
+            parents.pop()
+            if element.tag != _W + "style":
+                continue
+            name = element.find(_W + "name")
+            if name is not None:
+                names[element.attrib[_W + "styleId"]] = (
+                    docx.styles.BabelFish.internal2ui(name.attrib[_W + "val"])
+                )
+            if parents:
+                parents[-1].remove(element)
+    return names
+
+
+def _heading_level(style_name: str | None) -> int | None:
+    if style_name is None or not style_name.startswith("Heading"):
+        return None
+    return int(style_name.split(" ")[-1])
+
+
+def _run_text(element: ET.Element) -> str:
+    if element.tag == _W + "t":
+        return element.text or ""
+    if element.tag == _W + "br":
+        return (
+            "\n" if element.get(_W + "type", "textWrapping") == "textWrapping" else ""
+        )
+    return _FIXED_RUN_TEXT.get(element.tag, "")
+
+
+def iter_links_with_headings(source: DocxSource) -> typing.Iterator[Link]:
+    with zipfile.ZipFile(source) as package:
+        relationships = _read_relationships(package)
+        style_names = _read_style_names(package)
+
+        headings = ROOT
+
+        path: list[str] = []
+        body: ET.Element | None = None
+        paragraph: _ParagraphState | None = None
+        # The length of `path` at the paragraph currently being collected.
+        paragraph_depth = 0
+
+        with package.open("word/document.xml") as f:
+            for event, element in ET.iterparse(f, events=("start", "end")):
+                if event == "start":
+                    path.append(element.tag)
+                    if tuple(path) == _BODY_PARAGRAPH[:2]:
+                        body = element
+                    if paragraph is None and tuple(path) in _VISITED_PARAGRAPHS:
+                        paragraph = _ParagraphState()
+                        paragraph_depth = len(path)
+                    elif (
+                        paragraph is not None
+                        and len(path) == paragraph_depth + 1
+                        and element.tag == _HYPERLINK
+                    ):
+                        r_id = element.get(_R + "id")
+                        paragraph.hyperlinks.append(
+                            _HyperlinkState(address=relationships[r_id] if r_id else "")
+                        )
+                    continue
+
+                depth = len(path)
+                if paragraph is not None:
+                    relative_path = tuple(path[paragraph_depth:])
+                    if not relative_path:
+                        headings = _paragraph_headings(paragraph, style_names, headings)
+                        yield from _paragraph_links(paragraph, headings)
+                        paragraph = None
+                    elif relative_path == (_PARAGRAPH_PROPERTIES, _PARAGRAPH_STYLE):
+                        paragraph.style_id = element.get(_W + "val")
+                    elif len(relative_path) == 2 and relative_path[0] == _RUN:
+                        paragraph.text.append(_run_text(element))
+                    elif len(relative_path) == 3 and relative_path[:2] == (
+                        _HYPERLINK,
+                        _RUN,
+                    ):
+                        text = _run_text(element)
+                        paragraph.text.append(text)
+                        paragraph.hyperlinks[-1].text.append(text)
+                path.pop()
+
+                if depth == len(_BODY_PARAGRAPH) and body is not None:
+                    # Drop finished top-level content so the tree never grows.
+                    body.remove(element)
+
+
+def _paragraph_headings(
+    paragraph: _ParagraphState, style_names: dict[str, str], headings: HeadingPath
+) -> HeadingPath:
+    """The headings of the paragraph's content, including itself if a heading."""
+    heading_level = _heading_level(style_names.get(paragraph.style_id or ""))
+    if heading_level is None:
+        return headings
+    return headings.enter("".join(paragraph.text), heading_level)
+
+
+def _paragraph_links(
+    paragraph: _ParagraphState, headings: HeadingPath
+) -> typing.Iterator[Link]:
+    for hyperlink in paragraph.hyperlinks:
+        yield Link(
+            address=hyperlink.address,
+            text="".join(hyperlink.text),
+            headings=headings,
+        )
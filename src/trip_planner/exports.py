@@ -0,0 +1,364 @@
+"""Write maps as GeoJSON, newline-delimited GeoJSON, or a compact columnar format.
+
+These carry only what a viewer needs: the name, coordinates, category and headings
+of every feature. GeoJSON is streamed one feature at a time.
+
+The columnar format stores each attribute as one typed array, so it can be loaded
+without parsing any per-feature text (e.g. as `Float64Array`/`Uint32Array` views of
+the file). All numbers are little-endian, and every array starts at an offset that
+is a multiple of 8. The file is laid out as:
+
+    header      magic b"TPCOL1\\0\\0", then u32 counts: points, lines, strings,
+                heading paths, heading path entries, line coordinates
+    strings     u32 offsets[strings + 1] into a UTF-8 blob, then the blob
+    headings    u32 offsets[heading paths + 1] into u32 string indices[entries]
+    points      f64 lon[points], f64 lat[points],
+                u32 name[points], u32 category[points], u32 headings[points]
+    lines       u32 name[lines], u32 category[lines], u32 headings[lines],
+                u32 coordinate offsets[lines + 1],
+                f64 coordinates[2 * line coordinates] as lon, lat pairs
+
+Names and categories are indices into the strings, headings into the heading paths,
+and each heading path is a list of string indices, outermost first.
+"""
+
+import array
+import contextlib
+import enum
+import itertools
+import json
+import struct
+import sys
+import typing
+from pathlib import Path
+
+import attrs
+
+from trip_planner.geometry import LonLat
+
+MAGIC = b"TPCOL1\0\0"
+_HEADER = struct.Struct("<8s6I")
+_ALIGNMENT = 8
+
+
+class OutputFormat(enum.Enum):
+    Kml = "kml"
+    GeoJson = "geojson"
+    NdJson = "ndjson"
+    Columnar = "columnar"
+
+    @property
+    def suffix(self) -> str:
+        return _SUFFIXES[self]
+
+
+_SUFFIXES = {
+    OutputFormat.Kml: ".kml",
+    OutputFormat.GeoJson: ".geojson",
+    OutputFormat.NdJson: ".ndjson",
+    OutputFormat.Columnar: ".tpcol",
+}
+
+
+def format_of(output: Path) -> OutputFormat:
+    """The format of an output file, by its suffix. KML (or KMZ) by default."""
+    suffix = output.suffix.lower()
+    for output_format, format_suffix in _SUFFIXES.items():
+        if suffix == format_suffix:
+            return output_format
+    return OutputFormat.Kml
+
+
+def output_paths(
+    output: Path, formats: typing.Iterable[OutputFormat] = ()
+) -> dict[OutputFormat, Path]:
+    """The files to write: `output` itself, and one per other format next to it."""
+    paths = {format_of(output): output}
+    for output_format in formats:
+        paths.setdefault(output_format, output.with_suffix(output_format.suffix))
+    return paths
+
+
+class Exporter(typing.Protocol):
+    def point(
+        self,
+        name: str,
+        lon: float,
+        lat: float,
+        category: str,
+        headings: typing.Sequence[str],
+    ) -> None: ...
+
+    def line(
+        self,
+        name: str,
+        coords: typing.Sequence[LonLat],
+        category: str,
+        headings: typing.Sequence[str],
+    ) -> None: ...
+
+
+class GeoJsonWriter:
+    """Writes a FeatureCollection, or one feature per line if `newline_delimited`."""
+
+    def __init__(self, stream: typing.TextIO, newline_delimited: bool = False):
+        self._stream = stream
+        self._newline_delimited = newline_delimited
+        self._count = 0
+
+    def start(self) -> None:
+        if not self._newline_delimited:
+            self._stream.write('{"type":"FeatureCollection","features":[\n')
+
+    def end(self) -> None:
+        if not self._newline_delimited:
+            self._stream.write("]}\n")
+
+    def _feature(
+        self,
+        geometry: dict[str, typing.Any],
+        name: str,
+        category: str,
+        headings: typing.Sequence[str],
+    ) -> None:
+        if self._count and not self._newline_delimited:
+            self._stream.write(",\n")
+        feature = {
+            "type": "Feature",
+            "geometry": geometry,
+            "properties": {
+                "name": name,
+                "category": category,
+                "headings": list(headings),
+            },
+        }
+        self._stream.write(
+            json.dumps(feature, ensure_ascii=False, separators=(",", ":"))
+        )
+        if self._newline_delimited:
+            self._stream.write("\n")
+        self._count += 1
+
+    def point(
+        self,
+        name: str,
+        lon: float,
+        lat: float,
+        category: str,
+        headings: typing.Sequence[str],
+    ) -> None:
+        self._feature(
+            {"type": "Point", "coordinates": [lon, lat]}, name, category, headings
+        )
+
+    def line(
+        self,
+        name: str,
+        coords: typing.Sequence[LonLat],
+        category: str,
+        headings: typing.Sequence[str],
+    ) -> None:
+        self._feature(
+            {
+                "type": "LineString",
+                "coordinates": [[point.lon, point.lat] for point in coords],
+            },
+            name,
+            category,
+            headings,
+        )
+
+
+def _u32() -> array.array:
+    return array.array("I")
+
+
+def _f64() -> array.array:
+    return array.array("d")
+
+
+@attrs.define
+class Columns:
+    """The columns of a map, as written to and read from the columnar format."""
+
+    strings: list[str] = attrs.field(factory=list)
+    heading_offsets: array.array = attrs.field(factory=lambda: array.array("I", [0]))
+    heading_strings: array.array = attrs.field(factory=_u32)
+    point_lon: array.array = attrs.field(factory=_f64)
+    point_lat: array.array = attrs.field(factory=_f64)
+    point_name: array.array = attrs.field(factory=_u32)
+    point_category: array.array = attrs.field(factory=_u32)
+    point_headings: array.array = attrs.field(factory=_u32)
+    line_name: array.array = attrs.field(factory=_u32)
+    line_category: array.array = attrs.field(factory=_u32)
+    line_headings: array.array = attrs.field(factory=_u32)
+    line_offsets: array.array = attrs.field(factory=lambda: array.array("I", [0]))
+    line_coords: array.array = attrs.field(factory=_f64)
+
+    def headings(self, index: int) -> list[str]:
+        start, end = self.heading_offsets[index], self.heading_offsets[index + 1]
+        return [self.strings[i] for i in self.heading_strings[start:end]]
+
+
+def _little_endian(values: array.array) -> bytes:
+    if sys.byteorder == "big":
+        values = array.array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+class ColumnarWriter:
+    """Collects features into columns, and writes them all at the end.
+
+    Strings and heading paths are stored once, however many features share them.
+    """
+
+    def __init__(self) -> None:
+        self.columns = Columns()
+        self._strings: dict[str, int] = {}
+        self._headings: dict[tuple[str, ...], int] = {}
+
+    def _string(self, text: str) -> int:
+        index = self._strings.get(text)
+        if index is None:
+            index = self._strings[text] = len(self.columns.strings)
+            self.columns.strings.append(text)
+        return index
+
+    def _heading_path(self, headings: typing.Sequence[str]) -> int:
+        key = tuple(headings)
+        index = self._headings.get(key)
+        if index is None:
+            index = self._headings[key] = len(self.columns.heading_offsets) - 1
+            self.columns.heading_strings.extend(map(self._string, key))
+            self.columns.heading_offsets.append(len(self.columns.heading_strings))
+        return index
+
+    def point(
+        self,
+        name: str,
+        lon: float,
+        lat: float,
+        category: str,
+        headings: typing.Sequence[str],
+    ) -> None:
+        columns = self.columns
+        columns.point_lon.append(lon)
+        columns.point_lat.append(lat)
+        columns.point_name.append(self._string(name))
+        columns.point_category.append(self._string(category))
+        columns.point_headings.append(self._heading_path(headings))
+
+    def line(
+        self,
+        name: str,
+        coords: typing.Sequence[LonLat],
+        category: str,
+        headings: typing.Sequence[str],
+    ) -> None:
+        columns = self.columns
+        columns.line_name.append(self._string(name))
+        columns.line_category.append(self._string(category))
+        columns.line_headings.append(self._heading_path(headings))
+        for point in coords:
+            columns.line_coords.extend((point.lon, point.lat))
+        columns.line_offsets.append(len(columns.line_coords) // 2)
+
+    def write(self, stream: typing.BinaryIO) -> None:
+        columns = self.columns
+        encoded = [text.encode() for text in columns.strings]
+        string_offsets = array.array("I", [0])
+        for text in encoded:
+            string_offsets.append(string_offsets[-1] + len(text))
+
+        sections = [
+            _HEADER.pack(
+                MAGIC,
+                len(columns.point_lon),
+                len(columns.line_name),
+                len(columns.strings),
+                len(columns.heading_offsets) - 1,
+                len(columns.heading_strings),
+                len(columns.line_coords) // 2,
+            ),
+            _little_endian(string_offsets),
+            b"".join(encoded),
+            _little_endian(columns.heading_offsets),
+            _little_endian(columns.heading_strings),
+            _little_endian(columns.point_lon),
+            _little_endian(columns.point_lat),
+            _little_endian(columns.point_name),
+            _little_endian(columns.point_category),
+            _little_endian(columns.point_headings),
+            _little_endian(columns.line_name),
+            _little_endian(columns.line_category),
+            _little_endian(columns.line_headings),
+            _little_endian(columns.line_offsets),
+            _little_endian(columns.line_coords),
+        ]
+        for section in sections:
+            stream.write(section)
+            stream.write(b"\0" * (-len(section) % _ALIGNMENT))
+
+
+def read_columnar(data: bytes) -> Columns:
+    magic, points, lines, strings, paths, entries, coords = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("not a columnar map")
+
+    position = _HEADER.size
+
+    def take(typecode: str, count: int) -> array.array:
+        nonlocal position
+        values = array.array(typecode)
+        size = values.itemsize * count
+        values.frombytes(data[position : position + size])
+        if sys.byteorder == "big":
+            values.byteswap()
+        position += size + (-size % _ALIGNMENT)
+        return values
+
+    string_offsets = take("I", strings + 1)
+    blob_start = position
+    position += string_offsets[-1] + (-string_offsets[-1] % _ALIGNMENT)
+    return Columns(
+        strings=[
+            data[blob_start + start : blob_start + end].decode()
+            for start, end in itertools.pairwise(string_offsets)
+        ],
+        heading_offsets=take("I", paths + 1),
+        heading_strings=take("I", entries),
+        point_lon=take("d", points),
+        point_lat=take("d", points),
+        point_name=take("I", points),
+        point_category=take("I", points),
+        point_headings=take("I", points),
+        line_name=take("I", lines),
+        line_category=take("I", lines),
+        line_headings=take("I", lines),
+        line_offsets=take("I", lines + 1),
+        line_coords=take("d", 2 * coords),
+    )
+
+
+@contextlib.contextmanager
+def open_exporter(
+    output: Path, output_format: OutputFormat
+) -> typing.Iterator[Exporter]:
+    """Open a non-KML output for writing."""
+    if output_format is OutputFormat.Columnar:
+        writer = ColumnarWriter()
+        yield writer
+        with output.open("wb") as f:
+            writer.write(f)
+        return
+
+    if output_format not in (OutputFormat.GeoJson, OutputFormat.NdJson):
+        raise ValueError(f"{output_format} is not written by an exporter")
+    with output.open("w", encoding="utf-8", newline="\n") as f:
+        geojson = GeoJsonWriter(
+            f, newline_delimited=output_format is OutputFormat.NdJson
+        )
+        geojson.start()
+        yield geojson
+        geojson.end()
@@ -0,0 +1,144 @@
+"""Small geometry helpers that work directly on longitude/latitude pairs."""
+
+import math
+import typing
+
+EARTH_RADIUS_M = 6_371_000.0
+
+
+class LonLat(typing.Protocol):
+    @property
+    def lon(self) -> float: ...
+
+    @property
+    def lat(self) -> float: ...
+
+
+_T = typing.TypeVar("_T", bound=LonLat)
+
+
+def distance_m(a: LonLat, b: LonLat) -> float:
+    """Great-circle distance in metres."""
+    lat_a, lat_b = math.radians(a.lat), math.radians(b.lat)
+    d_lat = lat_b - lat_a
+    d_lon = math.radians(b.lon - a.lon)
+    h = (
+        math.sin(d_lat / 2) ** 2
+        + math.cos(lat_a) * math.cos(lat_b) * math.sin(d_lon / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(h)))
+
+
+def _project(origin: LonLat, point: LonLat) -> tuple[float, float]:
+    """Project onto a local plane around `origin`, in metres.
+
+    The equirectangular approximation is accurate enough at the scale of a route.
+    """
+    x = math.radians(point.lon - origin.lon) * math.cos(math.radians(origin.lat))
+    y = math.radians(point.lat - origin.lat)
+    return x * EARTH_RADIUS_M, y * EARTH_RADIUS_M
+
+
+def _segment_distance_m(point: LonLat, start: LonLat, end: LonLat) -> float:
+    px, py = _project(start, point)
+    ex, ey = _project(start, end)
+    length_squared = ex * ex + ey * ey
+    if length_squared == 0:
+        return math.hypot(px, py)
+    t = max(0.0, min(1.0, (px * ex + py * ey) / length_squared))
+    return math.hypot(px - t * ex, py - t * ey)
+
+
+def simplify(coords: typing.Sequence[_T], tolerance_m: float) -> list[_T]:
+    """Simplify a line with the Ramer-Douglas-Peucker algorithm.
+
+    Points closer than `tolerance_m` to the simplified line are dropped. The first
+    and last points are always kept.
+    """
+    if tolerance_m <= 0 or len(coords) <= 2:
+        return list(coords)
+
+    keep = [False] * len(coords)
+    keep[0] = keep[-1] = True
+    # An explicit stack avoids hitting the recursion limit on very long routes.
+    stack = [(0, len(coords) - 1)]
+    while stack:
+        first, last = stack.pop()
+        farthest, max_distance = first, 0.0
+        for index in range(first + 1, last):
+            distance = _segment_distance_m(coords[index], coords[first], coords[last])
+            if distance > max_distance:
+                farthest, max_distance = index, distance
+        if max_distance > tolerance_m:
+            keep[farthest] = True
+            stack.append((first, farthest))
+            stack.append((farthest, last))
+
+    return [point for point, kept in zip(coords, keep) if kept]
+
+
+_Item = typing.TypeVar("_Item")
+# Keeps columns a finite width at the poles.
+_MIN_COS = 1e-9
+
+
+class GridIndex(typing.Generic[_Item]):
+    """A spatial hash for finding items within a fixed radius of a location.
+
+    Items are bucketed into rows `radius_m` high, and each row into columns about
+    `radius_m` wide at its latitude. A lookup checks the row of the location and
+    those next to it, over the columns spanning the radius at the highest latitude
+    it reaches, as degrees of longitude get shorter towards the poles.
+    """
+
+    def __init__(self, radius_m: float):
+        if radius_m <= 0:
+            raise ValueError(f"radius must be positive, got {radius_m}")
+        self._radius_m = radius_m
+        # The radius as an angle along a meridian.
+        self._radius = radius_m / EARTH_RADIUS_M
+        self._count = 0
+        self._cells: dict[tuple[int, int], list[tuple[int, LonLat, _Item]]] = {}
+
+    def _row(self, lat: float) -> int:
+        return math.floor(math.radians(lat) / self._radius)
+
+    def _column_width(self, row: int) -> float:
+        """The width of the columns of a row, in radians of longitude."""
+        lat = (row + 0.5) * self._radius
+        return self._radius / max(math.cos(lat), _MIN_COS)
+
+    def _cell(self, location: LonLat) -> tuple[int, int]:
+        row = self._row(location.lat)
+        return math.floor(math.radians(location.lon) / self._column_width(row)), row
+
+    def add(self, location: LonLat, item: _Item) -> None:
+        self._cells.setdefault(self._cell(location), []).append(
+            (self._count, location, item)
+        )
+        self._count += 1
+
+    def nearby(self, location: LonLat) -> list[_Item]:
+        """The items within the radius of `location`, in the order they were added."""
+        row = self._row(location.lat)
+        lon = math.radians(location.lon)
+        # No point within the radius is further from the equator than this, and
+        # none is further in longitude than `reach` there (from the haversine).
+        max_lat = min(abs(math.radians(location.lat)) + self._radius, math.pi / 2)
+        reach = 2 * math.asin(
+            min(1.0, self._radius / (2 * max(math.cos(max_lat), _MIN_COS)))
+        )
+
+        candidates: list[tuple[int, LonLat, _Item]] = []
+        for cell_y in (row - 1, row, row + 1):
+            width = self._column_width(cell_y)
+            first = math.floor((lon - reach) / width)
+            last = math.floor((lon + reach) / width)
+            for cell_x in range(first, last + 1):
+                candidates.extend(
+                    entry
+                    for entry in self._cells.get((cell_x, cell_y), ())
+                    if distance_m(location, entry[1]) <= self._radius_m
+                )
+        candidates.sort(key=lambda entry: entry[0])
+        return [item for _, _, item in candidates]
@@ -0,0 +1,98 @@
+"""The headings a piece of content is nested under.
+
+Documents have few distinct heading paths but many links under each, so paths are
+immutable and interned: every link under the same headings shares one
+`HeadingPath`, and a path shares its parent with its siblings. Paths nobody refers
+to any more are freed.
+"""
+
+import typing
+import weakref
+from collections.abc import Sequence
+
+
+class HeadingPath(Sequence[str]):
+    """An immutable sequence of heading titles, outermost first.
+
+    Paths compare equal to any other sequence of the same titles, so a plain list
+    can be used wherever one is expected. Use `heading_path` or `enter` to make
+    them, never the constructor.
+    """
+
+    __slots__ = ("__weakref__", "_children", "_hash", "_level", "_parent", "_titles")
+
+    def __init__(
+        self,
+        parent: "HeadingPath | None" = None,
+        title: str = "",
+        level: int = 0,
+    ):
+        self._parent = parent
+        self._level = level
+        self._titles: tuple[str, ...] = () if parent is None else (*parent, title)
+        self._hash = hash(self._titles)
+        self._children: weakref.WeakValueDictionary[tuple[str, int], HeadingPath] = (
+            weakref.WeakValueDictionary()
+        )
+
+    def _child(self, title: str, level: int) -> "HeadingPath":
+        key = (title, level)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = HeadingPath(self, title, level)
+        return child
+
+    def enter(self, title: str, level: int) -> "HeadingPath":
+        """The path after a heading of the given level, e.g. 2 for `Heading 2`.
+
+        The heading replaces the last one of the same or deeper level.
+        """
+        path = self
+        while path._parent is not None and path._level >= level:
+            path = path._parent
+        return path._child(title, level)
+
+    @typing.overload
+    def __getitem__(self, index: int) -> str: ...
+
+    @typing.overload
+    def __getitem__(self, index: slice) -> tuple[str, ...]: ...
+
+    def __getitem__(self, index: int | slice) -> str | tuple[str, ...]:
+        return self._titles[index]
+
+    def __len__(self) -> int:
+        return len(self._titles)
+
+    def __iter__(self) -> typing.Iterator[str]:
+        return iter(self._titles)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, HeadingPath):
+            return self is other or self._titles == other._titles
+        if isinstance(other, (list, tuple)):
+            return self._titles == tuple(other)
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __repr__(self) -> str:
+        return f"HeadingPath({list(self._titles)!r})"
+
+    def __reduce__(self):
+        # Intern the path again when unpickled.
+        return heading_path, (self._titles,)
+
+
+ROOT = HeadingPath()
+
+
+def heading_path(headings: typing.Iterable[str]) -> HeadingPath:
+    """The interned path of the given titles, nested one level each."""
+    if isinstance(headings, HeadingPath):
+        return headings
+    path = ROOT
+    for level, title in enumerate(headings, 1):
+        path = path._child(title, level)
+    return path
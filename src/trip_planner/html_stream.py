@@ -0,0 +1,125 @@
+"""Extract links from HTML files, such as documents exported from an editor.
+
+The file is fed to an incremental parser in chunks, so memory stays flat regardless
+of its size. `<h1>` to `<h6>` nest links like `Heading N` paragraphs in a .docx, and
+every `<a href>` outside scripts and styles is a link. Whitespace in text is
+collapsed as a browser would.
+"""
+
+import html.parser
+import typing
+from pathlib import Path
+
+import attrs
+
+from trip_planner.document_parser import Link
+from trip_planner.headings import ROOT
+
+_CHUNK_SIZE = 64 * 1024
+_HEADING_LEVELS = {f"h{level}": level for level in range(1, 7)}
+_IGNORED = {"script", "style", "template"}
+
+HtmlSource = str | Path
+
+
+def _collapse(text: list[str]) -> str:
+    return " ".join("".join(text).split())
+
+
+@attrs.define
+class _Anchor:
+    address: str
+    text: list[str] = attrs.field(factory=list)
+
+
+@attrs.define
+class _Heading:
+    level: int
+    text: list[str] = attrs.field(factory=list)
+    # Links in the heading, which belong under it once its title is known.
+    anchors: list[_Anchor] = attrs.field(factory=list)
+
+
+class _LinkParser(html.parser.HTMLParser):
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.headings = ROOT
+        self.links: list[Link] = []
+        self._heading: _Heading | None = None
+        self._anchor: _Anchor | None = None
+        self._ignored_depth = 0
+
+    def handle_starttag(
+        self, tag: str, attributes: list[tuple[str, str | None]]
+    ) -> None:
+        if tag in _IGNORED:
+            self._ignored_depth += 1
+        elif tag in _HEADING_LEVELS and self._heading is None:
+            self._end_anchor()
+            self._heading = _Heading(_HEADING_LEVELS[tag])
+        elif tag == "a":
+            self._end_anchor()
+            href = dict(attributes).get("href")
+            if href is not None:
+                self._anchor = _Anchor(href.strip())
+        elif tag == "br":
+            self.handle_data("\n")
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in _IGNORED:
+            self._ignored_depth = max(self._ignored_depth - 1, 0)
+        elif tag == "a":
+            self._end_anchor()
+        elif tag in _HEADING_LEVELS and self._heading is not None:
+            self._end_anchor()
+            heading, self._heading = self._heading, None
+            self.headings = self.headings.enter(_collapse(heading.text), heading.level)
+            self._add_links(heading.anchors)
+
+    def handle_data(self, data: str) -> None:
+        if self._ignored_depth:
+            return
+        if self._heading is not None:
+            self._heading.text.append(data)
+        if self._anchor is not None:
+            self._anchor.text.append(data)
+
+    def _end_anchor(self) -> None:
+        if self._anchor is None:
+            return
+        anchor, self._anchor = self._anchor, None
+        if self._heading is not None:
+            self._heading.anchors.append(anchor)
+        else:
+            self._add_links([anchor])
+
+    def _add_links(self, anchors: list[_Anchor]) -> None:
+        self.links.extend(
+            Link(
+                address=anchor.address,
+                text=_collapse(anchor.text),
+                headings=self.headings,
+            )
+            for anchor in anchors
+        )
+
+    def close(self) -> None:
+        super().close()
+        # End whatever the document left open.
+        self.handle_endtag("a")
+        if self._heading is not None:
+            self.handle_endtag(f"h{self._heading.level}")
+
+    def drain(self) -> list[Link]:
+        links, self.links = self.links, []
+        return links
+
+
+def iter_links_with_headings(source: HtmlSource) -> typing.Iterator[Link]:
+    parser = _LinkParser()
+    with open(source, encoding="utf-8-sig", errors="replace") as f:
+        while chunk := f.read(_CHUNK_SIZE):
+            parser.feed(chunk)
+            yield from parser.drain()
+    parser.close()
+    yield from parser.drain()
@@ -0,0 +1,54 @@
+"""Bookkeeping for incremental map rebuilds.
+
+A manifest is stored in the cache for every output. It records the hash of the
+document the output was built from, a hash of the options it was built with, and the
+feature each link resolved to, keyed by a hash of the link. A rebuild can then skip
+unchanged documents entirely, and only resolve the links that are new or were
+edited. Changing the options rebuilds everything.
+"""
+
+import hashlib
+import typing
+from pathlib import Path
+
+import attrs
+
+from trip_planner.document_parser import Link
+
+if typing.TYPE_CHECKING:
+    from trip_planner.trip_planner import Feature
+
+_CHUNK_SIZE = 1 << 16
+
+
+@attrs.frozen
+class Manifest:
+    document_hash: str | None = None
+    features: dict[str, "Feature | None"] = attrs.field(factory=dict)
+    options_hash: str | None = None
+
+
+def manifest_key(output: Path) -> tuple[str, str]:
+    # Versioned, as manifests of older builds lack the hash of their options.
+    return ("manifest-v2", str(output.resolve()))
+
+
+def hash_document(document: Path) -> str:
+    digest = hashlib.sha256()
+    with document.open("rb") as f:
+        while chunk := f.read(_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_link(link: Link) -> str:
+    digest = hashlib.sha256()
+    for part in (link.address, link.text, *link.headings):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def hash_options(*options: object) -> str:
+    """A hash of the options a map is built with, which must have stable reprs."""
+    return hashlib.sha256(repr(options).encode()).hexdigest()
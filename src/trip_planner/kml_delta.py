@@ -0,0 +1,173 @@
+"""Updates that bring a map a viewer already loaded up to date with a rebuild.
+
+Viewers polling a map through a network link download all of it again after every
+rebuild. Instead, they can poll a small document written next to it, whose
+`NetworkLinkControl` creates, changes and deletes only the placemarks that differ
+from the previous build, by their stable IDs.
+
+A snapshot of the placemarks of each build is kept in the cache to compare the next
+one against. Beyond a lookup per placemark, the work done and the size of the
+update are proportional to the number of changes.
+"""
+
+import typing
+from pathlib import Path
+
+import attrs
+
+from trip_planner import kml_writer
+from trip_planner.geometry import LonLat
+
+UPDATE_SUFFIX = ".update.kml"
+
+
+def update_path(output: Path) -> Path:
+    """The update of the map at `output`, next to it."""
+    return output.with_name(output.stem + UPDATE_SUFFIX)
+
+
+def write_empty_update(output: Path) -> None:
+    """Write an update of the map at `output` that changes nothing, next to it."""
+    with kml_writer.open_update(update_path(output), output.name):
+        pass
+
+
+def snapshot_key(output: Path) -> tuple[str, str]:
+    return ("kml-snapshot", str(output.resolve()))
+
+
+@attrs.frozen
+class Snapshot:
+    # The folder and style of every placemark, by ID.
+    placemarks: dict[str, tuple[str, str]] = attrs.field(factory=dict)
+    folders: frozenset[str] = frozenset()
+    styles: frozenset[str] = frozenset()
+
+
+@attrs.define
+class Delta:
+    """Collects the placemarks of a build, and how they changed since `previous`.
+
+    Without a previous build, viewers can only have loaded the map as it is now, so
+    the update is empty.
+    """
+
+    previous: Snapshot | None
+    _placemarks: dict[str, tuple[str, str]] = attrs.field(factory=dict, init=False)
+    # Folders in the order they are first used, as in the map.
+    _folders: dict[str, None] = attrs.field(factory=dict, init=False)
+    _icon_codes: set[str] = attrs.field(factory=set, init=False)
+    _line_styles: set[kml_writer.LineStyle] = attrs.field(factory=set, init=False)
+    _created: dict[str, kml_writer.FolderSpool] = attrs.field(factory=dict, init=False)
+    _changed: dict[str, str] = attrs.field(factory=dict, init=False)
+    # Placemarks that moved to another folder, and are deleted then created again.
+    _moved: list[str] = attrs.field(factory=list, init=False)
+
+    def _is_created(self, kml_id: str, folder: str, style: str) -> bool:
+        self._placemarks[kml_id] = (folder, style)
+        self._folders[folder] = None
+        if self.previous is None:
+            return False
+
+        before = self.previous.placemarks.get(kml_id)
+        if before is None:
+            return True
+        if before == (folder, style):
+            return False
+        if before[0] == folder:
+            self._changed[kml_id] = style
+            return False
+        self._moved.append(kml_id)
+        return True
+
+    def _spool(self, folder: str) -> kml_writer.FolderSpool:
+        if folder not in self._created:
+            self._created[folder] = kml_writer.FolderSpool(
+                depth=kml_writer.CREATED_CONTENT_DEPTH
+            )
+        return self._created[folder]
+
+    def placemark(
+        self, folder: str, name: str, lon: float, lat: float, icon_code: str
+    ) -> None:
+        self._icon_codes.add(icon_code)
+        style = kml_writer.style_map_id(icon_code)
+        kml_id = kml_writer.point_id(name, lon, lat)
+        if self._is_created(kml_id, folder, style):
+            self._spool(folder).writer.placemark(name, lon, lat, icon_code)
+
+    def line(
+        self,
+        folder: str,
+        name: str,
+        coords: typing.Sequence[LonLat],
+        style: kml_writer.LineStyle,
+    ) -> None:
+        self._line_styles.add(style)
+        kml_id = kml_writer.placemark_id(name, coords)
+        if self._is_created(kml_id, folder, kml_writer.line_style_id(style)):
+            self._spool(folder).writer.line(name, coords, style)
+
+    def snapshot(self) -> Snapshot:
+        return Snapshot(
+            placemarks=self._placemarks,
+            folders=frozenset(self._folders),
+            styles=frozenset(
+                [
+                    *map(kml_writer.style_map_id, self._icon_codes),
+                    *map(kml_writer.line_style_id, self._line_styles),
+                ]
+            ),
+        )
+
+    def write(self, output: Path, target_href: str) -> None:
+        """Write the update of the map at `target_href` to `output`."""
+        with kml_writer.open_update(output, target_href) as kml:
+            if self.previous is None:
+                return
+            previous = self.previous
+
+            deleted = sorted(previous.placemarks.keys() - self._placemarks.keys())
+            targets = [
+                *(("Placemark", kml_id) for kml_id in [*deleted, *self._moved]),
+                *(
+                    ("Folder", kml_writer.folder_id(folder))
+                    for folder in sorted(previous.folders - self._folders.keys())
+                ),
+            ]
+            if targets:
+                kml.delete(targets)
+
+            icon_codes = [
+                icon_code
+                for icon_code in self._icon_codes
+                if kml_writer.style_map_id(icon_code) not in previous.styles
+            ]
+            line_styles = [
+                style
+                for style in self._line_styles
+                if kml_writer.line_style_id(style) not in previous.styles
+            ]
+            new_folders = [
+                folder for folder in self._folders if folder not in previous.folders
+            ]
+            if icon_codes or line_styles or new_folders:
+                with kml.create_document(icon_codes, line_styles):
+                    for folder in new_folders:
+                        with kml.folder(folder):
+                            pass
+
+            for folder, spool in self._created.items():
+                kml.spooled_create(folder, spool)
+            for kml_id, style in self._changed.items():
+                kml.change_style(kml_id, style)
+
+    def close(self) -> None:
+        for spool in self._created.values():
+            spool.close()
+
+    def __enter__(self) -> typing.Self:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
@@ -0,0 +1,393 @@
+"""Write KML (and KMZ) documents incrementally.
+
+Unlike `simplekml`, nothing is kept in memory: styles are written when the document
+is opened, and folders and placemarks are written as soon as they are produced.
+Placemarks produced before the styles are known can be buffered in a `FolderSpool`,
+which spills to a temporary file once it grows large.
+
+Styles are rendered once per process by a `StyleRegistry`, and written sorted by ID,
+so the same map always produces the same bytes.
+
+The document, its folders and placemarks carry IDs derived from their names (and
+the coordinates of placemarks), so that a `NetworkLinkControl` update written with
+`open_update` can refer to them in a later build.
+"""
+
+import contextlib
+import hashlib
+import io
+import shutil
+import tempfile
+import typing
+import zipfile
+from pathlib import Path
+from xml.sax.saxutils import escape, quoteattr
+
+from trip_planner.geometry import LonLat
+from trip_planner.google_maps_helpers import ICON_HREF
+
+_INDENT = "  "
+# The indentation of the contents of the document, and of its folders.
+DOCUMENT_CONTENT_DEPTH = 2
+_FOLDER_CONTENT_DEPTH = 3
+# The indentation of the contents of a folder created by an update.
+CREATED_CONTENT_DEPTH = 5
+_ZIP_TIMESTAMP = (1980, 1, 1, 0, 0, 0)
+DEFAULT_SPOOL_MEMORY = 256 * 1024
+_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<kml xmlns="http://www.opengis.net/kml/2.2"'
+    ' xmlns:gx="http://www.google.com/kml/ext/2.2">\n'
+)
+DOCUMENT_ID = "map"
+
+
+class LineStyle(typing.NamedTuple):
+    # RRGGBB, as in Google Maps.
+    color: str
+    width: int
+
+
+def _kml_color(rrggbb: str) -> str:
+    """An opaque RRGGBB color as KML writes it, in aabbggrr order."""
+    return "ff" + rrggbb[4:6] + rrggbb[2:4] + rrggbb[0:2]
+
+
+def line_style_id(style: LineStyle) -> str:
+    """The ID Google Maps uses to pick the color and width of a line."""
+    return f"line-{style.color}-{style.width * 1000}"
+
+
+def style_id(icon_code: str) -> str:
+    """The ID of the style of a Google Maps icon-code.
+
+    Google Maps do weird hacks when loading KML files. Specifically, they use special
+    style IDs to determine the icon and color of a point, rather than the style
+    itself. You can get the code by using the inspector in your browser and checking
+    the `iconcode` attribute for the icon in maps.
+    """
+    return f"icon-{icon_code}"
+
+
+def style_map_id(icon_code: str) -> str:
+    return f"{style_id(icon_code)}-map"
+
+
+class _Point(typing.NamedTuple):
+    lon: float
+    lat: float
+
+
+def _digest(*parts: str) -> str:
+    return hashlib.blake2b("\0".join(parts).encode(), digest_size=8).hexdigest()
+
+
+def placemark_id(name: str, coords: typing.Iterable[LonLat]) -> str:
+    """An ID for a placemark that stays the same between builds of a map."""
+    return "placemark-" + _digest(
+        name, *(f"{point.lon},{point.lat}" for point in coords)
+    )
+
+
+def point_id(name: str, lon: float, lat: float) -> str:
+    return placemark_id(name, [_Point(lon, lat)])
+
+
+def folder_id(*path: str) -> str:
+    """The ID of a folder, from its name and those of the folders it is in."""
+    return "folder-" + _digest(*path)
+
+
+class KmlWriter:
+    def __init__(self, stream: typing.TextIO, depth: int = 0):
+        self._stream = stream
+        self._depth = depth
+        self._folders: list[str] = []
+
+    def _line(self, text: str) -> None:
+        self._stream.write(_INDENT * self._depth + text + "\n")
+
+    def _open(self, tag: str, attributes: str = "") -> None:
+        self._line(f"<{tag}{attributes}>")
+        self._depth += 1
+
+    def _close(self, tag: str) -> None:
+        self._depth -= 1
+        self._line(f"</{tag}>")
+
+    def _element(self, tag: str, text: str) -> None:
+        self._line(f"<{tag}>{escape(text)}</{tag}>")
+
+    def start(
+        self,
+        icon_codes: typing.Iterable[str],
+        line_styles: typing.Iterable[LineStyle] = (),
+        registry: "StyleRegistry | None" = None,
+    ) -> None:
+        self._stream.write(_HEADER)
+        self._depth = 1
+        self._open("Document", f" id={quoteattr(DOCUMENT_ID)}")
+        # Styles and stylemaps must reside at the top-level of the document for
+        # Google Maps to use them.
+        self._styles(icon_codes, line_styles, registry)
+
+    def end(self) -> None:
+        self._close("Document")
+        self._stream.write("</kml>\n")
+
+    def start_update(self, target_href: str) -> None:
+        """Start a document that updates the map at `target_href` in place."""
+        self._stream.write(_HEADER)
+        self._depth = 1
+        self._open("NetworkLinkControl")
+        self._open("Update")
+        self._element("targetHref", target_href)
+
+    def end_update(self) -> None:
+        self._close("Update")
+        self._close("NetworkLinkControl")
+        self._stream.write("</kml>\n")
+
+    def _styles(
+        self,
+        icon_codes: typing.Iterable[str],
+        line_styles: typing.Iterable[LineStyle],
+        registry: "StyleRegistry | None",
+    ) -> None:
+        registry = registry or DEFAULT_REGISTRY
+        for icon_code in sorted(set(icon_codes)):
+            self._stream.write(registry.icon_style(icon_code, self._depth))
+        for line_style in sorted(set(line_styles)):
+            self._stream.write(registry.line_style(line_style, self._depth))
+
+    def _write_style(self, icon_code: str) -> None:
+        normal = style_id(icon_code)
+        highlight = f"{normal}-highlight"
+
+        self._open("Style", f" id={quoteattr(normal)}")
+        self._open("IconStyle")
+        self._element("color", "ff" + icon_code.split("-")[1])
+        self._open("Icon")
+        self._element("href", ICON_HREF)
+        self._close("Icon")
+        self._close("IconStyle")
+        self._close("Style")
+        self._line(f"<Style id={quoteattr(highlight)}/>")
+
+        self._open("StyleMap", f" id={quoteattr(style_map_id(icon_code))}")
+        for key, url in (("normal", normal), ("highlight", highlight)):
+            self._open("Pair")
+            self._element("key", key)
+            self._element("styleUrl", f"#{url}")
+            self._close("Pair")
+        self._close("StyleMap")
+
+    def _write_line_style(self, style: LineStyle) -> None:
+        self._open("Style", f" id={quoteattr(line_style_id(style))}")
+        self._open("LineStyle")
+        self._element("color", _kml_color(style.color))
+        self._element("width", str(style.width))
+        self._close("LineStyle")
+        self._close("Style")
+
+    @contextlib.contextmanager
+    def folder(self, name: str) -> typing.Iterator[None]:
+        self._folders.append(name)
+        self._open("Folder", f" id={quoteattr(folder_id(*self._folders))}")
+        self._element("name", name)
+        yield
+        self._close("Folder")
+        self._folders.pop()
+
+    def spooled(self, spool: "FolderSpool") -> None:
+        """Write the placemarks in the spool, which must be as deep as here."""
+        assert self._depth == spool.depth, "spooled at another depth"
+        spool.copy_to(self._stream)
+
+    def spooled_folder(self, name: str, spool: "FolderSpool") -> None:
+        """Write a folder with the placemarks in the spool."""
+        with self.folder(name):
+            self.spooled(spool)
+
+    def network_link(self, name: str, href: str) -> None:
+        self._open("NetworkLink")
+        self._element("name", name)
+        self._open("Link")
+        self._element("href", href)
+        self._close("Link")
+        self._close("NetworkLink")
+
+    def placemark(self, name: str, lon: float, lat: float, icon_code: str) -> None:
+        self._open("Placemark", f" id={quoteattr(point_id(name, lon, lat))}")
+        self._element("name", name)
+        self._element("styleUrl", f"#{style_map_id(icon_code)}")
+        self._open("Point")
+        self._element("coordinates", f"{lon},{lat},0.0")
+        self._close("Point")
+        self._close("Placemark")
+
+    def line(
+        self, name: str, coords: typing.Sequence[LonLat], style: LineStyle
+    ) -> None:
+        self._open("Placemark", f" id={quoteattr(placemark_id(name, coords))}")
+        self._element("name", name)
+        self._element("styleUrl", f"#{line_style_id(style)}")
+        self._open("LineString")
+        self._element("tessellate", "1")
+        self._element(
+            "coordinates", " ".join(f"{point.lon},{point.lat},0.0" for point in coords)
+        )
+        self._close("LineString")
+        self._close("Placemark")
+
+    @contextlib.contextmanager
+    def create(self, tag: str, target_id: str) -> typing.Iterator[None]:
+        """Add what is written inside to the element of the map with the ID."""
+        self._open("Create")
+        self._open(tag, f" targetId={quoteattr(target_id)}")
+        yield
+        self._close(tag)
+        self._close("Create")
+
+    @contextlib.contextmanager
+    def create_document(
+        self,
+        icon_codes: typing.Iterable[str],
+        line_styles: typing.Iterable[LineStyle] = (),
+        registry: "StyleRegistry | None" = None,
+    ) -> typing.Iterator[None]:
+        """Add the styles, and what is written inside, to the top of the map."""
+        with self.create("Document", DOCUMENT_ID):
+            self._styles(icon_codes, line_styles, registry)
+            yield
+
+    def spooled_create(self, folder: str, spool: "FolderSpool") -> None:
+        """Add the placemarks in the spool to a folder of the map."""
+        with self.create("Folder", folder_id(folder)):
+            self.spooled(spool)
+
+    def delete(self, targets: typing.Iterable[tuple[str, str]]) -> None:
+        """Remove elements from the map, given as (tag, ID) pairs."""
+        self._open("Delete")
+        for tag, target_id in targets:
+            self._line(f"<{tag} targetId={quoteattr(target_id)}/>")
+        self._close("Delete")
+
+    def change_style(self, target_id: str, style_url: str) -> None:
+        self._open("Change")
+        self._open("Placemark", f" targetId={quoteattr(target_id)}")
+        self._element("styleUrl", f"#{style_url}")
+        self._close("Placemark")
+        self._close("Change")
+
+
+class StyleRegistry:
+    """Renders the XML of each style once, for any number of documents.
+
+    Styles are rendered once for each depth they are written at: at the top of a map,
+    or in the document created by an update.
+    """
+
+    def __init__(self) -> None:
+        self._icon_styles: dict[tuple[str, int], str] = {}
+        self._line_styles: dict[tuple[LineStyle, int], str] = {}
+
+    @staticmethod
+    def _render(write: typing.Callable[[KmlWriter], None], depth: int) -> str:
+        stream = io.StringIO()
+        write(KmlWriter(stream, depth=depth))
+        return stream.getvalue()
+
+    def icon_style(self, icon_code: str, depth: int = DOCUMENT_CONTENT_DEPTH) -> str:
+        """The style, highlight style and stylemap of an icon."""
+        try:
+            return self._icon_styles[icon_code, depth]
+        except KeyError:
+            rendered = self._icon_styles[icon_code, depth] = self._render(
+                lambda writer: writer._write_style(icon_code), depth
+            )
+            return rendered
+
+    def line_style(self, style: LineStyle, depth: int = DOCUMENT_CONTENT_DEPTH) -> str:
+        try:
+            return self._line_styles[style, depth]
+        except KeyError:
+            rendered = self._line_styles[style, depth] = self._render(
+                lambda writer: writer._write_line_style(style), depth
+            )
+            return rendered
+
+
+DEFAULT_REGISTRY = StyleRegistry()
+
+
+class FolderSpool:
+    """Placemarks for a folder, kept until they can be written to the document.
+
+    Up to `max_memory` characters are kept in memory, the rest in a temporary file.
+    """
+
+    def __init__(
+        self, max_memory: int = DEFAULT_SPOOL_MEMORY, depth: int = _FOLDER_CONTENT_DEPTH
+    ):
+        # The file lives as long as the spool, and is closed by `close`, which the
+        # owners of spools call when they are closed themselves.
+        self._file = tempfile.SpooledTemporaryFile(  # noqa: SIM115
+            max_size=max_memory, mode="w+", encoding="utf-8", newline="\n"
+        )
+        self.depth = depth
+        self.writer = KmlWriter(typing.cast(typing.TextIO, self._file), depth=depth)
+
+    def copy_to(self, stream: typing.TextIO) -> None:
+        self._file.seek(0)
+        shutil.copyfileobj(self._file, stream)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def is_kmz(output: Path) -> bool:
+    return output.suffix.lower() == ".kmz"
+
+
+@contextlib.contextmanager
+def open_map(
+    output: Path,
+    icon_codes: typing.Iterable[str],
+    line_styles: typing.Iterable[LineStyle] = (),
+    registry: StyleRegistry | None = None,
+) -> typing.Iterator[KmlWriter]:
+    """Open a KML file for writing, or a compressed KMZ if `output` ends with .kmz
+
+    Each style is written once, however often it is given.
+    """
+    with contextlib.ExitStack() as stack:
+        binary: typing.IO[bytes]
+        if is_kmz(output):
+            archive = stack.enter_context(
+                zipfile.ZipFile(output, "w", compression=zipfile.ZIP_DEFLATED)
+            )
+            # A fixed timestamp keeps the archive byte-stable between builds.
+            entry = zipfile.ZipInfo("doc.kml", date_time=_ZIP_TIMESTAMP)
+            entry.compress_type = zipfile.ZIP_DEFLATED
+            binary = stack.enter_context(archive.open(entry, "w"))
+        else:
+            binary = stack.enter_context(output.open("wb"))
+        stream = stack.enter_context(
+            io.TextIOWrapper(binary, encoding="utf-8", newline="\n")
+        )
+
+        writer = KmlWriter(stream)
+        writer.start(icon_codes, line_styles, registry)
+        yield writer
+        writer.end()
+
+
+@contextlib.contextmanager
+def open_update(output: Path, target_href: str) -> typing.Iterator[KmlWriter]:
+    """Open a `NetworkLinkControl` document updating the map at `target_href`."""
+    with output.open("w", encoding="utf-8", newline="\n") as stream:
+        writer = KmlWriter(stream)
+        writer.start_update(target_href)
+        yield writer
+        writer.end_update()
@@ -0,0 +1,224 @@
+"""Split a map into several layers, each written to its own file.
+
+Google My Maps limits the number of features in each imported layer, so large maps
+can be split by their top-level heading, by category, and into parts of at most a
+given number of features. Every layer file carries the styles its own placemarks
+use, and an index file links to all of them.
+
+Within a layer, placemarks go in a folder per category, or in folders nested like
+the headings of the document (e.g. Day 3 > Kyoto) so that viewers can show them a
+part of the trip at a time. The category of a placemark then only shows in its
+style.
+"""
+
+import collections
+import concurrent.futures
+import enum
+import re
+import typing
+from pathlib import Path
+
+import attrs
+
+from trip_planner import kml_writer
+from trip_planner.geometry import LonLat
+
+# The name of the layer of features without any heading, when splitting by heading.
+NO_HEADING = "Other"
+
+
+class SplitBy(enum.Enum):
+    Nothing = "none"
+    Heading = "heading"
+    Category = "category"
+
+
+class FolderBy(enum.Enum):
+    Category = "category"
+    Heading = "heading"
+
+
+@attrs.define
+class _Folder:
+    """A node of the tree of folders of a layer, with the placemarks right in it."""
+
+    depth: int
+    children: dict[str, "_Folder"] = attrs.field(factory=dict)
+    _spool: kml_writer.FolderSpool | None = None
+
+    def descend(self, path: typing.Iterable[str]) -> "_Folder":
+        """The folder at the path below this one, made on first use."""
+        folder = self
+        for name in path:
+            if name not in folder.children:
+                folder.children[name] = _Folder(folder.depth + 1)
+            folder = folder.children[name]
+        return folder
+
+    @property
+    def writer(self) -> kml_writer.KmlWriter:
+        if self._spool is None:
+            self._spool = kml_writer.FolderSpool(depth=self.depth)
+        return self._spool.writer
+
+    def write(self, kml: kml_writer.KmlWriter) -> None:
+        """Write the placemarks of the folder, then the folders in it."""
+        if self._spool is not None:
+            kml.spooled(self._spool)
+        for name, child in self.children.items():
+            with kml.folder(name):
+                child.write(kml)
+
+    def close(self) -> None:
+        if self._spool is not None:
+            self._spool.close()
+        for child in self.children.values():
+            child.close()
+
+
+@attrs.define
+class Layer:
+    name: str
+    routes_folder: str
+    folder_by: FolderBy = FolderBy.Category
+    size: int = 0
+    _folders: _Folder = attrs.field(
+        factory=lambda: _Folder(kml_writer.DOCUMENT_CONTENT_DEPTH), init=False
+    )
+    _routes: _Folder = attrs.field(
+        factory=lambda: _Folder(kml_writer.DOCUMENT_CONTENT_DEPTH), init=False
+    )
+    _icon_codes: set[str] = attrs.field(factory=set, init=False)
+    _line_styles: set[kml_writer.LineStyle] = attrs.field(factory=set, init=False)
+
+    def placemark(
+        self,
+        folder: str,
+        name: str,
+        lon: float,
+        lat: float,
+        icon_code: str,
+        headings: typing.Sequence[str] = (),
+    ) -> None:
+        """Add a placemark to the folder of its category, or of its headings."""
+        path = headings if self.folder_by is FolderBy.Heading else [folder]
+        self._folders.descend(path).writer.placemark(name, lon, lat, icon_code)
+        self._icon_codes.add(icon_code)
+
+    def line(
+        self,
+        name: str,
+        coords: tuple[LonLat, ...],
+        style: kml_writer.LineStyle,
+        headings: typing.Sequence[str] = (),
+    ) -> None:
+        """Add a line to the routes folder, or to the folder of its headings."""
+        if self.folder_by is FolderBy.Heading:
+            folder = self._folders.descend(headings)
+        else:
+            folder = self._routes.descend([self.routes_folder])
+        folder.writer.line(name, coords, style)
+        self._line_styles.add(style)
+
+    def write(self, output: Path) -> None:
+        """Write the layer as a map, with its routes after all other folders."""
+        with kml_writer.open_map(output, self._icon_codes, self._line_styles) as kml:
+            self._folders.write(kml)
+            self._routes.write(kml)
+
+    def close(self) -> None:
+        self._folders.close()
+        self._routes.close()
+
+
+@attrs.define
+class Splitter:
+    """Assigns features to layers, in the order the layers are first needed."""
+
+    split_by: SplitBy = SplitBy.Nothing
+    max_features: int | None = None
+    routes_folder: str = "Routes"
+    folder_by: FolderBy = FolderBy.Category
+    layers: dict[str, Layer] = attrs.field(factory=dict, init=False)
+    _counts: collections.Counter[str] = attrs.field(
+        factory=collections.Counter, init=False
+    )
+
+    @property
+    def splits(self) -> bool:
+        return self.split_by is not SplitBy.Nothing or self.max_features is not None
+
+    def layer(self, headings: typing.Sequence[str], category: str) -> Layer:
+        """The layer for the next feature with the given headings and category."""
+        match self.split_by:
+            case SplitBy.Nothing:
+                base = ""
+            case SplitBy.Heading:
+                base = headings[0] if headings else NO_HEADING
+            case SplitBy.Category:
+                base = category
+
+        part = 0
+        if self.max_features is not None:
+            part = self._counts[base] // self.max_features
+        self._counts[base] += 1
+
+        if not base:
+            name = f"Part {part + 1}" if self.max_features is not None else ""
+        else:
+            name = base if part == 0 else f"{base} ({part + 1})"
+        if name not in self.layers:
+            self.layers[name] = Layer(name, self.routes_folder, self.folder_by)
+        layer = self.layers[name]
+        layer.size += 1
+        return layer
+
+    def close(self) -> None:
+        for layer in self.layers.values():
+            layer.close()
+
+    def __enter__(self) -> typing.Self:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def _slug(name: str) -> str:
+    return re.sub(r"\W+", "-", name.lower()).strip("-") or "layer"
+
+
+def layer_path(output: Path, index: int, name: str) -> Path:
+    """The file of a layer, next to the index at `output`."""
+    return output.with_name(f"{output.stem}-{index:02d}-{_slug(name)}{output.suffix}")
+
+
+def write_layers(
+    output: Path, splitter: Splitter, jobs: int | None = None
+) -> list[Path]:
+    """Write every layer, in parallel, and an index of them to `output`.
+
+    Without splitting, the single layer is written to `output` itself. Returns the
+    layer files.
+    """
+    if not splitter.splits:
+        layer = splitter.layers.get("") or Layer(
+            "", splitter.routes_folder, splitter.folder_by
+        )
+        layer.write(output)
+        return [output]
+
+    paths = {
+        layer_path(output, index, name): layer
+        for index, (name, layer) in enumerate(splitter.layers.items(), 1)
+    }
+    with concurrent.futures.ThreadPoolExecutor(jobs) as executor:
+        for future in [
+            executor.submit(layer.write, path) for path, layer in paths.items()
+        ]:
+            future.result()
+
+    with kml_writer.open_map(output, []) as kml:
+        for path, layer in paths.items():
+            kml.network_link(layer.name, path.name)
+    return list(paths)
@@ -0,0 +1,214 @@
+"""A persistent index of the map links seen in documents.
+
+The index is a SQLite database in the cache directory, with two tables:
+
+- `resolutions` maps a short link to the long URL it redirects to, or to the reason
+  it could not be resolved, until an optional expiry time.
+- `locations` maps a long URL to what it shows, so that it is only parsed once: its
+  kind, and its coordinates (one pair for a place, the waypoints of directions).
+
+All the links of a window of a document are looked up with a single statement,
+which follows short links through to their locations, and whatever is learned about
+them is stored in a single transaction.
+
+Each thread has a connection of its own. The database is in WAL mode, so threads
+read concurrently, and only writes wait for each other.
+"""
+
+import contextlib
+import json
+import sqlite3
+import threading
+import time
+import typing
+import weakref
+from pathlib import Path
+
+import attrs
+
+FILENAME = "links.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS resolutions (
+    url TEXT PRIMARY KEY,
+    target TEXT,
+    failure TEXT,
+    expires_at REAL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS locations (
+    url TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    coords TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+_LOOKUP = """
+SELECT requested.value, resolution.target, resolution.failure,
+       location.kind, location.coords
+FROM json_each(?) AS requested
+LEFT JOIN resolutions AS resolution
+    ON resolution.url = requested.value
+    AND (resolution.expires_at IS NULL OR resolution.expires_at > ?)
+LEFT JOIN locations AS location
+    ON location.url = COALESCE(resolution.target, requested.value)
+"""
+
+
+@attrs.frozen
+class Failure:
+    """A cached failure to resolve a link."""
+
+    reason: str
+
+
+Entry = str | Failure
+
+
+@attrs.frozen
+class Location:
+    """What a long map URL shows: its kind, and coordinates as (lon, lat) pairs."""
+
+    kind: str
+    coords: tuple[tuple[float, float], ...] = ()
+
+
+@attrs.frozen
+class Indexed:
+    """What is known about a link: how it resolved, and where it points."""
+
+    entry: Entry | None = None
+    location: Location | None = None
+
+
+def _location(kind: str, coords: str) -> Location:
+    return Location(kind, tuple((lon, lat) for lon, lat in json.loads(coords)))
+
+
+class _Connection(sqlite3.Connection):
+    """A connection that can be weakly referenced, unlike the base class."""
+
+
+class LinkIndex:
+    """The index database. It can be shared between threads and processes."""
+
+    def __init__(
+        self, path: Path, clock: typing.Callable[[], float] = time.time
+    ) -> None:
+        self._path = path
+        self._clock = clock
+        self._write_lock = threading.Lock()
+        self._local = threading.local()
+        # The connection of a thread is closed once the thread ends, or by `close`.
+        self._connections: weakref.WeakSet[_Connection] = weakref.WeakSet()
+        self._connections_lock = threading.Lock()
+
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection: _Connection | None = getattr(self._local, "connection", None)
+        if connection is None:
+            # Connections may be closed by another thread than their own.
+            connection = sqlite3.connect(
+                self._path,
+                timeout=60,
+                isolation_level=None,
+                check_same_thread=False,
+                factory=_Connection,
+            )
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.add(connection)
+        return connection
+
+    @contextlib.contextmanager
+    def _transaction(self) -> typing.Iterator[sqlite3.Connection]:
+        connection = self._connection()
+        with self._write_lock:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+    def lookup(self, urls: typing.Iterable[str]) -> dict[str, Indexed]:
+        """Everything known about the links, leaving out those nothing is known of.
+
+        Expired resolutions are ignored.
+        """
+        urls = list(dict.fromkeys(urls))
+        if not urls:
+            return {}
+        rows = (
+            self._connection()
+            .execute(_LOOKUP, (json.dumps(urls), self._clock()))
+            .fetchall()
+        )
+
+        indexed = {}
+        for url, target, failure, kind, coords in rows:
+            entry = Failure(failure) if failure is not None else target
+            location = _location(kind, coords) if kind is not None else None
+            if entry is not None or location is not None:
+                indexed[url] = Indexed(entry, location)
+        return indexed
+
+    def store_resolutions(
+        self, entries: typing.Mapping[str, tuple[Entry, float | None]]
+    ) -> None:
+        """Store how links resolved, each kept for the given seconds or forever."""
+        if not entries:
+            return
+        now = self._clock()
+        rows = [
+            (
+                url,
+                None if isinstance(entry, Failure) else entry,
+                entry.reason if isinstance(entry, Failure) else None,
+                None if expire is None else now + expire,
+            )
+            for url, (entry, expire) in entries.items()
+        ]
+        with self._transaction() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO resolutions VALUES (?, ?, ?, ?)", rows
+            )
+
+    def store_locations(self, locations: typing.Mapping[str, Location]) -> None:
+        if not locations:
+            return
+        rows = [
+            (url, location.kind, json.dumps(location.coords))
+            for url, location in locations.items()
+        ]
+        with self._transaction() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO locations VALUES (?, ?, ?)", rows
+            )
+
+    def get_meta(self, key: str) -> str | None:
+        row = (
+            self._connection()
+            .execute("SELECT value FROM meta WHERE key = ?", (key,))
+            .fetchone()
+        )
+        return None if row is None else row[0]
+
+    def set_meta(self, key: str, value: str) -> None:
+        with self._transaction() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value)
+            )
+
+    def close(self) -> None:
+        with self._connections_lock:
+            for connection in list(self._connections):
+                connection.close()
@@ -0,0 +1,321 @@
+import asyncio
+import random
+import threading
+import time
+import typing
+from collections.abc import Callable, Iterable
+
+import attrs
+import httpx
+
+DEFAULT_CONCURRENCY = 16
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+DEFAULT_MAX_BACKOFF = 30.0
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_COOLDOWN = 30.0
+
+# Responses worth retrying: the shortener is throttling us or briefly unavailable.
+_TRANSIENT_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+
+class ResolutionError(Exception):
+    pass
+
+
+class TransientError(ResolutionError):
+    """The link may well resolve if tried again later."""
+
+
+class CircuitOpenError(TransientError):
+    """The link was not tried, because too many requests failed just before."""
+
+
+@attrs.define
+class RateLimiter:
+    """Spaces requests evenly, at most `rate` per second across all threads."""
+
+    rate: float
+    clock: Callable[[], float] = time.monotonic
+    _next: float = attrs.field(default=0.0, init=False)
+    _lock: threading.Lock = attrs.field(factory=threading.Lock, init=False)
+
+    def reserve(self) -> float:
+        """Take the next free slot, returning the seconds to wait until it."""
+        with self._lock:
+            now = self.clock()
+            start = max(now, self._next)
+            self._next = start + 1 / self.rate
+            return start - now
+
+
+@attrs.frozen
+class Retry:
+    """How often to retry transient failures, with exponential backoff.
+
+    Each delay is drawn uniformly up to the backoff ("full jitter"), so that many
+    links failing together do not retry together.
+    """
+
+    retries: int = DEFAULT_RETRIES
+    backoff: float = DEFAULT_BACKOFF
+    max_backoff: float = DEFAULT_MAX_BACKOFF
+
+    def delay(
+        self,
+        attempt: int,
+        retry_after: float | None = None,
+        jitter: Callable[[], float] = random.random,
+    ) -> float:
+        """Seconds to wait before retrying after the given (0-based) attempt."""
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+        return jitter() * min(self.max_backoff, self.backoff * 2**attempt)
+
+
+@attrs.define
+class CircuitBreaker:
+    """Stops sending requests after `threshold` transient failures in a row.
+
+    Once open, every request fails straight away until `cooldown` seconds have
+    passed. Then a single request is let through: the circuit closes again if it
+    succeeds, and stays open for another cooldown if not.
+    """
+
+    threshold: int = DEFAULT_FAILURE_THRESHOLD
+    cooldown: float = DEFAULT_COOLDOWN
+    clock: Callable[[], float] = time.monotonic
+    _failures: int = attrs.field(default=0, init=False)
+    _opened_at: float | None = attrs.field(default=None, init=False)
+    _probing: bool = attrs.field(default=False, init=False)
+    _lock: threading.Lock = attrs.field(factory=threading.Lock, init=False)
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._probing or self.clock() - self._opened_at < self.cooldown:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.threshold:
+                self._opened_at = self.clock()
+                self._probing = False
+
+
+@attrs.define
+class ResolverPolicy:
+    """How requests to the shortener are paced, retried and cut off."""
+
+    retry: Retry = Retry()
+    rate_limiter: RateLimiter | None = None
+    breaker: CircuitBreaker = attrs.field(factory=CircuitBreaker)
+
+    @classmethod
+    def create(
+        cls, rate_limit: float | None = None, retries: int = DEFAULT_RETRIES
+    ) -> "ResolverPolicy":
+        return cls(
+            retry=Retry(retries=retries),
+            rate_limiter=RateLimiter(rate_limit) if rate_limit else None,
+        )
+
+    def reserve(self) -> float:
+        return self.rate_limiter.reserve() if self.rate_limiter is not None else 0.0
+
+
+def location_from_response(response: httpx.Response) -> str:
+    # Should always be true for shortened URLs
+    if not (response.is_redirect and response.has_redirect_location):
+        raise ResolutionError(
+            f"{response.url} did not redirect (status {response.status_code})"
+        )
+
+    return response.headers["location"]
+
+
+def _retry_after(response: httpx.Response) -> float | None:
+    try:
+        return max(float(response.headers["retry-after"]), 0.0)
+    except (KeyError, ValueError):
+        return None
+
+
+async def _resolve_one(
+    client: httpx.AsyncClient,
+    url: str,
+    semaphore: asyncio.Semaphore,
+    policy: ResolverPolicy,
+    latencies: list[float] | None,
+) -> str | ResolutionError:
+    for attempt in range(policy.retry.retries + 1):
+        await asyncio.sleep(policy.reserve())
+
+        retry_after = None
+        async with semaphore:
+            # Checked only now, as the circuit may have opened while waiting.
+            if not policy.breaker.allow():
+                return CircuitOpenError(f"{url}: not tried after too many failures")
+            start = time.perf_counter()
+            try:
+                response = await client.get(url)
+            except httpx.TransportError as e:
+                error: ResolutionError = TransientError(f"{url}: {e!r}")
+            except httpx.HTTPError as e:
+                return ResolutionError(f"{url}: {e!r}")
+            else:
+                if response.status_code not in _TRANSIENT_STATUSES:
+                    policy.breaker.record_success()
+                    try:
+                        return location_from_response(response)
+                    except ResolutionError as e:
+                        return e
+                error = TransientError(
+                    f"{url} failed with status {response.status_code}"
+                )
+                retry_after = _retry_after(response)
+            finally:
+                if latencies is not None:
+                    latencies.append(time.perf_counter() - start)
+
+        policy.breaker.record_failure()
+        if attempt < policy.retry.retries:
+            await asyncio.sleep(policy.retry.delay(attempt, retry_after))
+    return error
+
+
+async def _resolve_all(
+    client: httpx.AsyncClient,
+    urls: list[str],
+    concurrency: int,
+    latencies: list[float] | None,
+    policy: ResolverPolicy,
+) -> dict[str, str | ResolutionError]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _resolve(url: str) -> tuple[str, str | ResolutionError]:
+        return url, await _resolve_one(client, url, semaphore, policy, latencies)
+
+    return dict(await asyncio.gather(*map(_resolve, urls)))
+
+
+async def resolve_maps_links_async(
+    urls: Iterable[str],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    transport: httpx.AsyncBaseTransport | None = None,
+    latencies: list[float] | None = None,
+    policy: ResolverPolicy | None = None,
+) -> dict[str, str | ResolutionError]:
+    """Resolve shortened map links concurrently over a single pooled client.
+
+    At most `concurrency` requests are in flight at once, and connections are kept
+    alive between them so that links on the same host reuse the same sockets.
+    Requests are paced, retried and cut off by `policy`. The duration of every
+    request is appended to `latencies`, if given.
+
+    A link that cannot be resolved maps to the `ResolutionError` describing why,
+    rather than failing the others.
+    """
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        return {}
+
+    async with _make_client(concurrency, transport) as client:
+        return await _resolve_all(
+            client, urls, concurrency, latencies, policy or ResolverPolicy()
+        )
+
+
+def _make_client(
+    concurrency: int, transport: httpx.AsyncBaseTransport | None
+) -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=concurrency, max_keepalive_connections=concurrency
+    )
+    return httpx.AsyncClient(limits=limits, transport=transport)
+
+
+def resolve_maps_links(
+    urls: Iterable[str],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    transport: httpx.AsyncBaseTransport | None = None,
+    latencies: list[float] | None = None,
+    policy: ResolverPolicy | None = None,
+) -> dict[str, str | ResolutionError]:
+    """Synchronous entry point for `resolve_maps_links_async`."""
+    return asyncio.run(
+        resolve_maps_links_async(
+            urls,
+            concurrency=concurrency,
+            transport=transport,
+            latencies=latencies,
+            policy=policy,
+        )
+    )
+
+
+@attrs.define
+class PooledResolver:
+    """Resolves links over a single client that stays open between calls.
+
+    The client lives on an event loop in a background thread, so any number of
+    threads can share it along with its connection pool. `concurrency` limits the
+    requests in flight per call, and connections across all calls.
+    """
+
+    concurrency: int = DEFAULT_CONCURRENCY
+    transport: httpx.AsyncBaseTransport | None = None
+    policy: ResolverPolicy = attrs.field(factory=ResolverPolicy)
+    _loop: asyncio.AbstractEventLoop = attrs.field(
+        factory=asyncio.new_event_loop, init=False
+    )
+    _thread: threading.Thread = attrs.field(init=False)
+    _client: httpx.AsyncClient = attrs.field(init=False)
+
+    def __attrs_post_init__(self) -> None:
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        self._client = self._run(self._open_client())
+
+    async def _open_client(self) -> httpx.AsyncClient:
+        return _make_client(self.concurrency, self.transport)
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def resolve(
+        self, urls: Iterable[str], latencies: list[float] | None = None
+    ) -> dict[str, str | ResolutionError]:
+        """Like `resolve_maps_links`, but reusing the pooled connections."""
+        urls = list(dict.fromkeys(urls))
+        if not urls:
+            return {}
+        return self._run(
+            _resolve_all(self._client, urls, self.concurrency, latencies, self.policy)
+        )
+
+    def close(self) -> None:
+        self._run(self._client.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def __enter__(self) -> typing.Self:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
@@ -0,0 +1,113 @@
+"""Extract links from Markdown files, one line at a time.
+
+ATX (`# Title`) and setext (`Title` underlined with `===` or `---`) headings nest
+links like `Heading N` paragraphs in a .docx. Inline links (`[text](url)`),
+autolinks (`<url>`) and bare URLs are found anywhere outside code. Reference links
+(`[text][ref]`) are not supported, since their targets may only be defined after
+them.
+"""
+
+import re
+import typing
+from pathlib import Path
+
+from trip_planner.document_parser import Link
+from trip_planner.headings import ROOT, HeadingPath
+
+_ATX_HEADING = re.compile(r" {0,3}(#{1,6})(?:[ \t]+(.*?))?(?:[ \t]+#+)?[ \t]*$")
+_SETEXT_UNDERLINE = re.compile(r" {0,3}(=+|-+)[ \t]*$")
+_FENCE = re.compile(r" {0,3}(`{3,}|~{3,})")
+# Lines that cannot be the text of a setext heading: indented, list items, quotes
+# and thematic breaks.
+_NOT_SETEXT_TEXT = re.compile(
+    r"(?: {4}|\t| {0,3}(?:[-*+](?:[ \t]|$)|\d{1,9}[.)](?:[ \t]|$)|>"
+    r"|(?:[-*_][ \t]*){3,}$))"
+)
+_LINK = re.compile(
+    r"""
+    (?P<code>`+).*?(?P=code)
+    | (?P<image>!)?\[(?P<text>(?:[^\[\]\\]|\\.|\[[^\]]*\])*)\]
+      \(\s*(?:<(?P<bracketed>[^>]*)>|(?P<url>(?:[^\s()\\]|\\.|\([^\s)]*\))+))
+      (?:\s+(?:"[^"]*"|'[^']*'|\([^)]*\)))?\s*\)
+    | <(?P<autolink>[a-zA-Z][a-zA-Z0-9+.-]{1,31}:[^\s<>]*)>
+    | (?P<bare>https?://[^\s<>]*[^\s<>.,:;"')\]*_~])
+    """,
+    re.VERBOSE,
+)
+_ESCAPE = re.compile(r"\\([!-/:-@\[-`{-~])")
+_EMPHASIS = re.compile(r"(\*{1,3}|_{1,3})(.+?)\1")
+
+MarkdownSource = str | Path
+
+
+def _unescape(text: str) -> str:
+    return _ESCAPE.sub(r"\1", text)
+
+
+def _plain_text(text: str) -> str:
+    """The text of inline Markdown, without links, emphasis or escapes."""
+
+    def replace(match: re.Match[str]) -> str:
+        if match["code"] is not None:
+            return match[0].strip("`").strip()
+        if match["text"] is not None:
+            return "" if match["image"] else _plain_text(match["text"])
+        return match["autolink"] or match["bare"]
+
+    return _unescape(_EMPHASIS.sub(r"\2", _LINK.sub(replace, text))).strip()
+
+
+def _line_links(line: str, headings: HeadingPath) -> typing.Iterator[Link]:
+    for match in _LINK.finditer(line):
+        if match["code"] is not None or match["image"]:
+            continue
+        if match["text"] is not None:
+            address = match["bracketed"] or _unescape(match["url"] or "")
+            yield Link(
+                address=address, text=_plain_text(match["text"]), headings=headings
+            )
+        else:
+            address = match["autolink"] or match["bare"]
+            yield Link(address=address, text=address, headings=headings)
+
+
+def iter_links_with_headings(source: MarkdownSource) -> typing.Iterator[Link]:
+    headings = ROOT
+    fence: str | None = None
+    # A paragraph line is only known not to be a setext heading once the next line
+    # has been read.
+    pending: str | None = None
+
+    with open(source, encoding="utf-8-sig") as f:
+        for line in f:
+            line = line.rstrip("\r\n")
+
+            if fence is not None:
+                if line.lstrip().startswith(fence):
+                    fence = None
+                continue
+
+            if pending is not None:
+                underline = _SETEXT_UNDERLINE.match(line)
+                if underline:
+                    level = 1 if underline[1].startswith("=") else 2
+                    headings = headings.enter(_plain_text(pending), level)
+                    yield from _line_links(pending, headings)
+                    pending = None
+                    continue
+                yield from _line_links(pending, headings)
+                pending = None
+
+            if opening := _FENCE.match(line):
+                fence = opening[1][0] * len(opening[1])
+            elif heading := _ATX_HEADING.match(line):
+                text = heading[2] or ""
+                headings = headings.enter(_plain_text(text), len(heading[1]))
+                yield from _line_links(text, headings)
+            elif line.strip() and not _NOT_SETEXT_TEXT.match(line):
+                pending = line
+            else:
+                yield from _line_links(line, headings)
+
+        if pending is not None:
+            yield from _line_links(pending, headings)
@@ -0,0 +1,80 @@
+"""Extract links from OpenDocument text (.odt) files.
+
+`content.xml` is streamed straight out of the zip with an incremental XML parser, as
+`docx_stream` does for .docx files. `<text:h>` elements nest links by their outline
+level like `Heading N` paragraphs, and every `<text:a>` is a link. Footnotes and
+comments do not count towards the title of a heading.
+"""
+
+import typing
+import xml.etree.ElementTree as ET
+import zipfile
+from pathlib import Path
+
+from trip_planner.document_parser import Link
+from trip_planner.headings import ROOT
+
+_TEXT = "{urn:oasis:names:tc:opendocument:xmlns:text:1.0}"
+_OFFICE = "{urn:oasis:names:tc:opendocument:xmlns:office:1.0}"
+_XLINK = "{http://www.w3.org/1999/xlink}"
+
+_HEADING = _TEXT + "h"
+_ANCHOR = _TEXT + "a"
+_SPACE = _TEXT + "s"
+
+_FIXED_TEXT = {_TEXT + "tab": "\t", _TEXT + "line-break": "\n"}
+_SKIPPED = {_TEXT + "note", _OFFICE + "annotation"}
+
+OdtSource = str | Path | typing.IO[bytes]
+
+
+def _text(element: ET.Element) -> str:
+    """The text of an element, as the reader sees it, without its tail."""
+    parts = [element.text or ""]
+    for child in element:
+        if child.tag == _SPACE:
+            parts.append(" " * int(child.get(_TEXT + "c", "1")))
+        elif child.tag in _FIXED_TEXT:
+            parts.append(_FIXED_TEXT[child.tag])
+        elif child.tag not in _SKIPPED:
+            parts.append(_text(child))
+        parts.append(child.tail or "")
+    return "".join(parts)
+
+
+def iter_links_with_headings(source: OdtSource) -> typing.Iterator[Link]:
+    headings = ROOT
+    # Links in the heading being read, which belong under it once it ends.
+    heading_links: list[tuple[str, str]] = []
+    in_heading = False
+    parents: list[ET.Element] = []
+    # How many of `parents` are headings or links, whose text is still to be read.
+    reading = 0
+
+    with zipfile.ZipFile(source) as package, package.open("content.xml") as f:
+        for event, element in ET.iterparse(f, events=("start", "end")):
+            if event == "start":
+                in_heading = in_heading or element.tag == _HEADING
+                reading += element.tag in (_HEADING, _ANCHOR)
+                parents.append(element)
+                continue
+
+            parents.pop()
+            reading -= element.tag in (_HEADING, _ANCHOR)
+            address = element.get(_XLINK + "href")
+            if element.tag == _ANCHOR and address is not None:
+                if in_heading:
+                    heading_links.append((address, _text(element)))
+                else:
+                    yield Link(address=address, text=_text(element), headings=headings)
+            elif element.tag == _HEADING:
+                level = int(element.get(_TEXT + "outline-level", "1"))
+                headings = headings.enter(_text(element), level)
+                for address, text in heading_links:
+                    yield Link(address=address, text=text, headings=headings)
+                heading_links.clear()
+                in_heading = False
+
+            if parents and not reading:
+                # Drop finished content so the tree never grows.
+                parents[-1].remove(element)
@@ -0,0 +1,220 @@
+"""A two-tier cache for short link resolutions.
+
+A bounded in-process LRU sits in front of the on-disk `link_index.LinkIndex`, so
+links seen before in the process are looked up without touching SQLite, and the
+rest of a window in a single query. Besides resolutions, the LRU holds the locations
+of long URLs. Successful resolutions can be given a TTL, and failures are cached
+for a short while, so that a dead link does not hit the network on every single run.
+"""
+
+import collections
+import threading
+import time
+import typing
+
+import attrs
+import diskcache
+
+from trip_planner.link_index import Entry, Failure, Indexed, LinkIndex, Location
+
+DEFAULT_MEMORY_SIZE = 4096
+DEFAULT_NEGATIVE_TTL = 60 * 60.0
+
+# The key `diskcache.Cache.memoize` used for `resolve_maps_link`, before this cache.
+_LEGACY_KEY_BASE = "trip_planner.trip_planner.resolve_maps_link"
+# The key this cache used in `diskcache`, before the link index.
+_DISKCACHE_KEY = "resolve"
+_MIGRATED = "migrated-from-diskcache"
+
+
+class CacheMiss(LookupError):
+    """Raised for links that are not cached when the network must not be used."""
+
+
+@attrs.define
+class Counters:
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    negative_hits: int = 0
+
+    @property
+    def hits(self) -> int:
+        return self.memory_hits + self.disk_hits
+
+
+@attrs.define
+class ResolverCache:
+    _index: LinkIndex
+    _memory_size: int = DEFAULT_MEMORY_SIZE
+    _ttl: float | None = None
+    _negative_ttl: float = DEFAULT_NEGATIVE_TTL
+    counters: Counters = attrs.field(factory=Counters)
+    _memory: collections.OrderedDict[str, tuple[Indexed, float | None]] = attrs.field(
+        factory=collections.OrderedDict, init=False
+    )
+    _lock: threading.Lock = attrs.field(factory=threading.Lock, init=False)
+
+    def _remember(self, url: str, known: Indexed, expire: float | None) -> None:
+        expires_at = None if expire is None else time.monotonic() + expire
+        with self._lock:
+            self._memory[url] = (known, expires_at)
+            self._memory.move_to_end(url)
+            while len(self._memory) > self._memory_size:
+                self._memory.popitem(last=False)
+                self.counters.evictions += 1
+
+    def _from_memory(self, url: str) -> Indexed | None:
+        with self._lock:
+            cached = self._memory.get(url)
+            if cached is None:
+                return None
+            known, expires_at = cached
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._memory[url]
+                return None
+            self._memory.move_to_end(url)
+            return known
+
+    def _remember_indexed(self, url: str, known: Indexed) -> None:
+        # The remaining TTL is not known here, so keep it in memory no longer than
+        # a fresh entry would be.
+        expire = None if known.entry is None else self._expire_for(known.entry)
+        self._remember(url, known, expire)
+
+    def _from_disk(self, url: str) -> Entry | None:
+        known = self._index.lookup([url]).get(url)
+        if known is None or known.entry is None:
+            return None
+        self._remember_indexed(url, known)
+        return known.entry
+
+    def _expire_for(self, entry: Entry) -> float | None:
+        return self._negative_ttl if isinstance(entry, Failure) else self._ttl
+
+    def get(self, url: str) -> Entry | None:
+        """Look a link up, returning `None` if it is not cached."""
+        known = self._from_memory(url)
+        entry = known.entry if known is not None else None
+        if entry is not None:
+            self.counters.memory_hits += 1
+        else:
+            entry = self._from_disk(url)
+            if entry is None:
+                self.counters.misses += 1
+                return None
+            self.counters.disk_hits += 1
+
+        if isinstance(entry, Failure):
+            self.counters.negative_hits += 1
+        return entry
+
+    def lookup(
+        self, short_urls: typing.Iterable[str], long_urls: typing.Iterable[str] = ()
+    ) -> dict[str, Indexed]:
+        """Everything known about the links, leaving out those nothing is known of.
+
+        Short links come with how they resolved and the location of their target,
+        long URLs with their location. Links are served from memory where possible,
+        and the rest from the index in a single query. Each short link counts once
+        in the counters.
+        """
+        short_urls = list(dict.fromkeys(short_urls))
+        found: dict[str, Indexed] = {}
+        in_memory: set[str] = set()
+        uncached: list[str] = []
+        for url in dict.fromkeys([*short_urls, *long_urls]):
+            known = self._from_memory(url)
+            if known is None:
+                uncached.append(url)
+            else:
+                found[url] = known
+                in_memory.add(url)
+
+        # Short links resolved in this process may not know their location yet.
+        targets = {
+            url: known.entry
+            for url, known in found.items()
+            if isinstance(known.entry, str) and known.location is None
+        }
+        for url, target in list(targets.items()):
+            known = self._from_memory(target)
+            if known is not None and known.location is not None:
+                found[url] = attrs.evolve(found[url], location=known.location)
+                del targets[url]
+
+        if uncached or targets:
+            indexed = self._index.lookup([*uncached, *targets.values()])
+            for url in uncached:
+                if url in indexed:
+                    found[url] = indexed[url]
+                    self._remember_indexed(url, indexed[url])
+            for url, target in targets.items():
+                if target in indexed:
+                    location = indexed[target].location
+                    found[url] = attrs.evolve(found[url], location=location)
+                    self._remember_indexed(target, indexed[target])
+
+        for url in short_urls:
+            entry = found[url].entry if url in found else None
+            if entry is None:
+                self.counters.misses += 1
+                continue
+            if url in in_memory:
+                self.counters.memory_hits += 1
+            else:
+                self.counters.disk_hits += 1
+            if isinstance(entry, Failure):
+                self.counters.negative_hits += 1
+        return found
+
+    def set(self, url: str, entry: Entry) -> None:
+        self.set_many({url: entry})
+
+    def set_many(self, entries: typing.Mapping[str, Entry]) -> None:
+        """Cache the links, all in one transaction."""
+        expiring = {
+            url: (entry, self._expire_for(entry)) for url, entry in entries.items()
+        }
+        self._index.store_resolutions(expiring)
+        for url, (entry, expire) in expiring.items():
+            self._remember(url, Indexed(entry), expire)
+
+    def store_locations(self, locations: typing.Mapping[str, Location]) -> None:
+        """Store the locations of long URLs, all in one transaction."""
+        self._index.store_locations(locations)
+        for url, location in locations.items():
+            self._remember(url, Indexed(location=location), None)
+
+    def migrate(self, disk: diskcache.Cache) -> int:
+        """Move the links `disk` cached before the index into it, once.
+
+        Returns how many were moved.
+        """
+        if self._index.get_meta(_MIGRATED) is not None:
+            return 0
+
+        entries: dict[str, Entry] = {}
+        keys = []
+        for key in disk.iterkeys():
+            if not (isinstance(key, tuple) and len(key) >= 2):
+                continue
+            if key[0] not in (_DISKCACHE_KEY, _LEGACY_KEY_BASE):
+                continue
+            keys.append(key)
+            entry = disk.get(key, retry=True)
+            # Entries of this cache win over the older memoized ones.
+            if isinstance(entry, (str, Failure)) and (
+                key[0] == _DISKCACHE_KEY or key[1] not in entries
+            ):
+                entries[key[1]] = entry
+
+        self.set_many(entries)
+        self._index.set_meta(_MIGRATED, str(len(entries)))
+        for key in keys:
+            disk.delete(key, retry=True)
+        return len(entries)
+
+    def close(self) -> None:
+        self._index.close()
@@ -0,0 +1,117 @@
+"""Convert documents to maps over HTTP.
+
+POST a .docx to `/convert` and the map comes back as KML, or as KMZ with
+`?format=kmz`. Other documents are posted with their type, e.g. `?input=md`. The
+server is the standard library's WSGI server with a thread per request, all sharing
+the caches of one `MapMaker`: they are safe to use from several threads, and link
+resolution goes through a pooled client that stays open between requests. Each
+request has statistics of its own, so nothing accumulates over the life of the
+server.
+"""
+
+import socketserver
+import tempfile
+import typing
+import urllib.parse
+import wsgiref.simple_server
+from pathlib import Path
+
+import attrs
+
+from trip_planner import document_formats
+
+if typing.TYPE_CHECKING:
+    from wsgiref.types import StartResponse, WSGIEnvironment
+
+    from trip_planner.trip_planner import DocumentParser, MapMaker
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8000
+DEFAULT_MAX_UPLOAD = 50 * 1024 * 1024
+
+CONTENT_TYPES = {
+    "kml": "application/vnd.google-earth.kml+xml",
+    "kmz": "application/vnd.google-earth.kmz",
+}
+
+
+class HttpError(Exception):
+    def __init__(self, status: str, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+@attrs.define
+class ConversionApp:
+    """The WSGI application."""
+
+    map_maker: "MapMaker"
+    parser: "DocumentParser"
+    max_upload: int = DEFAULT_MAX_UPLOAD
+
+    def __call__(
+        self, environ: "WSGIEnvironment", start_response: "StartResponse"
+    ) -> list[bytes]:
+        try:
+            body, content_type = self._convert(environ)
+        except HttpError as e:
+            body, content_type = f"{e}\n".encode(), "text/plain; charset=utf-8"
+            status = e.status
+        else:
+            status = "200 OK"
+
+        start_response(
+            status,
+            [("Content-Type", content_type), ("Content-Length", str(len(body)))],
+        )
+        return [body]
+
+    def _convert(self, environ: "WSGIEnvironment") -> tuple[bytes, str]:
+        # Imported here, as `trip_planner` imports this module.
+        from trip_planner.trip_planner import iter_document_links
+
+        if environ.get("PATH_INFO") != "/convert":
+            raise HttpError("404 Not Found", "Not found, POST documents to /convert")
+        if environ["REQUEST_METHOD"] != "POST":
+            raise HttpError("405 Method Not Allowed", "Only POST is supported")
+
+        query = urllib.parse.parse_qs(environ.get("QUERY_STRING", ""))
+        map_format = query.get("format", ["kml"])[0]
+        if map_format not in CONTENT_TYPES:
+            raise HttpError("400 Bad Request", f"Unknown format {map_format!r}")
+        suffix = "." + query.get("input", ["docx"])[0]
+        if suffix not in document_formats.SUFFIXES:
+            raise HttpError("400 Bad Request", f"Unknown input {suffix[1:]!r}")
+
+        try:
+            length = int(environ.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            raise HttpError("400 Bad Request", "Invalid Content-Length")
+        if length <= 0:
+            raise HttpError("400 Bad Request", "No document was uploaded")
+        if length > self.max_upload:
+            raise HttpError("413 Request Entity Too Large", "The document is too large")
+
+        with tempfile.TemporaryDirectory() as workdir:
+            document = Path(workdir) / f"document{suffix}"
+            document.write_bytes(environ["wsgi.input"].read(length))
+            output = Path(workdir) / f"map.{map_format}"
+            # Read the links up front, so that only errors reading the document
+            # itself are blamed on it, not those in its links.
+            try:
+                links = list(iter_document_links(document, self.parser))
+            except document_formats.INVALID_DOCUMENT_ERRORS:
+                raise HttpError("400 Bad Request", f"Not a valid {suffix} document")
+            self.map_maker.with_fresh_stats().map_from_links(links, output)
+            return output.read_bytes(), CONTENT_TYPES[map_format]
+
+
+class _Server(socketserver.ThreadingMixIn, wsgiref.simple_server.WSGIServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def make_server(
+    app: ConversionApp, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT
+) -> wsgiref.simple_server.WSGIServer:
+    return wsgiref.simple_server.make_server(host, port, app, server_class=_Server)
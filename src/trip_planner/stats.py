@@ -0,0 +1,89 @@
+"""Statistics about a single map build."""
+
+import contextlib
+import statistics
+import time
+import typing
+
+import attrs
+import rich
+import rich.table
+
+PERCENTILES = (50, 90, 99)
+
+
+@attrs.define
+class RunStats:
+    phases: dict[str, float] = attrs.field(factory=dict)
+    links_seen: int = 0
+    links_kept: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    latencies: list[float] = attrs.field(factory=list)
+    unresolved: list[str] = attrs.field(factory=list)
+    # Links whose URL has no location that could be read.
+    unlocated: list[str] = attrs.field(factory=list)
+
+    @property
+    def links_dropped(self) -> int:
+        return self.links_seen - self.links_kept
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> typing.Iterator[None]:
+        """Add the wall time of the block to the given phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def latency_percentiles(self) -> dict[str, float]:
+        if not self.latencies:
+            return {}
+        if len(self.latencies) == 1:
+            cut_points = self.latencies * 99
+        else:
+            cut_points = statistics.quantiles(self.latencies, n=100, method="inclusive")
+        return {
+            **{
+                f"p{percentile}": cut_points[percentile - 1]
+                for percentile in PERCENTILES
+            },
+            "max": max(self.latencies),
+        }
+
+    def as_dict(self) -> dict[str, typing.Any]:
+        return {
+            "phases": self.phases,
+            "links": {
+                "seen": self.links_seen,
+                "kept": self.links_kept,
+                "dropped": self.links_dropped,
+            },
+            "cache": {"hits": self.cache_hits, "misses": self.cache_misses},
+            "requests": len(self.latencies),
+            "latency": self.latency_percentiles(),
+            "unresolved": self.unresolved,
+            "unlocated": self.unlocated,
+        }
+
+    def print(self) -> None:
+        table = rich.table.Table("Phase", "Seconds", title="Build statistics")
+        for name, seconds in self.phases.items():
+            table.add_row(name, f"{seconds:.3f}")
+        rich.print(table)
+        rich.print(
+            f"Links: {self.links_seen} seen, {self.links_kept} kept,"
+            f" {self.links_dropped} dropped"
+        )
+        rich.print(f"Cache: {self.cache_hits} hits, {self.cache_misses} misses")
+        if self.unresolved:
+            rich.print(f"Unresolved: {len(self.unresolved)} links")
+        if self.unlocated:
+            rich.print(f"Unlocated: {len(self.unlocated)} links")
+        if self.latencies:
+            percentiles = ", ".join(
+                f"{name} {seconds * 1000:.0f}ms"
+                for name, seconds in self.latency_percentiles().items()
+            )
+            rich.print(f"Requests: {len(self.latencies)} ({percentiles})")
@@ -1,8 +1,17 @@
+import concurrent.futures
+import contextlib
+import cProfile
 import enum
+import glob
+import itertools
+import json
+import os
 import re
-from collections import defaultdict
+import time
+import urllib.parse
+from collections.abc import Iterable, Iterator, Mapping
 from pathlib import Path
-from typing import Annotated, Callable, NamedTuple, TypedDict
+from typing import Annotated, Any, NamedTuple, TypeVar
 
 import attrs
 import diskcache
@@ -12,13 +21,31 @@ import docx.text.hyperlink
 import docx.text.paragraph
 import httpx
 import rich
-import simplekml
 import typer
-import urllib3
-
-from trip_planner import document_parser
+import typer.core
+
+from trip_planner import (
+    categories,
+    dedupe,
+    document_formats,
+    document_parser,
+    docx_stream,
+    exports,
+    geometry,
+    incremental,
+    kml_delta,
+    kml_writer,
+    layers,
+    link_index,
+    link_resolver,
+    resolver_cache,
+    server,
+    stats,
+    watcher,
+)
 from trip_planner.document_parser import iter_links_with_headings
-from trip_planner.google_maps_helpers import DEFAULT_ICON_COLOR, create_stylemap
+from trip_planner.google_maps_helpers import DEFAULT_ICON_COLOR
+from trip_planner.headings import ROOT, HeadingPath, heading_path
 
 
 class Coords(NamedTuple):
@@ -26,31 +53,60 @@ class Coords(NamedTuple):
     lat: float
 
 
+def _heading_paths(paths: Iterable[Iterable[str]]) -> tuple[HeadingPath, ...]:
+    return tuple(map(heading_path, paths))
+
+
 @attrs.frozen(order=True)
 class Point:
     name: str
     coords: Coords
-    headings: list[str] = attrs.field(factory=list, eq=False, order=False)
+    headings: HeadingPath = attrs.field(
+        default=ROOT, converter=heading_path, eq=False, order=False
+    )
+    # The headings of the points merged into this one, which it is not placed under
+    # but still categorized by.
+    merged_headings: tuple[HeadingPath, ...] = attrs.field(
+        default=(), converter=_heading_paths, eq=False, order=False
+    )
+
+
+def _coords_tuple(coords: Iterable[Coords]) -> tuple[Coords, ...]:
+    return tuple(coords)
 
 
 @attrs.frozen
 class Line:
     name: str
-    coords: tuple[Coords] = attrs.field(converter=tuple)
+    coords: tuple[Coords, ...] = attrs.field(converter=_coords_tuple)
+    headings: HeadingPath = attrs.field(default=ROOT, converter=heading_path, eq=False)
+
+
+Feature = Point | Line
 
 
-def resolve_maps_link(url: str) -> str:
-    response = httpx.get(url)
+def _placemark_id(feature: Feature) -> str:
+    coords = [feature.coords] if isinstance(feature, Point) else feature.coords
+    return kml_writer.placemark_id(feature.name, coords)
 
-    # Should always be true for shortened URLs
-    assert response.is_redirect and response.has_redirect_location
 
-    return response.headers["location"]
+ROUTES_FOLDER = "Routes"
+ROUTE_STYLE = kml_writer.LineStyle(color=DEFAULT_ICON_COLOR, width=5)
+
+
+def resolve_maps_link(
+    url: str, policy: link_resolver.ResolverPolicy | None = None
+) -> str:
+    location = link_resolver.resolve_maps_links([url], policy=policy)[url]
+    if isinstance(location, link_resolver.ResolutionError):
+        raise location
+    return location
 
 
 def get_data_from_url(url) -> str:
-    path = urllib3.util.parse_url(url).path
-    assert path is not None, "a path should always exist"
+    # `urlsplit` does not normalize the path like `urllib3.util.parse_url`, which
+    # makes it an order of magnitude faster. The tags we read are never affected.
+    path = urllib.parse.urlsplit(url).path
     data = path.rpartition("/")[-1]
     return data
 
@@ -64,7 +120,10 @@ def parse_directions_url(url: str) -> list[Coords] | None:
         return None
 
     data = get_data_from_url(url)
-    tagged_data = parse_maps_url_data(data)
+    if not data.startswith("data=!"):
+        # Directions without data only name their waypoints
+        return []
+    tagged_data = iter_maps_url_data(data)
 
     def _iter():
         lat: float | None = None
@@ -87,44 +146,97 @@ class MapTaggedData(NamedTuple):
     value: str
 
 
+_TAGGED_DATA = re.compile(r"!(?P<tag>\d[a-z])(?P<value>[^!]+)")
+
+
+def _check_maps_url_data(data: str) -> None:
+    if not data.startswith("data=!"):
+        raise ValueError(f"invalid data {data}")
+
+
+def iter_maps_url_data(data: str) -> Iterator[MapTaggedData]:
+    """Lazily parse the tagged values in the data part of a Google Maps URL."""
+    _check_maps_url_data(data)
+    for match in _TAGGED_DATA.finditer(data):
+        yield MapTaggedData(tag=match.group("tag"), value=match.group("value"))
+
+
 def parse_maps_url_data(data: str) -> list[MapTaggedData]:
     """
     data=!4m20!4m19!1m5!1m1!1s0x601cb71add823007:0x7d766e65361116fa!2m2!1d137.5717516!2d35.5315174!1m5!1m1!1s0x601cb7e4a598bb33:0x87bc2c35315036f6!2m2!1d137.5956667!2d35.5775876!1m5!1m1!1s0x601cc9bd3ccb26ed:0x1b1560620d4ac8d0!2m2!1d137.5489597!2d35.5882476!3e2
     """
-    if not data.startswith("data=!"):
-        raise ValueError(f"invalid data {data}")
+    return list(iter_maps_url_data(data))
 
-    def _iter():
-        for match in re.finditer(r"!(?P<tag>\d[a-z])(?P<value>[^!]+)", data):
-            yield MapTaggedData(tag=match.group("tag"), value=match.group("value"))
 
-    return list(_iter())
+def find_maps_url_data(data: str, tag: str) -> str | None:
+    """Find the value of the last `tag` in the data, without parsing the rest of it.
+
+    Values can never contain a `!`, so every `!<tag>` in the data starts a value.
+    """
+    marker = "!" + tag
+    start = data.rfind(marker)
+    if start == -1:
+        return None
+    start += len(marker)
+    end = data.find("!", start)
+    return data[start:] if end == -1 else data[start:end]
 
 
 def coords_from_data(data: str):
-    tagged_data = parse_maps_url_data(data)
-    tag_dict = dict(tagged_data)
-    return Coords(lat=float(tag_dict["3d"]), lon=float(tag_dict["4d"]))
+    _check_maps_url_data(data)
+    lat = find_maps_url_data(data, "3d")
+    lon = find_maps_url_data(data, "4d")
+    if lat is None or lon is None:
+        raise KeyError(f"no coordinates in {data}")
+    return Coords(lat=float(lat), lon=float(lon))
+
+
+class MapUrlKind(enum.Enum):
+    Other = enum.auto()
+    Short = enum.auto()
+    Long = enum.auto()
+    Place = enum.auto()
+    Directions = enum.auto()
+
+
+_MAP_URL = re.compile(
+    r"https://(?:"
+    r"(?P<Short>goo\.gl/maps/)"
+    r"|www\.google\.com/maps/(?:(?P<Place>place/)|(?P<Directions>dir/))?"
+    r")"
+)
+
+
+def classify_url(url: str) -> MapUrlKind:
+    """Determine the kind of a URL with a single match."""
+    match = _MAP_URL.match(url)
+    if match is None:
+        return MapUrlKind.Other
+    return MapUrlKind[match.lastgroup or "Long"]
 
 
 def is_place_url(url: str) -> bool:
-    return bool(re.match("https://www.google.com/maps/place/.*", url))
+    return classify_url(url) is MapUrlKind.Place
 
 
 def is_short_map_url(url: str) -> bool:
-    return bool(re.match("https://goo.gl/maps/.*", url))
+    return classify_url(url) is MapUrlKind.Short
 
 
 def is_long_map_url(url: str) -> bool:
-    return bool(re.match("https://www.google.com/maps/.*", url))
+    return classify_url(url) in (
+        MapUrlKind.Long,
+        MapUrlKind.Place,
+        MapUrlKind.Directions,
+    )
 
 
 def is_maps_url(url: str) -> bool:
-    return is_short_map_url(url) or is_long_map_url(url)
+    return classify_url(url) is not MapUrlKind.Other
 
 
 def is_dir_url(url: str) -> bool:
-    return bool(re.match("https://www.google.com/maps/dir/.*", url))
+    return classify_url(url) is MapUrlKind.Directions
 
 
 def get_coords_from_url(url: str) -> Coords:
@@ -132,139 +244,1144 @@ def get_coords_from_url(url: str) -> Coords:
     return coords_from_data(data)
 
 
+def locate_url(url: str) -> link_index.Location:
+    """What a long map URL shows, as stored in the link index."""
+    kind = classify_url(url)
+    coords: list[Coords] = []
+    if kind is MapUrlKind.Directions:
+        coords = parse_directions_url(url) or []
+    elif kind is MapUrlKind.Place:
+        coords = [get_coords_from_url(url)]
+    return link_index.Location(
+        kind=kind.name, coords=tuple((point.lon, point.lat) for point in coords)
+    )
+
+
+# How many links are resolved, and features written, at a time.
+DEFAULT_WINDOW = 256
+
+_T = TypeVar("_T")
+
+
 @attrs.define
 class MapMaker:
     _cache: diskcache.Cache
-    _cached_resolver: Callable[[str], str]
+    _links: resolver_cache.ResolverCache
+    _concurrency: int = link_resolver.DEFAULT_CONCURRENCY
+    _transport: httpx.AsyncBaseTransport | None = None
+    _route_tolerance: float = 0.0
+    _merge_radius: float = 0.0
+    _merge_name_policy: dedupe.NamePolicy = dedupe.NamePolicy.First
+    _offline: bool = False
+    _resolver: link_resolver.PooledResolver | None = None
+    _policy: link_resolver.ResolverPolicy = attrs.field(
+        factory=link_resolver.ResolverPolicy
+    )
+    _categorizer: categories.Categorizer = attrs.field(
+        factory=categories.default_categorizer
+    )
+    _window: int = DEFAULT_WINDOW
+    _verbose: bool = False
+    _split_by: layers.SplitBy = layers.SplitBy.Nothing
+    _max_layer_features: int | None = None
+    _folder_by: layers.FolderBy = layers.FolderBy.Category
+    _formats: tuple[exports.OutputFormat, ...] = ()
+    _delta: bool = False
+    run_stats: stats.RunStats = attrs.field(factory=stats.RunStats)
 
     @classmethod
-    def with_cache(cls, cache_dir: Path) -> "MapMaker":
+    def with_cache(
+        cls,
+        cache_dir: Path,
+        concurrency: int = link_resolver.DEFAULT_CONCURRENCY,
+        transport: httpx.AsyncBaseTransport | None = None,
+        route_tolerance: float = 0.0,
+        merge_radius: float = 0.0,
+        merge_name_policy: dedupe.NamePolicy = dedupe.NamePolicy.First,
+        memory_cache_size: int = resolver_cache.DEFAULT_MEMORY_SIZE,
+        cache_ttl: float | None = None,
+        negative_cache_ttl: float = resolver_cache.DEFAULT_NEGATIVE_TTL,
+        offline: bool = False,
+        resolver: link_resolver.PooledResolver | None = None,
+        categorizer: categories.Categorizer | None = None,
+        window: int = DEFAULT_WINDOW,
+        verbose: bool = False,
+        split_by: layers.SplitBy = layers.SplitBy.Nothing,
+        max_layer_features: int | None = None,
+        folder_by: layers.FolderBy = layers.FolderBy.Category,
+        formats: Iterable[exports.OutputFormat] = (),
+        rate_limit: float | None = None,
+        retries: int = link_resolver.DEFAULT_RETRIES,
+        delta: bool = False,
+    ) -> "MapMaker":
         cache = diskcache.Cache(directory=str(cache_dir))
-        resolver = cache.memoize()(resolve_maps_link)
-        return MapMaker(cache=cache, cached_resolver=resolver)
+        links = resolver_cache.ResolverCache(
+            link_index.LinkIndex(cache_dir / link_index.FILENAME),
+            memory_size=memory_cache_size,
+            ttl=cache_ttl,
+            negative_ttl=negative_cache_ttl,
+        )
+        links.migrate(cache)
+        return MapMaker(
+            cache=cache,
+            links=links,
+            concurrency=concurrency,
+            transport=transport,
+            route_tolerance=route_tolerance,
+            merge_radius=merge_radius,
+            merge_name_policy=merge_name_policy,
+            offline=offline,
+            resolver=resolver,
+            policy=link_resolver.ResolverPolicy.create(rate_limit, retries),
+            categorizer=categorizer or categories.default_categorizer(),
+            window=window,
+            verbose=verbose,
+            split_by=split_by,
+            max_layer_features=max_layer_features,
+            folder_by=folder_by,
+            formats=tuple(formats),
+            delta=delta,
+        )
+
+    def with_fresh_stats(self) -> "MapMaker":
+        """A map maker sharing everything with this one but its statistics.
+
+        Use one per build when building several maps, so that statistics do not
+        accumulate across builds.
+        """
+        return attrs.evolve(self, run_stats=stats.RunStats())
 
-    def _resolve_gmaps_url(self, url: str) -> str:
+    @property
+    def link_cache(self) -> resolver_cache.ResolverCache:
+        return self._links
+
+    def _resolve_gmaps_url(
+        self,
+        url: str,
+        known: Mapping[str, str | link_resolver.ResolutionError] | None = None,
+    ) -> str:
+        """The long URL of a short link, from the cache or resolved now.
+
+        Links in `known` have already been looked up or resolved, with the outcome
+        given there, and are neither looked up nor tried again.
+        """
         if not is_short_map_url(url):
             raise ValueError(f"requires shortened google-maps url, got {url}")
 
-        return self._cached_resolver(url)
+        if known and url in known:
+            outcome = known[url]
+            if isinstance(outcome, link_resolver.ResolutionError):
+                raise outcome
+            return outcome
+
+        entry = self._links.get(url)
+        if entry is None:
+            if self._offline:
+                raise resolver_cache.CacheMiss(url)
+            location = self._resolve_uncached([url])[url]
+            if isinstance(location, link_resolver.ResolutionError):
+                raise location
+            return location
+
+        if isinstance(entry, resolver_cache.Failure):
+            raise link_resolver.ResolutionError(entry.reason)
+        return entry
+
+    def _resolve_uncached(
+        self, urls: list[str]
+    ) -> dict[str, str | link_resolver.ResolutionError]:
+        """Resolve the links and cache the outcomes.
+
+        Transient failures are not cached, so the links are tried again next time.
+        """
+        if self._resolver is not None:
+            resolved = self._resolver.resolve(urls, latencies=self.run_stats.latencies)
+        else:
+            resolved = link_resolver.resolve_maps_links(
+                urls,
+                concurrency=self._concurrency,
+                transport=self._transport,
+                latencies=self.run_stats.latencies,
+                policy=self._policy,
+            )
+        self._links.set_many(
+            {
+                url: (
+                    resolver_cache.Failure(reason=str(location))
+                    if isinstance(location, link_resolver.ResolutionError)
+                    else location
+                )
+                for url, location in resolved.items()
+                if not isinstance(location, link_resolver.TransientError)
+            }
+        )
+        return resolved
 
-    def _point_from_link(self, link: document_parser.Link) -> Point | None:
+    def _prefetch_short_links(
+        self,
+        links: list[document_parser.Link],
+        retry_failures: bool = False,
+        index: Mapping[str, link_index.Indexed] | None = None,
+    ) -> dict[str, str | link_resolver.ResolutionError]:
+        """Resolve all uncached short links concurrently and store them in the cache.
+
+        Building the points afterwards then never touches the network. Links whose
+        failure is cached are resolved again if `retry_failures` is set. `index` is
+        what the link index knows of the links, looked up here if not given. Returns
+        the links that were resolved, and the outcome for each.
+        """
+        short_urls = list(
+            dict.fromkeys(
+                link.address for link in links if is_short_map_url(link.address)
+            )
+        )
+        if index is None:
+            index = self._links.lookup(short_urls)
+        missing = [
+            url
+            for url in short_urls
+            if (indexed := index.get(url)) is None
+            or indexed.entry is None
+            or (retry_failures and isinstance(indexed.entry, resolver_cache.Failure))
+        ]
+        self.run_stats.cache_misses += len(missing)
+        self.run_stats.cache_hits += len(short_urls) - len(missing)
+        if missing and self._offline:
+            raise resolver_cache.CacheMiss(*missing)
+
+        return self._resolve_uncached(missing)
+
+    def warm(
+        self, links: Iterable[document_parser.Link]
+    ) -> dict[str, str | link_resolver.ResolutionError]:
+        """Resolve every short link ahead of a build, including cached failures.
+
+        Returns the outcome for each link that was not already resolved.
+        """
+        with self.run_stats.phase("resolve"):
+            return self._prefetch_short_links(list(links), retry_failures=True)
+
+    def _feature_at(
+        self, link: document_parser.Link, location: link_index.Location
+    ) -> Feature | None:
+        coords = [Coords(lon=lon, lat=lat) for lon, lat in location.coords]
+        match MapUrlKind[location.kind]:
+            case MapUrlKind.Directions if len(coords) >= 2:
+                return Line(
+                    name=link.text,
+                    coords=geometry.simplify(coords, self._route_tolerance),
+                    headings=link.headings,
+                )
+            case MapUrlKind.Place:
+                return Point(name=link.text, coords=coords[0], headings=link.headings)
+        return None
+
+    def _feature_from_link(
+        self,
+        link: document_parser.Link,
+        known: Mapping[str, str | link_resolver.ResolutionError] | None = None,
+        index: Mapping[str, link_index.Indexed] | None = None,
+        locations: dict[str, link_index.Location] | None = None,
+    ) -> Feature | None:
+        """The feature a link shows, if any, parsing only locations not yet known."""
         url = link.address
-        if is_short_map_url(url):
-            url = self._resolve_gmaps_url(url)
-        if not is_place_url(url):
+        kind = classify_url(url)
+        if kind is MapUrlKind.Other:
             return None
-        coords = get_coords_from_url(url)
-
-        return Point(name=link.text, coords=coords, headings=link.headings)
-
-    def _points_from_links(self, links: list[document_parser.Link]) -> list[Point]:
-        return list(filter(None, map(self._point_from_link, links)))
+        if kind is MapUrlKind.Short:
+            try:
+                url = self._resolve_gmaps_url(url, known)
+            except link_resolver.ResolutionError as e:
+                rich.print(f"[yellow]Could not resolve {link.text!r}: {e}[/yellow]")
+                self.run_stats.unresolved.append(link.address)
+                return None
+
+        indexed = index.get(link.address) if index is not None else None
+        location = indexed.location if indexed is not None else None
+        if location is None and locations is not None:
+            location = locations.get(url)
+        if location is None:
+            try:
+                location = locate_url(url)
+            except (ValueError, KeyError) as e:
+                rich.print(f"[yellow]Could not locate {link.text!r}: {e}[/yellow]")
+                self.run_stats.unlocated.append(link.address)
+                return None
+            if locations is not None:
+                locations[url] = location
+        return self._feature_at(link, location)
+
+    def _maybe_features_from_links(
+        self, links: list[document_parser.Link]
+    ) -> list[Feature | None]:
+        with self.run_stats.phase("resolve"):
+            index = self._links.lookup(
+                (link.address for link in links if is_short_map_url(link.address)),
+                (
+                    link.address
+                    for link in links
+                    if is_maps_url(link.address) and not is_short_map_url(link.address)
+                ),
+            )
+            # Everything about the short links is known after resolving the missing
+            # ones, including transient failures, which are not cached but have just
+            # been retried, so the cache is not asked again.
+            known: dict[str, str | link_resolver.ResolutionError] = {
+                url: (
+                    link_resolver.ResolutionError(indexed.entry.reason)
+                    if isinstance(indexed.entry, resolver_cache.Failure)
+                    else indexed.entry
+                )
+                for url, indexed in index.items()
+                if indexed.entry is not None
+            }
+            known.update(self._prefetch_short_links(links, index=index))
+            locations: dict[str, link_index.Location] = {}
+            features = [
+                self._feature_from_link(link, known, index, locations) for link in links
+            ]
+            self._links.store_locations(locations)
+            return features
+
+    def _features_from_links(self, links: list[document_parser.Link]) -> list[Feature]:
+        return list(filter(None, self._maybe_features_from_links(links)))
 
     def map_from_docx(
         self,
         doc: docx.document.Document,
         output: Path,
     ):
-        links = list(iter_links_with_headings(doc))
-        for link in links:
-            rich.print(link)
-        kml = simplekml.Kml()
-
-        stylemaps: dict[str, simplekml.StyleMap] = {}
-
-        def _stylemap(name: str, color: str = DEFAULT_ICON_COLOR):
-            new_stylemap = create_stylemap(name=name, color=color)
-            stylemap = stylemaps.get(name, new_stylemap)
-            if stylemap is new_stylemap:
-                # Styles and stylemaps must reside at the top-level of the document for Google Maps
-                # to use them.
-                kml.stylemaps.append(stylemap)
-            return stylemap
-
-        points = self._points_from_links(links)
-
-        groups: defaultdict[Category, set[Point]] = defaultdict(set)
-        for point in points:
-            groups[categorize_point(point)].add(point)
-
-        for category, grouped_points in groups.items():
-            folder: simplekml.Folder = kml.newfolder(name=category.name)
-
-            for point in sorted(grouped_points):
-                kml_point: simplekml.Point = folder.newpoint(
-                    name=point.name, coords=[point.coords]
-                )
-                kml_point.stylemap = _stylemap(**category.icon_info)
+        self.map_from_links(iter_links_with_headings(doc), output)
 
-        kml.save(str(output))
+    def map_from_links(
+        self,
+        links_iter: Iterable[document_parser.Link],
+        output: Path,
+    ):
+        self._save_map(self._iter_features(links_iter), output)
+
+    def _log_links(self, links: Iterable[document_parser.Link]) -> None:
+        if self._verbose:
+            for link in links:
+                rich.print(link)
+
+    def _iter_features(
+        self, links_iter: Iterable[document_parser.Link]
+    ) -> Iterator[Feature]:
+        """Resolve the links a window at a time, as the features are consumed."""
+        links = iter(links_iter)
+        while True:
+            with self.run_stats.phase("parse"):
+                window = list(itertools.islice(links, self._window))
+            if not window:
+                return
+            self._log_links(window)
+            features = self._features_from_links(window)
+            self.run_stats.links_seen += len(window)
+            self.run_stats.links_kept += len(features)
+            yield from features
+
+    def map_from_document(
+        self,
+        document: Path,
+        output: Path,
+        parser: "DocumentParser",
+        incremental_build: bool = False,
+    ) -> bool:
+        """Build a map from a document file.
+
+        In incremental mode, nothing is done if the document did not change since
+        the output was last built, and only new or edited links are resolved.
+        Returns whether the output was written.
+        """
+        if not incremental_build:
+            self.map_from_links(iter_document_links(document, parser), output)
+            return True
+
+        key = incremental.manifest_key(output)
+        manifest: incremental.Manifest = self._cache.get(
+            key, default=incremental.Manifest()
+        )
+        options_hash = self._options_hash()
+        if manifest.options_hash != options_hash:
+            # The features themselves may differ, e.g. routes simplified otherwise.
+            manifest = incremental.Manifest()
+        with self.run_stats.phase("hash"):
+            document_hash = incremental.hash_document(document)
+        if manifest.document_hash == document_hash and all(
+            path.exists() for path in self._output_paths(output)
+        ):
+            if self._writes_delta:
+                # Viewers may have applied the last update already, and must not
+                # apply it again.
+                paths = exports.output_paths(output, self._formats)
+                if exports.OutputFormat.Kml in paths:
+                    kml_delta.write_empty_update(paths[exports.OutputFormat.Kml])
+            return False
+
+        with self.run_stats.phase("parse"):
+            links = list(iter_document_links(document, parser))
+            link_hashes = list(map(incremental.hash_link, links))
+
+        changed = {
+            link_hash: link
+            for link_hash, link in zip(link_hashes, links)
+            if link_hash not in manifest.features
+        }
+        self._log_links(changed.values())
+        known = manifest.features | dict(
+            zip(changed, self._maybe_features_from_links(list(changed.values())))
+        )
+
+        features = {link_hash: known[link_hash] for link_hash in link_hashes}
+        unresolved = set(self.run_stats.unresolved)
+        self.run_stats.links_seen += len(links)
+        self.run_stats.links_kept += sum(
+            known[link_hash] is not None for link_hash in link_hashes
+        )
+        self._save_map(filter(None, features.values()), output)
+        self._cache.set(
+            key,
+            incremental.Manifest(
+                document_hash=document_hash,
+                options_hash=options_hash,
+                # Links that failed to resolve are retried on the next build
+                features={
+                    link_hash: feature
+                    for link_hash, feature in features.items()
+                    if link_hash not in changed
+                    or changed[link_hash].address not in unresolved
+                },
+            ),
+            retry=True,
+        )
+        return True
+
+    def _options_hash(self) -> str:
+        """A hash of every option that changes what is written for a document."""
+        return incremental.hash_options(
+            self._categorizer.default,
+            self._categorizer.categories,
+            self._route_tolerance,
+            self._merge_radius,
+            self._merge_name_policy,
+            self._split_by,
+            self._max_layer_features,
+            self._folder_by,
+            self._formats,
+            self._delta,
+        )
+
+    @property
+    def _writes_delta(self) -> bool:
+        # Updates only know of folders per category, in a single file.
+        return (
+            self._delta
+            and self._split_by is layers.SplitBy.Nothing
+            and self._max_layer_features is None
+            and self._folder_by is layers.FolderBy.Category
+        )
+
+    def _output_paths(self, output: Path) -> list[Path]:
+        """The files written for the map at `output`, but for split layers."""
+        paths = exports.output_paths(output, self._formats)
+        if self._writes_delta and exports.OutputFormat.Kml in paths:
+            return [
+                *paths.values(),
+                kml_delta.update_path(paths[exports.OutputFormat.Kml]),
+            ]
+        return list(paths.values())
+
+    def _merge_points(self, features: Iterable[Feature]) -> list[Feature]:
+        lines: list[Feature] = []
+        points: list[Point] = []
+        for feature in features:
+            if isinstance(feature, Line):
+                lines.append(feature)
+            else:
+                points.append(feature)
+
+        with self.run_stats.phase("merge"):
+            merged = dedupe.merge_nearby_points(
+                points, self._merge_radius, self._merge_name_policy
+            )
+        return [*merged, *lines]
+
+    def _save_map(self, features: Iterable[Feature], output: Path):
+        """Write the features to the map a window at a time, in document order.
+
+        The styles at the top of the map are only known once every point has been
+        categorized, so placemarks are spooled per layer and folder until then.
+        Merging nearby points is the one step that needs all the features at once.
+        Maps in other formats are written next to `output` from the same features,
+        as is an update of the KML map since its previous build, with `delta`.
+        """
+        if self._merge_radius > 0:
+            features = self._merge_points(features)
+
+        paths = exports.output_paths(output, self._formats)
+        # Only the placemark IDs of the features are kept to drop duplicates, so that
+        # memory does not grow with the features themselves. They are 64-bit digests
+        # of what makes features equal, so a distinct placemark is only dropped on a
+        # digest collision, which would also give two placemarks of the map one ID.
+        seen: set[str] = set()
+        with contextlib.ExitStack() as stack:
+            splitter = None
+            if exports.OutputFormat.Kml in paths:
+                splitter = stack.enter_context(
+                    layers.Splitter(
+                        self._split_by,
+                        self._max_layer_features,
+                        ROUTES_FOLDER,
+                        self._folder_by,
+                    )
+                )
+            delta = None
+            if self._writes_delta and splitter is not None:
+                delta = stack.enter_context(
+                    kml_delta.Delta(
+                        self._cache.get(
+                            kml_delta.snapshot_key(paths[exports.OutputFormat.Kml])
+                        )
+                    )
+                )
+            exporters = [
+                stack.enter_context(exports.open_exporter(path, output_format))
+                for output_format, path in paths.items()
+                if output_format is not exports.OutputFormat.Kml
+            ]
+
+            for window in _windows(features, self._window):
+                new = [
+                    feature
+                    for feature in dict.fromkeys(window)
+                    if _placemark_id(feature) not in seen
+                ]
+                seen.update(map(_placemark_id, new))
+
+                with self.run_stats.phase("categorize"):
+                    points = [
+                        (point, categorize_point(point, self._categorizer))
+                        for point in new
+                        if isinstance(point, Point)
+                    ]
+
+                with self.run_stats.phase("write"):
+                    for point, category in points:
+                        lon, lat = point.coords.lon, point.coords.lat
+                        if splitter is not None:
+                            splitter.layer(point.headings, category.name).placemark(
+                                category.name,
+                                point.name,
+                                lon=lon,
+                                lat=lat,
+                                icon_code=category.icon_code,
+                                headings=point.headings,
+                            )
+                        if delta is not None:
+                            delta.placemark(
+                                category.name,
+                                point.name,
+                                lon=lon,
+                                lat=lat,
+                                icon_code=category.icon_code,
+                            )
+                        for exporter in exporters:
+                            exporter.point(
+                                point.name, lon, lat, category.name, point.headings
+                            )
+                    for line in new:
+                        if not isinstance(line, Line):
+                            continue
+                        if splitter is not None:
+                            splitter.layer(line.headings, ROUTES_FOLDER).line(
+                                line.name, line.coords, ROUTE_STYLE, line.headings
+                            )
+                        if delta is not None:
+                            delta.line(
+                                ROUTES_FOLDER, line.name, line.coords, ROUTE_STYLE
+                            )
+                        for exporter in exporters:
+                            exporter.line(
+                                line.name, line.coords, ROUTES_FOLDER, line.headings
+                            )
+
+            with self.run_stats.phase("write"):
+                if splitter is not None:
+                    layers.write_layers(paths[exports.OutputFormat.Kml], splitter)
+                if delta is not None:
+                    kml_path = paths[exports.OutputFormat.Kml]
+                    delta.write(kml_delta.update_path(kml_path), kml_path.name)
+                    self._cache.set(
+                        kml_delta.snapshot_key(kml_path), delta.snapshot(), retry=True
+                    )
+                stack.close()
 
     def __enter__(self):
         self._cache.__enter__()
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
+        self._links.close()
         self._cache.__exit__(None, None, None)
         return False
 
 
-class IconInfo(TypedDict):
-    name: str
-    color: str
+def _windows(items: Iterable[_T], size: int) -> Iterator[list[_T]]:
+    iterator = iter(items)
+    while window := list(itertools.islice(iterator, size)):
+        yield window
 
 
-class Category(enum.Enum):
-    Default = enum.auto()
-    Museum = enum.auto()
-    Travel = enum.auto()
-    Hotel = enum.auto()
-    Castle = enum.auto()
+def categorize_point(
+    point: Point, categorizer: categories.Categorizer | None = None
+) -> categories.Category:
+    categorizer = categorizer or categories.default_categorizer()
+    return categorizer.categorize(point.name, point.headings, *point.merged_headings)
 
-    @property
-    def icon_info(self) -> IconInfo:
-        match self:
-            case Category.Default:
-                return IconInfo(name="Pin", color="c2185b")
-            case Category.Travel:
-                return IconInfo(name="Train", color="1a237e")
-            case Category.Hotel:
-                return IconInfo(name="Hotel", color="795548")
-            case Category.Museum:
-                return IconInfo(name="Museum", color="d55322")
-            case Category.Castle:
-                return IconInfo(name="Historic Building", color="424242")
-
-
-def categorize_point(point: Point) -> Category:
-    if "station" in point.name.lower():
-        return Category.Travel
-    elif "bookings" in " ".join(point.headings).lower():
-        return Category.Hotel
-    elif "museum" in point.name.lower():
-        return Category.Museum
-    elif "castle" in point.name.lower():
-        return Category.Castle
-    return Category.Default
-
-
-app = typer.Typer()
+
+class DocumentParser(enum.Enum):
+    PythonDocx = "python-docx"
+    Stream = "stream"
+
+
+def iter_document_links(
+    document: Path, parser: DocumentParser = DocumentParser.PythonDocx
+) -> Iterator[document_parser.Link]:
+    """The links in a .docx, Markdown, HTML or ODT document, by its file type.
+
+    `parser` only applies to .docx documents.
+    """
+    reader = document_formats.reader_for(document)
+    if reader is not None:
+        yield from reader(document)
+        return
+
+    if parser is DocumentParser.Stream:
+        yield from docx_stream.iter_links_with_headings(document)
+        return
+
+    with document.open("rb") as f:
+        doc: docx.document.Document = docx.Document(f)
+    yield from iter_links_with_headings(doc)
+
+
+class _DefaultCommandGroup(typer.core.TyperGroup):
+    """Runs `main` unless a command is given, so `doc2map trip.docx` still works."""
+
+    # `ctx` is a context of the click that Typer bundles, which it does not export.
+    def parse_args(self, ctx: Any, args: list[str]) -> list[str]:
+        group_options = {name for param in self.get_params(ctx) for name in param.opts}
+        if args and args[0] not in self.commands and args[0] not in group_options:
+            args = ["main", *args]
+        return super().parse_args(ctx, args)
+
+
+app = typer.Typer(
+    cls=_DefaultCommandGroup,
+    help="Make a map of the links in a document. Without a command, runs main.",
+)
+
+
+def _load_categorizer(path: Path | None) -> categories.Categorizer:
+    if path is None:
+        return categories.default_categorizer()
+    try:
+        return categories.load(path)
+    except categories.CategoryError as e:
+        rich.print(f"[red]Invalid categories in {path}: {e}[/red]")
+        raise typer.Exit(code=1)
 
 
 @app.command()
 def main(
     document: Annotated[
-        Path, typer.Argument(help="The document to get map links from")
+        Path,
+        typer.Argument(help="The .docx, .md, .html or .odt document to get links from"),
+    ],
+    out: Annotated[
+        Path,
+        typer.Option(
+            help="The output map, compressed if it ends with .kmz, or GeoJSON"
+            " (.geojson), newline-delimited GeoJSON (.ndjson) or columnar (.tpcol)."
+            " When splitting, an index of the files, which are written next to it"
+        ),
     ],
-    out: Annotated[Path, typer.Option(help="The output map")],
     cache: Annotated[Path, typer.Option(help="Cache directory")],
+    concurrency: Annotated[
+        int, typer.Option(help="Maximum number of concurrent link resolutions")
+    ] = link_resolver.DEFAULT_CONCURRENCY,
+    rate_limit: Annotated[
+        float | None,
+        typer.Option(min=0, help="Maximum link resolutions per second"),
+    ] = None,
+    retries: Annotated[
+        int, typer.Option(min=0, help="Times to retry links that fail transiently")
+    ] = link_resolver.DEFAULT_RETRIES,
+    parser: Annotated[
+        DocumentParser, typer.Option(help="How to read .docx documents")
+    ] = DocumentParser.PythonDocx,
+    incremental: Annotated[
+        bool, typer.Option(help="Only rebuild what changed since the last build")
+    ] = False,
+    show_stats: Annotated[
+        bool,
+        typer.Option(
+            "--stats", help="Report phase timings, cache hit-rate and latencies"
+        ),
+    ] = False,
+    stats_json: Annotated[
+        Path | None, typer.Option(help="Write the statistics to a JSON file")
+    ] = None,
+    profile: Annotated[
+        Path | None, typer.Option(help="Write a cProfile dump of the build")
+    ] = None,
+    simplify_routes: Annotated[
+        float,
+        typer.Option(
+            help="Drop route waypoints within this many metres of the simplified route"
+        ),
+    ] = 0.0,
+    merge_radius: Annotated[
+        float, typer.Option(help="Merge points within this many metres of each other")
+    ] = 0.0,
+    merge_name: Annotated[
+        dedupe.NamePolicy, typer.Option(help="Which name merged points keep")
+    ] = dedupe.NamePolicy.First,
+    cache_ttl: Annotated[
+        float | None,
+        typer.Option(help="Re-resolve cached links after this many seconds"),
+    ] = None,
+    negative_cache_ttl: Annotated[
+        float,
+        typer.Option(help="Retry links that failed to resolve after this many seconds"),
+    ] = resolver_cache.DEFAULT_NEGATIVE_TTL,
+    offline: Annotated[
+        bool, typer.Option(help="Never resolve links, fail if one is not cached")
+    ] = False,
+    verbose: Annotated[
+        bool, typer.Option("--verbose", "-v", help="Print every link as it is read")
+    ] = False,
+    split: Annotated[
+        layers.SplitBy,
+        typer.Option(help="Write a file per top-level heading or per category"),
+    ] = layers.SplitBy.Nothing,
+    folders: Annotated[
+        layers.FolderBy,
+        typer.Option(
+            help="Put placemarks in a folder per category, or in folders nested like"
+            " the headings of the document"
+        ),
+    ] = layers.FolderBy.Category,
+    max_features: Annotated[
+        int | None,
+        typer.Option(
+            min=1,
+            help="Split files with more features than this, e.g. 2000 for My Maps",
+        ),
+    ] = None,
+    categories_file: Annotated[
+        Path | None,
+        typer.Option("--categories", help="TOML file with the categorization rules"),
+    ] = None,
+    formats: Annotated[
+        list[exports.OutputFormat] | None,
+        typer.Option(
+            "--format",
+            help="Also write the map in this format, next to the output",
+        ),
+    ] = None,
+    delta: Annotated[
+        bool,
+        typer.Option(
+            help="Also write a KML update with only the placemarks changed since the"
+            " last build, for viewers polling the map (*.update.kml)"
+        ),
+    ] = False,
 ):
+    if delta and (split is not layers.SplitBy.Nothing or max_features is not None):
+        rich.print("[red]--delta cannot be used with split maps[/red]")
+        raise typer.Exit(code=1)
+    if delta and folders is layers.FolderBy.Heading:
+        rich.print("[red]--delta cannot be used with --folders heading[/red]")
+        raise typer.Exit(code=1)
+
+    categorizer = _load_categorizer(categories_file)
+    profiler = cProfile.Profile() if profile is not None else None
+    with MapMaker.with_cache(
+        cache,
+        concurrency=concurrency,
+        route_tolerance=simplify_routes,
+        merge_radius=merge_radius,
+        merge_name_policy=merge_name,
+        cache_ttl=cache_ttl,
+        negative_cache_ttl=negative_cache_ttl,
+        offline=offline,
+        categorizer=categorizer,
+        verbose=verbose,
+        split_by=split,
+        max_layer_features=max_features,
+        folder_by=folders,
+        formats=formats or (),
+        rate_limit=rate_limit,
+        retries=retries,
+        delta=delta,
+    ) as map_maker:
+        if profiler is not None:
+            profiler.enable()
+        try:
+            if not map_maker.map_from_document(document, out, parser, incremental):
+                rich.print(f"{document} is unchanged, skipping")
+        except resolver_cache.CacheMiss as e:
+            rich.print(
+                f"[red]{len(e.args)} links are not cached, run `warm` first:[/red]"
+            )
+            for url in e.args:
+                rich.print(f"  {url}")
+            raise typer.Exit(code=1)
+        finally:
+            if profiler is not None and profile is not None:
+                profiler.disable()
+                profiler.dump_stats(profile)
+
+    if show_stats:
+        map_maker.run_stats.print()
+    if stats_json is not None:
+        stats_json.write_text(json.dumps(map_maker.run_stats.as_dict(), indent=2))
 
-    with document.open("rb") as f:
-        doc: docx.document.Document = docx.Document(f)
 
-    with MapMaker.with_cache(cache) as map_maker:
-        map_maker.map_from_docx(doc, out)
+@app.command()
+def warm(
+    documents: Annotated[
+        list[Path], typer.Argument(help="The documents to get map links from")
+    ],
+    cache: Annotated[Path, typer.Option(help="Cache directory")],
+    concurrency: Annotated[
+        int, typer.Option(help="Maximum number of concurrent link resolutions")
+    ] = link_resolver.DEFAULT_CONCURRENCY,
+    rate_limit: Annotated[
+        float | None,
+        typer.Option(min=0, help="Maximum link resolutions per second"),
+    ] = None,
+    retries: Annotated[
+        int, typer.Option(min=0, help="Times to retry links that fail transiently")
+    ] = link_resolver.DEFAULT_RETRIES,
+    parser: Annotated[
+        DocumentParser, typer.Option(help="How to read .docx documents")
+    ] = DocumentParser.PythonDocx,
+):
+    """Resolve every short link in the documents into the cache.
+
+    Builds using the same cache can then run with --offline.
+    """
+    with MapMaker.with_cache(
+        cache, concurrency=concurrency, rate_limit=rate_limit, retries=retries
+    ) as map_maker:
+        resolved = map_maker.warm(
+            link
+            for document in documents
+            for link in iter_document_links(document, parser)
+        )
+
+    failures = {
+        url: error
+        for url, error in resolved.items()
+        if isinstance(error, link_resolver.ResolutionError)
+    }
+    for url, error in failures.items():
+        rich.print(f"[red]FAILED[/red] {url}: {error}")
+    rich.print(
+        f"{len(resolved) - len(failures)} resolved,"
+        f" {map_maker.run_stats.cache_hits} already cached, {len(failures)} failed"
+    )
+
+    if failures:
+        raise typer.Exit(code=1)
+
+
+def _collect_documents(source: str) -> list[Path]:
+    if Path(source).is_dir():
+        return sorted(
+            path
+            for path in Path(source).iterdir()
+            if document_formats.is_supported(path)
+        )
+    return sorted(Path(path) for path in glob.glob(source, recursive=True))
+
+
+def _outputs(documents: list[Path], out_dir: Path) -> dict[Path, Path]:
+    """The map of each document, named after it, failing if two share a name."""
+    by_output: dict[Path, list[Path]] = {}
+    for document in documents:
+        by_output.setdefault(out_dir / f"{document.stem}.kml", []).append(document)
+
+    clashes = {output: docs for output, docs in by_output.items() if len(docs) > 1}
+    for output, docs in clashes.items():
+        rich.print(
+            f"[red]{', '.join(map(str, docs))} would all be written to {output}[/red]"
+        )
+    if clashes:
+        raise typer.Exit(code=1)
+    return {docs[0]: output for output, docs in by_output.items()}
+
+
+_batch_map_maker: MapMaker | None = None
+
+
+def _init_batch_worker(
+    cache_dir: Path,
+    concurrency: int,
+    offline: bool,
+    categories_file: Path | None,
+    verbose: bool,
+    rate_limit: float | None = None,
+    retries: int = link_resolver.DEFAULT_RETRIES,
+) -> None:
+    # Each worker opens the shared cache once and reuses it for all its documents.
+    global _batch_map_maker
+    _batch_map_maker = MapMaker.with_cache(
+        cache_dir,
+        concurrency=concurrency,
+        offline=offline,
+        rate_limit=rate_limit,
+        retries=retries,
+        categorizer=categories.load(categories_file) if categories_file else None,
+        verbose=verbose,
+    )
+
+
+def _convert_in_worker(
+    document: Path, output: Path, parser: DocumentParser, incremental: bool
+) -> None:
+    assert _batch_map_maker is not None, "worker was not initialized"
+    _batch_map_maker.with_fresh_stats().map_from_document(
+        document, output, parser, incremental
+    )
+
+
+@app.command()
+def batch(
+    source: Annotated[
+        str, typer.Argument(help="A directory of documents, or a glob pattern")
+    ],
+    out_dir: Annotated[Path, typer.Option(help="Directory for the output maps")],
+    cache: Annotated[Path, typer.Option(help="Cache directory")],
+    jobs: Annotated[int | None, typer.Option(help="Number of worker processes")] = None,
+    concurrency: Annotated[
+        int, typer.Option(help="Maximum number of concurrent link resolutions")
+    ] = link_resolver.DEFAULT_CONCURRENCY,
+    rate_limit: Annotated[
+        float | None,
+        typer.Option(min=0, help="Maximum link resolutions per second"),
+    ] = None,
+    retries: Annotated[
+        int, typer.Option(min=0, help="Times to retry links that fail transiently")
+    ] = link_resolver.DEFAULT_RETRIES,
+    parser: Annotated[
+        DocumentParser, typer.Option(help="How to read .docx documents")
+    ] = DocumentParser.PythonDocx,
+    incremental: Annotated[
+        bool, typer.Option(help="Only rebuild what changed since the last build")
+    ] = False,
+    offline: Annotated[
+        bool, typer.Option(help="Never resolve links, fail if one is not cached")
+    ] = False,
+    verbose: Annotated[
+        bool, typer.Option("--verbose", "-v", help="Print every link as it is read")
+    ] = False,
+    categories_file: Annotated[
+        Path | None,
+        typer.Option("--categories", help="TOML file with the categorization rules"),
+    ] = None,
+):
+    # Report invalid rules once, rather than from every worker.
+    _load_categorizer(categories_file)
+    documents = _collect_documents(source)
+    if not documents:
+        rich.print(f"[red]No documents found in {source}[/red]")
+        raise typer.Exit(code=1)
+
+    outputs = _outputs(documents, out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    failures: dict[Path, BaseException] = {}
+    workers = min(jobs or os.cpu_count() or 1, len(documents))
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_batch_worker,
+        initargs=(
+            cache,
+            concurrency,
+            offline,
+            categories_file,
+            verbose,
+            # The limit is shared out between the workers.
+            rate_limit / workers if rate_limit else None,
+            retries,
+        ),
+    ) as executor:
+        futures = {
+            executor.submit(
+                _convert_in_worker,
+                document,
+                outputs[document],
+                parser,
+                incremental,
+            ): document
+            for document in documents
+        }
+        for future in concurrent.futures.as_completed(futures):
+            if (error := future.exception()) is not None:
+                failures[futures[future]] = error
+
+    for document in documents:
+        if document in failures:
+            rich.print(f"[red]FAILED[/red] {document}: {failures[document]!r}")
+        else:
+            rich.print(f"[green]OK[/green]     {document}")
+    rich.print(f"{len(documents) - len(failures)} succeeded, {len(failures)} failed")
+
+    if failures:
+        raise typer.Exit(code=1)
+
+
+@app.command()
+def watch(
+    documents: Annotated[list[Path], typer.Argument(help="The documents to watch")],
+    out_dir: Annotated[Path, typer.Option(help="Directory for the output maps")],
+    cache: Annotated[Path, typer.Option(help="Cache directory")],
+    concurrency: Annotated[
+        int, typer.Option(help="Maximum number of concurrent link resolutions")
+    ] = link_resolver.DEFAULT_CONCURRENCY,
+    rate_limit: Annotated[
+        float | None,
+        typer.Option(min=0, help="Maximum link resolutions per second"),
+    ] = None,
+    retries: Annotated[
+        int, typer.Option(min=0, help="Times to retry links that fail transiently")
+    ] = link_resolver.DEFAULT_RETRIES,
+    parser: Annotated[
+        DocumentParser, typer.Option(help="How to read .docx documents")
+    ] = DocumentParser.Stream,
+    interval: Annotated[
+        float, typer.Option(help="Seconds between checks for saved documents")
+    ] = watcher.DEFAULT_INTERVAL,
+    debounce: Annotated[
+        float,
+        typer.Option(help="Seconds a document must stay unchanged before rebuilding"),
+    ] = watcher.DEFAULT_DEBOUNCE,
+    verbose: Annotated[
+        bool, typer.Option("--verbose", "-v", help="Print every link as it is read")
+    ] = False,
+    categories_file: Annotated[
+        Path | None,
+        typer.Option("--categories", help="TOML file with the categorization rules"),
+    ] = None,
+    folders: Annotated[
+        layers.FolderBy,
+        typer.Option(
+            help="Put placemarks in a folder per category, or in folders nested like"
+            " the headings of the document"
+        ),
+    ] = layers.FolderBy.Category,
+    delta: Annotated[
+        bool,
+        typer.Option(
+            help="Also write a KML update with only the placemarks changed since the"
+            " last build, for viewers polling the map (*.update.kml)"
+        ),
+    ] = False,
+):
+    """Rebuild the map of each document whenever it is saved."""
+    if delta and folders is layers.FolderBy.Heading:
+        rich.print("[red]--delta cannot be used with --folders heading[/red]")
+        raise typer.Exit(code=1)
+    outputs = _outputs(documents, out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    categorizer = _load_categorizer(categories_file)
+    with MapMaker.with_cache(
+        cache,
+        concurrency=concurrency,
+        categorizer=categorizer,
+        verbose=verbose,
+        rate_limit=rate_limit,
+        retries=retries,
+        folder_by=folders,
+        delta=delta,
+    ) as map_maker:
+
+        def rebuild(document: Path) -> None:
+            start = time.perf_counter()
+            try:
+                built = map_maker.with_fresh_stats().map_from_document(
+                    document, outputs[document], parser, incremental_build=True
+                )
+            except (
+                *document_formats.INVALID_DOCUMENT_ERRORS,
+                OSError,
+                link_resolver.ResolutionError,
+            ) as e:
+                # A half-written document is expected now and then, keep watching.
+                rich.print(f"[red]FAILED[/red] {document}: {e!r}")
+                return
+            if built:
+                elapsed = time.perf_counter() - start
+                rich.print(f"Rebuilt {outputs[document]} in {elapsed * 1000:.0f}ms")
+
+        for document in documents:
+            rebuild(document)
+        rich.print("Watching for changes, press Ctrl+C to stop")
+        try:
+            watcher.watch(documents, rebuild, interval=interval, debounce=debounce)
+        except KeyboardInterrupt:
+            pass
+
+
+@app.command()
+def serve(
+    cache: Annotated[Path, typer.Option(help="Cache directory")],
+    host: Annotated[
+        str, typer.Option(help="Address to listen on")
+    ] = server.DEFAULT_HOST,
+    port: Annotated[int, typer.Option(help="Port to listen on")] = server.DEFAULT_PORT,
+    concurrency: Annotated[
+        int, typer.Option(help="Maximum number of concurrent link resolutions")
+    ] = link_resolver.DEFAULT_CONCURRENCY,
+    rate_limit: Annotated[
+        float | None,
+        typer.Option(min=0, help="Maximum link resolutions per second"),
+    ] = None,
+    retries: Annotated[
+        int, typer.Option(min=0, help="Times to retry links that fail transiently")
+    ] = link_resolver.DEFAULT_RETRIES,
+    parser: Annotated[
+        DocumentParser, typer.Option(help="How to read .docx documents")
+    ] = DocumentParser.Stream,
+    categories_file: Annotated[
+        Path | None,
+        typer.Option("--categories", help="TOML file with the categorization rules"),
+    ] = None,
+):
+    """Serve document to map conversions over HTTP."""
+    categorizer = _load_categorizer(categories_file)
+    with (
+        link_resolver.PooledResolver(
+            concurrency=concurrency,
+            policy=link_resolver.ResolverPolicy.create(rate_limit, retries),
+        ) as resolver,
+        MapMaker.with_cache(
+            cache, resolver=resolver, categorizer=categorizer
+        ) as map_maker,
+        server.make_server(
+            server.ConversionApp(map_maker, parser), host, port
+        ) as http_server,
+    ):
+        rich.print(f"Serving on http://{host}:{http_server.server_port}/convert")
+        try:
+            http_server.serve_forever()
+        except KeyboardInterrupt:
+            pass
 
 
 if __name__ == "__main__":
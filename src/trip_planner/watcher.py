@@ -0,0 +1,79 @@
+"""Notice when documents are saved.
+
+Files are polled rather than watched through OS notifications, which needs no extra
+dependency and behaves the same on every platform and on network drives. A change
+is only reported once the file has stopped changing for the debounce period, since
+editors often save in several writes.
+"""
+
+import time
+import typing
+from pathlib import Path
+
+import attrs
+
+DEFAULT_INTERVAL = 0.1
+DEFAULT_DEBOUNCE = 0.25
+
+# Modification time and size, or `None` while the file does not exist.
+_Signature = tuple[int, int] | None
+
+
+def _signature(path: Path) -> _Signature:
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+@attrs.define
+class Watcher:
+    paths: list[Path]
+    debounce: float = DEFAULT_DEBOUNCE
+    _clock: typing.Callable[[], float] = time.monotonic
+    _seen: dict[Path, _Signature] = attrs.field(init=False)
+    # The latest signature of each changing file, and when it was first seen.
+    _pending: dict[Path, tuple[_Signature, float]] = attrs.field(
+        factory=dict, init=False
+    )
+
+    def __attrs_post_init__(self) -> None:
+        self._seen = {path: _signature(path) for path in self.paths}
+
+    def poll(self) -> list[Path]:
+        """Return the files whose changes have settled since they were last returned.
+
+        Files that were deleted are not returned, but are once they reappear.
+        """
+        now = self._clock()
+        settled = []
+        for path in self.paths:
+            signature = _signature(path)
+            if signature == self._seen[path]:
+                self._pending.pop(path, None)
+                continue
+
+            pending = self._pending.get(path)
+            if pending is None or pending[0] != signature:
+                self._pending[path] = (signature, now)
+            elif now - pending[1] >= self.debounce:
+                del self._pending[path]
+                self._seen[path] = signature
+                if signature is not None:
+                    settled.append(path)
+        return settled
+
+
+def watch(
+    paths: list[Path],
+    on_change: typing.Callable[[Path], None],
+    interval: float = DEFAULT_INTERVAL,
+    debounce: float = DEFAULT_DEBOUNCE,
+) -> typing.NoReturn:
+    """Call `on_change` with every file that is saved, until interrupted."""
+    watcher = Watcher(paths, debounce=debounce)
+    while True:
+        for path in watcher.poll():
+            on_change(path)
+        time.sleep(interval)
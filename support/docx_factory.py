@@ -0,0 +1,71 @@
+"""Build small .docx itineraries for tests and benchmarks."""
+
+from collections.abc import Sequence
+from pathlib import Path
+
+import attrs
+import docx
+import docx.document
+import docx.opc.constants
+import docx.oxml
+import docx.oxml.ns
+import docx.text.paragraph
+
+
+@attrs.frozen
+class Heading:
+    level: int
+    text: str
+
+
+@attrs.frozen
+class Hyperlink:
+    text: str
+    address: str
+
+
+@attrs.frozen
+class Table:
+    rows: list[list[Hyperlink]]
+
+
+Entry = Heading | Hyperlink | Table
+
+
+def add_hyperlink(
+    paragraph: docx.text.paragraph.Paragraph, text: str, address: str
+) -> None:
+    r_id = paragraph.part.relate_to(
+        address, docx.opc.constants.RELATIONSHIP_TYPE.HYPERLINK, is_external=True
+    )
+    hyperlink = docx.oxml.OxmlElement("w:hyperlink")
+    hyperlink.set(docx.oxml.ns.qn("r:id"), r_id)
+    run = docx.oxml.OxmlElement("w:r")
+    run_text = docx.oxml.OxmlElement("w:t")
+    run_text.text = text
+    run.append(run_text)
+    hyperlink.append(run)
+    paragraph._p.append(hyperlink)
+
+
+def build_document(entries: Sequence[Entry]) -> docx.document.Document:
+    document = docx.Document()
+    for entry in entries:
+        match entry:
+            case Heading(level=level, text=text):
+                document.add_heading(text, level=level)
+            case Hyperlink(text=text, address=address):
+                add_hyperlink(document.add_paragraph(), text, address)
+            case Table(rows=rows):
+                table = document.add_table(
+                    rows=len(rows), cols=max(map(len, rows), default=0)
+                )
+                for row, links in zip(table.rows, rows):
+                    for cell, link in zip(row.cells, links):
+                        add_hyperlink(cell.paragraphs[0], link.text, link.address)
+    return document
+
+
+def write_document(path: Path, entries: Sequence[Entry]) -> Path:
+    build_document(entries).save(str(path))
+    return path
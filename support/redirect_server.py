@@ -0,0 +1,122 @@
+"""A local stand-in for the goo.gl link shortener.
+
+The server answers every known path with a redirect to the configured long URL, so
+link resolution can be exercised without touching the network. It can also be told
+to fail the next requests for a path, to exercise throttling and outages.
+"""
+
+import collections
+import http.server
+import threading
+import time
+import typing
+import urllib.parse
+
+import attrs
+import httpx
+
+
+class _Server(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    # Concurrent clients open many connections at once
+    request_queue_size = 128
+
+
+@attrs.define
+class RedirectServer:
+    redirects: dict[str, str] = attrs.field(factory=dict)
+    latency: float = 0.0
+    requests: collections.Counter[str] = attrs.field(factory=collections.Counter)
+    _failures: dict[str, collections.deque[int]] = attrs.field(factory=dict, init=False)
+    _lock: threading.Lock = attrs.field(factory=threading.Lock, init=False)
+    _server: _Server | None = attrs.field(default=None, init=False)
+    _thread: threading.Thread | None = attrs.field(default=None, init=False)
+
+    @property
+    def address(self) -> str:
+        assert self._server is not None, "server is not running"
+        host, port = self._server.server_address[:2]
+        return f"http://{host!s}:{port}"
+
+    def add(self, short_url: str, long_url: str) -> None:
+        self.redirects[urllib.parse.urlsplit(short_url).path] = long_url
+
+    def fail(self, short_url: str, *statuses: int) -> None:
+        """Answer the next requests for the URL with these statuses, in order.
+
+        A 429 asks to retry straight away, and 0 drops the connection unanswered.
+        """
+        path = urllib.parse.urlsplit(short_url).path
+        with self._lock:
+            self._failures.setdefault(path, collections.deque()).extend(statuses)
+
+    def _next_failure(self, path: str) -> int | None:
+        with self._lock:
+            self.requests[path] += 1
+            failures = self._failures.get(path)
+            return failures.popleft() if failures else None
+
+    def _make_handler(self) -> type[http.server.BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                if server.latency:
+                    time.sleep(server.latency)
+                path = urllib.parse.urlsplit(self.path).path
+                location = server.redirects.get(path)
+                failure = server._next_failure(path)
+                if failure == 0:
+                    self.close_connection = True
+                    return
+                if failure is not None:
+                    self.send_response(failure)
+                    if failure == 429:
+                        self.send_header("Retry-After", "0")
+                elif location is None:
+                    self.send_response(404)
+                else:
+                    self.send_response(302)
+                    self.send_header("Location", location)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self) -> typing.Self:
+        self._server = _Server(("127.0.0.1", 0), self._make_handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        assert self._server is not None and self._thread is not None
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+        return False
+
+    def transport(self) -> httpx.AsyncBaseTransport:
+        """An async transport that sends every request to this server instead."""
+        return _RewritingTransport(self.address)
+
+
+class _RewritingTransport(httpx.AsyncBaseTransport):
+    def __init__(self, address: str):
+        self._target = httpx.URL(address)
+        self._inner = httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        request.url = request.url.copy_with(
+            scheme=self._target.scheme, host=self._target.host, port=self._target.port
+        )
+        request.headers["host"] = self._target.netloc.decode()
+        return await self._inner.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        await self._inner.aclose()
@@ -0,0 +1,9 @@
+import pytest
+
+from support.redirect_server import RedirectServer
+
+
+@pytest.fixture
+def redirect_server():
+    with RedirectServer() as server:
+        yield server
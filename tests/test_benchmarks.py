@@ -0,0 +1,12 @@
+from benchmarks import pipeline
+
+
+def test_pipeline_benchmark(tmp_path):
+    params = pipeline.Params(
+        days=1, cities_per_day=1, links_per_city=2, table_rows=1, latency=0
+    )
+    results = pipeline.run(params, tmp_path)
+
+    assert results["links"] == results["points"] == 5
+    assert results["short_links"] == 2
+    assert set(results["stages"]) >= {"parse_stream", "resolve_cold", "write_kml"}
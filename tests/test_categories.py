@@ -0,0 +1,125 @@
+import pytest
+
+from trip_planner import categories
+from trip_planner.categories import CategoryError
+
+
+@pytest.mark.parametrize(
+    "name, headings, expected",
+    [
+        ("Himeji Castle", ["Day 1"], "Castle"),
+        ("Kyoto Station", ["Bookings"], "Travel"),
+        ("Ghibli Museum", ["Day 2"], "Museum"),
+        ("Castle Museum", [], "Museum"),
+        ("Some Hotel", ["Japan", "Hotel Bookings"], "Hotel"),
+        ("Nara Park", ["Day 3"], "Default"),
+        ("MUSEUM OF ART", [], "Museum"),
+    ],
+)
+def test_default_rules(name, headings, expected):
+    categorizer = categories.default_categorizer()
+
+    assert categorizer.categorize(name, headings).name == expected
+
+
+RULES = """
+[default]
+name = "Other"
+icon = "Pin"
+color = "c2185b"
+
+[[category]]
+name = "Food"
+icon = "Restaurant"
+color = "f57c00"
+priority = 1
+name_keywords = ["ramen", "sushi"]
+heading_keywords = ["food"]
+
+[[category]]
+name = "Shrines"
+icon = "Temple"
+color = "424242"
+priority = 5
+name_keywords = ["shrine", "ramen shrine"]
+
+[[category]]
+name = "Also food"
+icon = "Restaurant"
+color = "000000"
+priority = 1
+name_keywords = ["udon"]
+"""
+
+
+@pytest.mark.parametrize(
+    "name, headings, expected",
+    [
+        ("Ichiran Ramen", [], "Food"),
+        ("Fushimi Inari Shrine", ["Food"], "Shrines"),
+        ("Anywhere", ["Food tour"], "Food"),
+        # "ramen" starts earlier, but the overlapping "ramen shrine" is preferred.
+        ("The Ramen Shrine", [], "Shrines"),
+        # Equal priorities keep the order of the file.
+        ("Udon and Sushi", [], "Food"),
+        ("Udon", [], "Also food"),
+        ("Park", ["Day 1"], "Other"),
+        ("Ramen", ["Food", "Shrine"], "Food"),
+    ],
+)
+def test_custom_rules(name, headings, expected):
+    categorizer = categories.loads(RULES)
+
+    assert categorizer.categorize(name, headings).name == expected
+
+
+def test_heading_matches_do_not_span_headings():
+    categorizer = categories.loads(RULES.replace('"food"]', '"food tour"]'))
+
+    assert categorizer.categorize("Park", ["Food", "Tour"]).name == "Other"
+
+
+def test_any_heading_path_matches():
+    categorizer = categories.loads(RULES)
+
+    assert categorizer.categorize("Park", ["Day 1"], ["Food tour"]).name == "Food"
+    assert categorizer.categorize("Park").name == "Other"
+
+
+@pytest.mark.parametrize(
+    "rules, message",
+    [
+        ("[default\n", "Expected"),
+        ('[[category]]\nname = "A"\nicon = "Pin"\ncolor = "000000"', "default"),
+        (RULES.replace('"Temple"', '"Shrine"'), "unknown icon 'Shrine'"),
+        (RULES.replace('"f57c00"', '"orange"'), "RGB hex"),
+        (RULES.replace("priority = 5", "weight = 5"), "weight"),
+        (
+            RULES.replace("priority = 5", 'priority = "high"'),
+            "priority must be an integer",
+        ),
+        (
+            RULES.replace("priority = 5", "priority = true"),
+            "priority must be an integer",
+        ),
+        (RULES.replace('"f57c00"', "0xf57c00"), "color must be a string"),
+        (RULES.replace('name = "Food"', "name = 1"), "name must be a string"),
+        (
+            RULES.replace('["ramen", "sushi"]', '"station"'),
+            "name_keywords must be a list of strings",
+        ),
+        (RULES.replace('["ramen", "sushi"]', '["ramen", 1]'), "list of strings"),
+        ("default = 1", "default must be a table"),
+        (f"category = 1\n{RULES.split('[[category]]')[0]}", "\\[\\[category\\]\\]"),
+    ],
+)
+def test_invalid_rules(rules, message):
+    with pytest.raises(CategoryError, match=message):
+        categories.loads(rules)
+
+
+def test_load_from_file(tmp_path):
+    path = tmp_path / "categories.toml"
+    path.write_text(RULES)
+
+    assert categories.load(path).categorize("Sushi bar", []).icon == "Restaurant"
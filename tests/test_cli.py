@@ -0,0 +1,491 @@
+import json
+import pstats
+import xml.etree.ElementTree as ET
+
+import pytest
+from typer.testing import CliRunner
+
+from support.docx_factory import Heading, Hyperlink, write_document
+from trip_planner.trip_planner import (
+    DocumentParser,
+    MapMaker,
+    app,
+    iter_document_links,
+)
+
+HIMEJI_CASTLE = "https://www.google.com/maps/place/Himeji+Castle/@34.8394534,134.6913298,17z/data=!3m1!4b1!4m6!3m5!1s0x3554e003a23324b3:0x7a4f8c2f6eba81b1!8m2!3d34.839449!4d134.6939047!16zL20vMDE4bmN4?entry=ttu"
+NARA_PARK = "https://www.google.com/maps/place/Nara+Park/@34.6850514,135.8404371,17z/data=!3m1!4b1!4m6!3m5!1s0x60013996bd8c6061:0xf96cacf357447456!8m2!3d34.685047!4d135.843012!16s%2Fm%2F02pwmjl?entry=ttu"
+
+runner = CliRunner()
+
+
+def test_batch(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    write_document(
+        docs / "himeji.docx",
+        [Heading(1, "Day 1"), Hyperlink("Himeji Castle", HIMEJI_CASTLE)],
+    )
+    write_document(
+        docs / "nara.docx", [Heading(1, "Day 2"), Hyperlink("Nara Park", NARA_PARK)]
+    )
+
+    out = tmp_path / "out"
+    result = runner.invoke(
+        app,
+        ["batch", str(docs), "--out-dir", str(out), "--cache", str(tmp_path / "c")],
+    )
+
+    assert result.exit_code == 0, result.output
+    assert "Himeji Castle" in (out / "himeji.kml").read_text()
+    assert "Nara Park" in (out / "nara.kml").read_text()
+
+
+def test_batch_reports_failures(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    write_document(docs / "good.docx", [Hyperlink("Nara Park", NARA_PARK)])
+    (docs / "broken.docx").write_text("not a document")
+
+    out = tmp_path / "out"
+    result = runner.invoke(
+        app,
+        [
+            "batch",
+            str(docs / "*.docx"),
+            "--out-dir",
+            str(out),
+            "--cache",
+            str(tmp_path / "c"),
+        ],
+    )
+
+    assert result.exit_code == 1
+    assert "1 succeeded, 1 failed" in result.output
+    assert (out / "good.kml").exists()
+    assert not (out / "broken.kml").exists()
+
+
+@pytest.mark.parametrize("parser", ["python-docx", "stream"])
+def test_main(tmp_path, parser):
+    document = write_document(
+        tmp_path / "trip.docx",
+        [Heading(1, "Day 1"), Hyperlink("Himeji Castle", HIMEJI_CASTLE)],
+    )
+    out = tmp_path / "trip.kml"
+    result = runner.invoke(
+        app,
+        [
+            "main",
+            str(document),
+            "--out",
+            str(out),
+            "--cache",
+            str(tmp_path / "c"),
+            "--parser",
+            parser,
+        ],
+    )
+
+    assert result.exit_code == 0, result.output
+    assert "Himeji Castle" in out.read_text()
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ["{document}", "--out", "{out}", "--cache", "{cache}"],
+        ["--out", "{out}", "--cache", "{cache}", "{document}"],
+    ],
+)
+def test_main_is_the_default_command(tmp_path, args):
+    document = write_document(
+        tmp_path / "trip.docx", [Hyperlink("Himeji Castle", HIMEJI_CASTLE)]
+    )
+    out = tmp_path / "trip.kml"
+    paths = {"document": document, "out": out, "cache": tmp_path / "c"}
+    result = runner.invoke(app, [arg.format(**paths) for arg in args])
+
+    assert result.exit_code == 0, result.output
+    assert "Himeji Castle" in out.read_text()
+
+
+def test_main_stats_and_profile(tmp_path, redirect_server):
+    redirect_server.add("https://goo.gl/maps/nara", NARA_PARK)
+    document = write_document(
+        tmp_path / "trip.docx",
+        [
+            Hyperlink("Himeji Castle", HIMEJI_CASTLE),
+            Hyperlink("Nara Park", "https://goo.gl/maps/nara"),
+            Hyperlink("Not a map", "https://example.com"),
+        ],
+    )
+    stats_json = tmp_path / "stats.json"
+    profile = tmp_path / "build.prof"
+
+    with MapMaker.with_cache(
+        tmp_path / "c", transport=redirect_server.transport()
+    ) as map_maker:
+        map_maker._prefetch_short_links(
+            list(iter_document_links(document, DocumentParser.Stream))
+        )
+
+    result = runner.invoke(
+        app,
+        [
+            "main",
+            str(document),
+            "--out",
+            str(tmp_path / "trip.kml"),
+            "--cache",
+            str(tmp_path / "c"),
+            "--stats",
+            "--stats-json",
+            str(stats_json),
+            "--profile",
+            str(profile),
+        ],
+    )
+
+    assert result.exit_code == 0, result.output
+    assert "Build statistics" in result.output
+    stats = json.loads(stats_json.read_text())
+    assert set(stats["phases"]) == {"parse", "resolve", "categorize", "write"}
+    assert stats["links"] == {"seen": 3, "kept": 2, "dropped": 1}
+    assert stats["cache"] == {"hits": 1, "misses": 0}
+    assert pstats.Stats(str(profile)).get_stats_profile().func_profiles
+
+
+def test_main_routes(tmp_path):
+    directions = "https://www.google.com/maps/dir/Magome,+Nakatsugawa,+Gifu,+Japan/Tsumago-juku,+Azuma,+Nagiso,+Kiso+District,+Nagano+399-5302,+Japan/Tadachi+%E7%94%B0%E7%AB%8B/@35.5541856,137.5632207,14z/data=!4m20!4m19!1m5!1m1!1s0x601cb71add823007:0x7d766e65361116fa!2m2!1d137.5717516!2d35.5315174!1m5!1m1!1s0x601cb7e4a598bb33:0x87bc2c35315036f6!2m2!1d137.5956667!2d35.5775876!1m5!1m1!1s0x601cc9bd3ccb26ed:0x1b1560620d4ac8d0!2m2!1d137.5489597!2d35.5882476!3e2?entry=ttu"
+    document = write_document(
+        tmp_path / "trip.docx",
+        [
+            Hyperlink("Himeji Castle", HIMEJI_CASTLE),
+            Hyperlink("Nakasendo", directions),
+        ],
+    )
+    out = tmp_path / "trip.kml"
+    result = runner.invoke(
+        app,
+        [
+            "main",
+            str(document),
+            "--out",
+            str(out),
+            "--cache",
+            str(tmp_path / "c"),
+            "--simplify-routes",
+            "100000",
+        ],
+    )
+
+    assert result.exit_code == 0, result.output
+    kml = out.read_text()
+    assert "<name>Routes</name>" in kml
+    assert "<name>Nakasendo</name>" in kml
+    # Simplified down to its endpoints
+    assert "137.5717516,35.5315174,0.0 137.5489597,35.5882476,0.0" in kml
+
+
+def test_main_offline_fails_on_uncached_links(tmp_path):
+    document = write_document(
+        tmp_path / "trip.docx",
+        [Hyperlink("Somewhere", "https://goo.gl/maps/uncached")],
+    )
+    result = runner.invoke(
+        app,
+        [
+            "main",
+            str(document),
+            "--out",
+            str(tmp_path / "trip.kml"),
+            "--cache",
+            str(tmp_path / "c"),
+            "--offline",
+        ],
+    )
+
+    assert result.exit_code == 1
+    assert "https://goo.gl/maps/uncached" in result.output
+    assert not (tmp_path / "trip.kml").exists()
+
+
+def test_warm_without_short_links(tmp_path):
+    document = write_document(
+        tmp_path / "trip.docx", [Hyperlink("Nara Park", NARA_PARK)]
+    )
+    result = runner.invoke(app, ["warm", str(document), "--cache", str(tmp_path)])
+
+    assert result.exit_code == 0, result.output
+    assert "0 resolved, 0 already cached, 0 failed" in result.output
+
+
+def test_main_with_custom_categories(tmp_path):
+    rules = tmp_path / "categories.toml"
+    rules.write_text(
+        '[default]\nname = "Sights"\nicon = "Pin"\ncolor = "c2185b"\n'
+        '[[category]]\nname = "Parks"\nicon = "Park"\ncolor = "388e3c"\n'
+        'name_keywords = ["park"]\n'
+    )
+    document = write_document(
+        tmp_path / "trip.docx",
+        [Hyperlink("Nara Park", NARA_PARK), Hyperlink("Himeji", HIMEJI_CASTLE)],
+    )
+    out = tmp_path / "trip.kml"
+
+    result = runner.invoke(
+        app,
+        [
+            "main",
+            str(document),
+            "--out",
+            str(out),
+            "--cache",
+            str(tmp_path / "c"),
+            "--categories",
+            str(rules),
+        ],
+    )
+
+    assert result.exit_code == 0, result.output
+    kml = out.read_text()
+    assert "<name>Parks</name>" in kml
+    assert "<name>Sights</name>" in kml
+
+
+def test_main_rejects_invalid_categories(tmp_path):
+    rules = tmp_path / "categories.toml"
+    rules.write_text('[default]\nname = "Sights"\nicon = "Nope"\ncolor = "c2185b"\n')
+    document = write_document(tmp_path / "trip.docx", [])
+
+    result = runner.invoke(
+        app,
+        [
+            "main",
+            str(document),
+            "--out",
+            str(tmp_path / "trip.kml"),
+            "--cache",
+            str(tmp_path / "c"),
+            "--categories",
+            str(rules),
+        ],
+    )
+
+    assert result.exit_code == 1
+    assert "unknown icon 'Nope'" in result.output
+
+
+@pytest.mark.parametrize("verbose", [True, False])
+def test_main_prints_links_when_verbose(tmp_path, verbose):
+    document = write_document(tmp_path / "trip.docx", [Hyperlink("Nara", NARA_PARK)])
+    args = [
+        "main",
+        str(document),
+        "--out",
+        str(tmp_path / "trip.kml"),
+        "--cache",
+        str(tmp_path / "c"),
+    ]
+
+    result = runner.invoke(app, [*args, "-v"] if verbose else args)
+
+    assert result.exit_code == 0, result.output
+    assert ("text='Nara'" in result.output) == verbose
+
+
+def test_main_splits_layers(tmp_path):
+    document = write_document(
+        tmp_path / "trip.docx",
+        [
+            Heading(1, "Day 1"),
+            Hyperlink("Himeji Castle", HIMEJI_CASTLE),
+            Heading(1, "Day 2"),
+            Hyperlink("Nara Park", NARA_PARK),
+            Hyperlink("Nara Park again", NARA_PARK),
+        ],
+    )
+    out = tmp_path / "out" / "trip.kml"
+    out.parent.mkdir()
+
+    result = runner.invoke(
+        app,
+        [
+            "main",
+            str(document),
+            "--out",
+            str(out),
+            "--cache",
+            str(tmp_path / "c"),
+            "--split",
+            "heading",
+            "--max-features",
+            "1",
+        ],
+    )
+
+    assert result.exit_code == 0, result.output
+    assert sorted(path.name for path in out.parent.iterdir()) == [
+        "trip-01-day-1.kml",
+        "trip-02-day-2.kml",
+        "trip-03-day-2-2.kml",
+        "trip.kml",
+    ]
+    assert "Nara Park again" in (out.parent / "trip-03-day-2-2.kml").read_text()
+    assert "trip-02-day-2.kml" in out.read_text()
+
+
+def test_main_writes_other_formats(tmp_path):
+    document = write_document(
+        tmp_path / "trip.docx",
+        [Heading(1, "Day 2"), Hyperlink("Nara Park", NARA_PARK)],
+    )
+    out = tmp_path / "trip.geojson"
+
+    result = runner.invoke(
+        app,
+        [
+            "main",
+            str(document),
+            "--out",
+            str(out),
+            "--cache",
+            str(tmp_path / "c"),
+            "--format",
+            "ndjson",
+            "--format",
+            "columnar",
+        ],
+    )
+
+    assert result.exit_code == 0, result.output
+    assert sorted(path.name for path in tmp_path.glob("trip.*")) == [
+        "trip.docx",
+        "trip.geojson",
+        "trip.ndjson",
+        "trip.tpcol",
+    ]
+    (feature,) = json.loads(out.read_text())["features"]
+    assert feature["properties"]["name"] == "Nara Park"
+    assert feature["properties"]["headings"] == ["Day 2"]
+    assert json.loads((tmp_path / "trip.ndjson").read_text()) == feature
+
+
+def test_main_nests_folders_by_heading(tmp_path):
+    document = write_document(
+        tmp_path / "trip.docx",
+        [
+            Heading(1, "Day 1"),
+            Heading(2, "Himeji"),
+            Hyperlink("Himeji Castle", HIMEJI_CASTLE),
+            Heading(1, "Day 2"),
+            Hyperlink("Nara Park", NARA_PARK),
+        ],
+    )
+    out = tmp_path / "trip.kml"
+
+    result = runner.invoke(
+        app,
+        [
+            "main",
+            str(document),
+            "--out",
+            str(out),
+            "--cache",
+            str(tmp_path / "c"),
+            "--folders",
+            "heading",
+        ],
+    )
+
+    assert result.exit_code == 0, result.output
+    kml = "{http://www.opengis.net/kml/2.2}"
+    document_element = ET.parse(out).getroot().find(f"{kml}Document")
+    assert document_element is not None
+    assert [
+        folder.findtext(f"{kml}name")
+        for folder in document_element.iter(f"{kml}Folder")
+    ] == ["Day 1", "Himeji", "Day 2"]
+    placemark = document_element.find(f"{kml}Folder/{kml}Folder/{kml}Placemark")
+    assert placemark is not None
+    assert placemark.findtext(f"{kml}name") == "Himeji Castle"
+
+
+def test_main_writes_delta_updates(tmp_path):
+    document = tmp_path / "trip.docx"
+    out = tmp_path / "trip.kml"
+    args = ["main", str(document), "--out", str(out), "--cache", str(tmp_path / "c")]
+
+    write_document(document, [Hyperlink("Himeji Castle", HIMEJI_CASTLE)])
+    result = runner.invoke(app, [*args, "--delta"])
+    assert result.exit_code == 0, result.output
+    assert "<Delete>" not in (tmp_path / "trip.update.kml").read_text()
+
+    write_document(document, [Hyperlink("Nara Park", NARA_PARK)])
+    result = runner.invoke(app, [*args, "--delta"])
+    assert result.exit_code == 0, result.output
+
+    update = (tmp_path / "trip.update.kml").read_text()
+    assert "<targetHref>trip.kml</targetHref>" in update
+    assert "Himeji Castle" not in update
+    assert "<name>Nara Park</name>" in update
+    assert "<Delete>" in update
+
+
+def test_main_does_not_write_delta_updates_of_split_maps(tmp_path):
+    document = write_document(
+        tmp_path / "trip.docx", [Hyperlink("Nara Park", NARA_PARK)]
+    )
+    result = runner.invoke(
+        app,
+        [
+            "main",
+            str(document),
+            "--out",
+            str(tmp_path / "trip.kml"),
+            "--cache",
+            str(tmp_path / "c"),
+            "--delta",
+            "--split",
+            "category",
+        ],
+    )
+
+    assert result.exit_code == 1
+    assert "--delta cannot be used with split maps" in result.output
+
+
+def test_batch_rejects_documents_with_the_same_name(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    write_document(docs / "trip.docx", [Hyperlink("Himeji Castle", HIMEJI_CASTLE)])
+    (docs / "trip.md").write_text(f"* [Nara Park]({NARA_PARK})\n")
+
+    out = tmp_path / "out"
+    result = runner.invoke(
+        app,
+        ["batch", str(docs), "--out-dir", str(out), "--cache", str(tmp_path / "c")],
+    )
+
+    assert result.exit_code == 1
+    assert "trip.kml" in result.output
+    assert not out.exists()
+
+
+def test_batch_reads_every_document_type(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    write_document(docs / "himeji.docx", [Hyperlink("Himeji Castle", HIMEJI_CASTLE)])
+    (docs / "nara.md").write_text(f"# Day 2\n\n* [Nara Park]({NARA_PARK})\n")
+    (docs / "notes.txt").write_text(NARA_PARK)
+
+    out = tmp_path / "out"
+    result = runner.invoke(
+        app,
+        ["batch", str(docs), "--out-dir", str(out), "--cache", str(tmp_path / "c")],
+    )
+
+    assert result.exit_code == 0, result.output
+    assert sorted(path.name for path in out.iterdir()) == ["himeji.kml", "nara.kml"]
+    assert "Nara Park" in (out / "nara.kml").read_text()
@@ -0,0 +1,70 @@
+import pytest
+
+from trip_planner.dedupe import NamePolicy, merge_nearby_points
+from trip_planner.trip_planner import Coords, Point, categorize_point
+
+NARA_PARK = Coords(lon=135.843012, lat=34.685047)
+# About 30 metres north of Nara Park
+NARA_PARK_GATE = Coords(lon=135.843012, lat=34.685317)
+HIMEJI_CASTLE = Coords(lon=134.6939047, lat=34.839449)
+
+
+def _points() -> list[Point]:
+    return [
+        Point("Nara Park", NARA_PARK, ["Day 1"]),
+        Point("Himeji Castle", HIMEJI_CASTLE, ["Day 2"]),
+        Point("Nara Park gate", NARA_PARK_GATE, ["Day 3", "Nara"]),
+        Point("Nara", NARA_PARK, ["Day 1", "Bookings"]),
+    ]
+
+
+@pytest.mark.parametrize(
+    ("policy", "name", "coords"),
+    [
+        (NamePolicy.First, "Nara Park", NARA_PARK),
+        (NamePolicy.Shortest, "Nara", NARA_PARK),
+        (NamePolicy.Longest, "Nara Park gate", NARA_PARK_GATE),
+    ],
+)
+def test_merge_nearby_points(policy, name, coords):
+    merged = merge_nearby_points(_points(), radius_m=50, name_policy=policy)
+
+    assert merged == [Point(name, coords), Point("Himeji Castle", HIMEJI_CASTLE)]
+    chosen = next(point for point in _points() if point.name == name)
+    assert merged[0].headings == chosen.headings
+    assert {chosen.headings, *merged[0].merged_headings} == {
+        ("Day 1",),
+        ("Day 3", "Nara"),
+        ("Day 1", "Bookings"),
+    }
+    assert len(merged[0].merged_headings) == 2
+    assert merged[1].headings == ["Day 2"]
+    assert merged[1].merged_headings == ()
+
+
+def test_merge_respects_radius():
+    assert merge_nearby_points(_points(), radius_m=10) == [
+        Point("Nara Park", NARA_PARK),
+        Point("Himeji Castle", HIMEJI_CASTLE),
+        Point("Nara Park gate", NARA_PARK_GATE),
+    ]
+
+
+def test_merge_many_points():
+    # A grid of points 100 metres apart, each with a duplicate 10 metres away.
+    points = [
+        Point(f"{x},{y}", Coords(lon=135 + x * 0.0011, lat=35 + y * 0.0009 + dy))
+        for x in range(40)
+        for y in range(40)
+        for dy in (0, 0.00009)
+    ]
+    merged = merge_nearby_points(points, radius_m=20)
+    assert len(merged) == 40 * 40
+    assert [point.name for point in merged] == [point.name for point in points[::2]]
+
+
+def test_merged_points_are_categorized_by_every_heading():
+    merged, _ = merge_nearby_points(_points()[:2] + _points()[3:], radius_m=50)
+
+    assert merged.headings == ["Day 1"]
+    assert categorize_point(merged).name == "Hotel"
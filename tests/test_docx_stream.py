@@ -0,0 +1,90 @@
+import io
+import xml.etree.ElementTree as ET
+
+import docx
+import pytest
+
+from support.docx_factory import (
+    Heading,
+    Hyperlink,
+    Table,
+    add_hyperlink,
+    build_document,
+)
+from trip_planner import docx_stream
+from trip_planner.document_parser import iter_links_with_headings
+
+
+def _links_from_both_parsers(document: docx.document.Document):
+    buffer = io.BytesIO()
+    document.save(buffer)
+    buffer.seek(0)
+    expected = list(iter_links_with_headings(docx.Document(buffer)))
+    buffer.seek(0)
+    return expected, list(docx_stream.iter_links_with_headings(buffer))
+
+
+@pytest.mark.parametrize(
+    "entries",
+    [
+        [],
+        [Hyperlink("Before any heading", "https://goo.gl/maps/a")],
+        [
+            Heading(1, "Day 1"),
+            Hyperlink("Himeji Castle", "https://goo.gl/maps/b"),
+            Heading(2, "Osaka"),
+            Hyperlink("Kaiyukan", "https://goo.gl/maps/c"),
+            Heading(2, "Kyoto"),
+            Table(
+                [
+                    [Hyperlink("Station", "https://goo.gl/maps/d")],
+                    [
+                        Hyperlink("Museum", "https://goo.gl/maps/e"),
+                        Hyperlink("Shrine", "https://goo.gl/maps/f"),
+                    ],
+                ]
+            ),
+            Heading(1, "Day 2"),
+            Heading(3, "Skipped a level"),
+            Hyperlink("Nara Park", "https://goo.gl/maps/g"),
+            Heading(2, "Bookings"),
+            Hyperlink("Hotel", "https://example.com/hotel"),
+        ],
+    ],
+)
+def test_parity_with_python_docx(entries):
+    expected, actual = _links_from_both_parsers(build_document(entries))
+    assert actual == expected
+
+
+def test_heading_text_and_links_inside_headings():
+    document = build_document([Heading(1, "Day 1")])
+    heading = document.add_heading("Tab\there", level=2)
+    heading.add_run().add_break()
+    add_hyperlink(heading, "Linked heading", "https://goo.gl/maps/h")
+    add_hyperlink(document.add_paragraph("Text "), "Link", "https://goo.gl/maps/i")
+
+    expected, actual = _links_from_both_parsers(document)
+    assert actual == expected
+    assert actual[0].headings == ["Day 1", "Tab\there\nLinked heading"]
+
+
+def test_finished_paragraphs_are_dropped(monkeypatch):
+    roots: list[ET.Element] = []
+    iterparse = ET.iterparse
+
+    def _spy(source, events=None):
+        parsed = iterparse(source, events)
+        event, element = next(parsed)
+        roots.append(element)
+        yield event, element
+        yield from parsed
+
+    monkeypatch.setattr(ET, "iterparse", _spy)
+    entries = [Hyperlink(f"Place {i}", f"https://goo.gl/maps/{i}") for i in range(50)]
+    _, actual = _links_from_both_parsers(build_document(entries))
+
+    assert len(actual) == 50
+    [document] = [root for root in roots if root.tag == docx_stream._DOCUMENT]
+    [body] = document
+    assert len(body) == 0
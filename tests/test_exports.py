@@ -0,0 +1,160 @@
+import io
+import json
+from pathlib import Path
+
+import pytest
+
+from trip_planner import exports
+from trip_planner.exports import OutputFormat
+from trip_planner.headings import heading_path
+from trip_planner.trip_planner import Coords
+
+NAKASENDO = (Coords(lon=137.57, lat=35.53), Coords(lon=137.59, lat=35.57))
+
+
+def _write(exporter: exports.Exporter) -> None:
+    exporter.point("Himeji Castle", 134.69, 34.84, "Default", heading_path(["Day 1"]))
+    exporter.point("Nara Park", 135.84, 34.69, "Outdoors", ["Day 2", "Nara"])
+    exporter.point("Tōdai-ji", 135.84, 34.69, "Default", ["Day 2", "Nara"])
+    exporter.line("Nakasendo", NAKASENDO, "Routes", [])
+
+
+@pytest.mark.parametrize(
+    "name, output_format",
+    [
+        ("map.kml", OutputFormat.Kml),
+        ("map.KMZ", OutputFormat.Kml),
+        ("map.geojson", OutputFormat.GeoJson),
+        ("map.ndjson", OutputFormat.NdJson),
+        ("map.tpcol", OutputFormat.Columnar),
+        ("map", OutputFormat.Kml),
+    ],
+)
+def test_format_of(name, output_format):
+    assert exports.format_of(Path(name)) is output_format
+
+
+def test_output_paths():
+    assert exports.output_paths(
+        Path("out/trip.kmz"), [OutputFormat.GeoJson, OutputFormat.Kml]
+    ) == {
+        OutputFormat.Kml: Path("out/trip.kmz"),
+        OutputFormat.GeoJson: Path("out/trip.geojson"),
+    }
+
+
+def test_geojson(tmp_path):
+    output = tmp_path / "map.geojson"
+    with exports.open_exporter(output, OutputFormat.GeoJson) as exporter:
+        _write(exporter)
+
+    collection = json.loads(output.read_text(encoding="utf-8"))
+    assert collection["type"] == "FeatureCollection"
+    features = collection["features"]
+    assert [feature["properties"]["name"] for feature in features] == [
+        "Himeji Castle",
+        "Nara Park",
+        "Tōdai-ji",
+        "Nakasendo",
+    ]
+    assert features[1] == {
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": [135.84, 34.69]},
+        "properties": {
+            "name": "Nara Park",
+            "category": "Outdoors",
+            "headings": ["Day 2", "Nara"],
+        },
+    }
+    assert features[3]["geometry"] == {
+        "type": "LineString",
+        "coordinates": [[137.57, 35.53], [137.59, 35.57]],
+    }
+
+
+def test_empty_geojson():
+    stream = io.StringIO()
+    writer = exports.GeoJsonWriter(stream)
+    writer.start()
+    writer.end()
+    assert json.loads(stream.getvalue()) == {
+        "type": "FeatureCollection",
+        "features": [],
+    }
+
+
+def test_ndjson_matches_geojson(tmp_path):
+    geojson, ndjson = tmp_path / "map.geojson", tmp_path / "map.ndjson"
+    for output, output_format in [
+        (geojson, OutputFormat.GeoJson),
+        (ndjson, OutputFormat.NdJson),
+    ]:
+        with exports.open_exporter(output, output_format) as exporter:
+            _write(exporter)
+
+    lines = ndjson.read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line) for line in lines] == json.loads(
+        geojson.read_text(encoding="utf-8")
+    )["features"]
+
+
+def test_columnar_round_trip(tmp_path):
+    output = tmp_path / "map.tpcol"
+    with exports.open_exporter(output, OutputFormat.Columnar) as exporter:
+        _write(exporter)
+
+    columns = exports.read_columnar(output.read_bytes())
+    assert list(columns.point_lon) == [134.69, 135.84, 135.84]
+    assert list(columns.point_lat) == [34.84, 34.69, 34.69]
+    assert [columns.strings[i] for i in columns.point_name] == [
+        "Himeji Castle",
+        "Nara Park",
+        "Tōdai-ji",
+    ]
+    assert [columns.strings[i] for i in columns.point_category] == [
+        "Default",
+        "Outdoors",
+        "Default",
+    ]
+    assert [columns.headings(i) for i in columns.point_headings] == [
+        ["Day 1"],
+        ["Day 2", "Nara"],
+        ["Day 2", "Nara"],
+    ]
+    assert [columns.strings[i] for i in columns.line_name] == ["Nakasendo"]
+    assert columns.headings(columns.line_headings[0]) == []
+    assert list(columns.line_offsets) == [0, 2]
+    assert list(columns.line_coords) == [137.57, 35.53, 137.59, 35.57]
+
+
+def test_columnar_stores_shared_values_once():
+    writer = exports.ColumnarWriter()
+    _write(writer)
+
+    # "Default" and ["Day 2", "Nara"] are each used twice
+    assert writer.columns.strings.count("Default") == 1
+    assert len(writer.columns.heading_offsets) - 1 == 3
+
+
+def test_columnar_arrays_are_aligned(tmp_path):
+    stream = io.BytesIO()
+    writer = exports.ColumnarWriter()
+    _write(writer)
+    writer.write(stream)
+
+    data = stream.getvalue()
+    assert data.startswith(exports.MAGIC)
+    assert len(data) % 8 == 0
+    # The longitudes start right after the header, strings and heading paths
+    columns = writer.columns
+    blob = sum(len(text.encode()) for text in columns.strings)
+    offset = 32 + 4 * (len(columns.strings) + 1)
+    offset += -offset % 8 + blob + -blob % 8
+    for array in [columns.heading_offsets, columns.heading_strings]:
+        offset += 4 * len(array) + -4 * len(array) % 8
+    assert data[offset : offset + 8 * 3] == columns.point_lon.tobytes()
+
+
+def test_read_columnar_rejects_other_files():
+    with pytest.raises(ValueError):
+        exports.read_columnar(b"<kml>" + bytes(40))
@@ -0,0 +1,79 @@
+import math
+import random
+
+import pytest
+
+from trip_planner.geometry import GridIndex, distance_m, simplify
+from trip_planner.trip_planner import Coords
+
+MAGOME = Coords(lon=137.5717516, lat=35.5315174)
+TSUMAGO = Coords(lon=137.5956667, lat=35.5775876)
+
+
+def test_distance_m():
+    assert distance_m(MAGOME, TSUMAGO) == pytest.approx(5530, rel=0.01)
+    assert distance_m(MAGOME, MAGOME) == 0
+
+
+def _straight_line(count: int, wobble: float = 0.0) -> list[Coords]:
+    return [
+        Coords(
+            lon=MAGOME.lon + (TSUMAGO.lon - MAGOME.lon) * i / (count - 1),
+            lat=MAGOME.lat
+            + (TSUMAGO.lat - MAGOME.lat) * i / (count - 1)
+            + (wobble if i % 2 else 0),
+        )
+        for i in range(count)
+    ]
+
+
+def test_simplify_straight_line():
+    assert simplify(_straight_line(100), tolerance_m=1) == [MAGOME, TSUMAGO]
+
+
+def test_simplify_keeps_points_beyond_tolerance():
+    # 0.001 degrees of latitude is about 111 metres, or 43 metres across this line
+    line = _straight_line(11, wobble=0.001)
+    assert simplify(line, tolerance_m=100) == [MAGOME, TSUMAGO]
+    assert simplify(line, tolerance_m=20) == line
+
+
+@pytest.mark.parametrize("coords", [[], [MAGOME], [MAGOME, TSUMAGO]])
+def test_simplify_short_lines(coords):
+    assert simplify(coords, tolerance_m=1000) == coords
+
+
+def test_simplify_disabled():
+    line = _straight_line(10)
+    assert simplify(line, tolerance_m=0) == line
+
+
+def test_grid_index():
+    index: GridIndex[str] = GridIndex(radius_m=100)
+    index.add(MAGOME, "magome")
+    index.add(TSUMAGO, "tsumago")
+    index.add(Coords(lon=MAGOME.lon, lat=MAGOME.lat + 0.0005), "near magome")
+    index.add(Coords(lon=MAGOME.lon, lat=MAGOME.lat + 0.005), "far from magome")
+
+    assert index.nearby(MAGOME) == ["magome", "near magome"]
+    assert index.nearby(TSUMAGO) == ["tsumago"]
+    assert index.nearby(Coords(lon=0, lat=0)) == []
+
+
+@pytest.mark.parametrize(
+    "lon_range, lat_range", [((100, 170), (20, 60)), ((-180, 180), (-89, 89))]
+)
+def test_grid_index_matches_brute_force(lon_range, lat_range):
+    rng = random.Random(0)
+    radius = 50.0
+    for _ in range(5000):
+        a = Coords(lon=rng.uniform(*lon_range), lat=rng.uniform(*lat_range))
+        # Offsets of up to about 70m either way, so that some pairs are in range.
+        offset = 0.0006
+        b = Coords(
+            lon=a.lon + rng.uniform(-offset, offset) / math.cos(math.radians(a.lat)),
+            lat=a.lat + rng.uniform(-offset, offset),
+        )
+        index: GridIndex[str] = GridIndex(radius_m=radius)
+        index.add(b, "b")
+        assert (index.nearby(a) == ["b"]) == (distance_m(a, b) <= radius), (a, b)
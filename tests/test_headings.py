@@ -0,0 +1,64 @@
+import gc
+import pickle
+
+import pytest
+
+from trip_planner.headings import ROOT, heading_path
+
+
+def test_paths_are_interned():
+    day = ROOT.enter("Day 1", 1)
+    city = day.enter("Kyoto", 2)
+
+    assert city is heading_path(["Day 1", "Kyoto"])
+    assert day.enter("Kyoto", 2) is city
+    assert heading_path(city) is city
+
+
+@pytest.mark.parametrize(
+    "headings, expected",
+    [
+        ([("Day 1", 1), ("Kyoto", 2)], ["Day 1", "Kyoto"]),
+        ([("Day 1", 1), ("Kyoto", 2), ("Day 2", 1)], ["Day 2"]),
+        ([("Day 1", 1), ("Kyoto", 2), ("Osaka", 2)], ["Day 1", "Osaka"]),
+        ([("Day 1", 1), ("Kyoto", 3), ("Osaka", 2)], ["Day 1", "Osaka"]),
+        ([("Notes", 2), ("Day 1", 1)], ["Day 1"]),
+    ],
+)
+def test_enter(headings, expected):
+    path = ROOT
+    for title, level in headings:
+        path = path.enter(title, level)
+
+    assert list(path) == expected
+
+
+def test_sequence_behavior():
+    path = heading_path(["Japan", "Day 1", "Kyoto"])
+
+    assert path == ["Japan", "Day 1", "Kyoto"]
+    assert path == ("Japan", "Day 1", "Kyoto")
+    assert path != ["Japan"]
+    assert len(path) == 3
+    assert path[-1] == "Kyoto"
+    assert path[:2] == ("Japan", "Day 1")
+    assert "Day 1" in path
+    assert hash(path) == hash(("Japan", "Day 1", "Kyoto"))
+    assert ROOT == [] and not ROOT
+
+
+def test_pickling_interns_again():
+    path = heading_path(["Day 1", "Kyoto"])
+
+    assert pickle.loads(pickle.dumps(path)) is path
+
+
+def test_unused_paths_are_freed():
+    parent = heading_path(["Temporary"])
+    child = parent.enter("Path", 2)
+    assert len(parent._children) == 1
+
+    del child
+    gc.collect()
+
+    assert len(parent._children) == 0
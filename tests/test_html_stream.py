@@ -0,0 +1,69 @@
+import pytest
+
+from trip_planner import html_stream
+from trip_planner.document_parser import Link
+
+
+def _links(tmp_path, text: str) -> list[Link]:
+    path = tmp_path / "trip.html"
+    path.write_text(text, encoding="utf-8")
+    return list(html_stream.iter_links_with_headings(path))
+
+
+def test_headings(tmp_path):
+    links = _links(
+        tmp_path,
+        """<html><head><title>Trip</title>
+        <script>var a = '<a href="https://goo.gl/maps/x">x</a>';</script></head>
+        <body>
+        <p><a href="https://goo.gl/maps/a">Before</a></p>
+        <h1>Day <b>1</b></h1>
+        <ul><li><a href="https://goo.gl/maps/b">Himeji
+          Castle</a></li></ul>
+        <h2>Osaka</h2>
+        <table><tr><td><a href="https://goo.gl/maps/c?a=1&amp;b=2">Kaiyukan</a>
+        </td></tr></table>
+        <h2><a href=" https://goo.gl/maps/d ">Kyoto</a> Station</h2>
+        <a name="anchor">No link</a>
+        <h1>Day 2</h1>
+        <a href="https://goo.gl/maps/e">Nara</a>
+        </body></html>""",
+    )
+
+    assert links == [
+        Link(address="https://goo.gl/maps/a", text="Before", headings=[]),
+        Link(address="https://goo.gl/maps/b", text="Himeji Castle", headings=["Day 1"]),
+        Link(
+            address="https://goo.gl/maps/c?a=1&b=2",
+            text="Kaiyukan",
+            headings=["Day 1", "Osaka"],
+        ),
+        Link(
+            address="https://goo.gl/maps/d",
+            text="Kyoto",
+            headings=["Day 1", "Kyoto Station"],
+        ),
+        Link(address="https://goo.gl/maps/e", text="Nara", headings=["Day 2"]),
+    ]
+
+
+@pytest.mark.parametrize(
+    "text, heading",
+    [
+        ('<h1>Day 1</h1><a href="https://goo.gl/maps/a">A', "Day 1"),
+        ('<h1>Day 1 <a href="https://goo.gl/maps/a">A', "Day 1 A"),
+    ],
+)
+def test_unclosed_tags(tmp_path, text, heading):
+    (link,) = _links(tmp_path, text)
+    assert link == Link(address="https://goo.gl/maps/a", text="A", headings=[heading])
+
+
+def test_links_across_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(html_stream, "_CHUNK_SIZE", 7)
+    (link,) = _links(
+        tmp_path, '<h1>Day 1</h1><a href="https://goo.gl/maps/a">Himeji Castle</a>'
+    )
+    assert link == Link(
+        address="https://goo.gl/maps/a", text="Himeji Castle", headings=["Day 1"]
+    )
@@ -0,0 +1,132 @@
+import pytest
+
+from support.docx_factory import Entry, Heading, Hyperlink, write_document
+from trip_planner import categories, exports, layers
+from trip_planner.trip_planner import DocumentParser, MapMaker
+
+HIMEJI_CASTLE = "https://www.google.com/maps/place/Himeji+Castle/@34.8394534,134.6913298,17z/data=!3m1!4b1!4m6!3m5!1s0x3554e003a23324b3:0x7a4f8c2f6eba81b1!8m2!3d34.839449!4d134.6939047!16zL20vMDE4bmN4?entry=ttu"
+NARA_PARK = "https://www.google.com/maps/place/Nara+Park/@34.6850514,135.8404371,17z/data=!3m1!4b1!4m6!3m5!1s0x60013996bd8c6061:0xf96cacf357447456!8m2!3d34.685047!4d135.843012!16s%2Fm%2F02pwmjl?entry=ttu"
+
+
+def test_incremental_rebuild(tmp_path, monkeypatch):
+    resolved = []
+    point_from_link = MapMaker._feature_from_link
+
+    def _spy(self, link, *args):
+        resolved.append(link.text)
+        return point_from_link(self, link, *args)
+
+    monkeypatch.setattr(MapMaker, "_feature_from_link", _spy)
+
+    document = tmp_path / "trip.docx"
+    output = tmp_path / "trip.kml"
+    entries: list[Entry] = [
+        Heading(1, "Day 1"),
+        Hyperlink("Himeji Castle", HIMEJI_CASTLE),
+    ]
+    write_document(document, entries)
+
+    with MapMaker.with_cache(tmp_path / "cache") as map_maker:
+
+        def _build():
+            return map_maker.map_from_document(
+                document, output, DocumentParser.Stream, incremental_build=True
+            )
+
+        assert _build()
+        assert resolved == ["Himeji Castle"]
+
+        # Unchanged documents are skipped entirely
+        assert not _build()
+        assert resolved == ["Himeji Castle"]
+
+        # Only the new link is resolved
+        write_document(document, [*entries, Hyperlink("Nara Park", NARA_PARK)])
+        assert _build()
+        assert resolved == ["Himeji Castle", "Nara Park"]
+        assert "Himeji Castle" in output.read_text()
+        assert "Nara Park" in output.read_text()
+
+        # A missing output is always rebuilt
+        output.unlink()
+        assert _build()
+        assert resolved == ["Himeji Castle", "Nara Park"]
+        assert "Nara Park" in output.read_text()
+
+
+ONLY_DEFAULT = """
+[default]
+name = "Everything"
+icon = "Pin"
+color = "000000"
+"""
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {"folder_by": layers.FolderBy.Heading},
+        {"route_tolerance": 10.0},
+        {"merge_radius": 50.0},
+        {"split_by": layers.SplitBy.Category},
+        {"formats": [exports.OutputFormat.GeoJson]},
+        {"delta": True},
+        {"categorizer": categories.loads(ONLY_DEFAULT)},
+    ],
+)
+def test_changed_options_rebuild(tmp_path, options):
+    document = tmp_path / "trip.docx"
+    output = tmp_path / "trip.kml"
+    write_document(document, [Heading(1, "Day 1"), Hyperlink("Nara", NARA_PARK)])
+
+    def _build(**options):
+        with MapMaker.with_cache(tmp_path / "cache", **options) as map_maker:
+            return map_maker.map_from_document(
+                document, output, DocumentParser.Stream, incremental_build=True
+            )
+
+    assert _build()
+    assert not _build()
+    assert _build(**options)
+    assert not _build(**options)
+
+
+def test_missing_outputs_are_rebuilt(tmp_path):
+    document = tmp_path / "trip.docx"
+    output = tmp_path / "trip.kml"
+    write_document(document, [Hyperlink("Nara Park", NARA_PARK)])
+
+    with MapMaker.with_cache(
+        tmp_path / "cache", formats=[exports.OutputFormat.NdJson], delta=True
+    ) as map_maker:
+        for path in [tmp_path / "trip.ndjson", tmp_path / "trip.update.kml"]:
+            assert map_maker.map_from_document(
+                document, output, DocumentParser.Stream, incremental_build=True
+            )
+            path.unlink()
+        assert map_maker.map_from_document(
+            document, output, DocumentParser.Stream, incremental_build=True
+        )
+
+
+def test_skipped_builds_write_an_empty_update(tmp_path):
+    document = tmp_path / "trip.docx"
+    output = tmp_path / "trip.kml"
+    update = tmp_path / "trip.update.kml"
+
+    with MapMaker.with_cache(tmp_path / "cache", delta=True) as map_maker:
+
+        def _build():
+            return map_maker.map_from_document(
+                document, output, DocumentParser.Stream, incremental_build=True
+            )
+
+        write_document(document, [Hyperlink("Himeji Castle", HIMEJI_CASTLE)])
+        assert _build()
+        write_document(document, [Hyperlink("Nara Park", NARA_PARK)])
+        assert _build()
+        assert "<Create>" in update.read_text()
+
+        assert not _build()
+        assert "<Create>" not in update.read_text()
+        assert "<Delete>" not in update.read_text()
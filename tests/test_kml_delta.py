@@ -0,0 +1,140 @@
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from trip_planner import kml_delta, kml_writer
+from trip_planner.trip_planner import Coords
+
+KML = "{http://www.opengis.net/kml/2.2}"
+STYLE = kml_writer.LineStyle(color="0288D1", width=5)
+ROUTE = (Coords(lon=137.57, lat=35.53), Coords(lon=137.59, lat=35.57))
+
+# (folder, name, lon, lat, icon code)
+BEFORE = [
+    ("Castle", "Himeji Castle", 134.69, 34.84, "1598-0288d1"),
+    ("Park", "Nara Park", 135.84, 34.68, "1582-558b2f"),
+    ("Park", "Ghibli Museum", 139.57, 35.69, "1582-558b2f"),
+]
+AFTER = [
+    ("Castle", "Himeji Castle", 134.69, 34.84, "1599-0288d1"),
+    ("Museum", "Ghibli Museum", 139.57, 35.69, "1636-0288d1"),
+    ("Food", "Nishiki Market", 135.76, 35.00, "1577-f57c00"),
+]
+
+
+def _build(previous, points, lines=()):
+    delta = kml_delta.Delta(previous)
+    for point in points:
+        delta.placemark(*point)
+    for name, coords in lines:
+        delta.line("Routes", name, coords, STYLE)
+    return delta
+
+
+def _update(tmp_path, delta):
+    output = tmp_path / "map.update.kml"
+    delta.write(output, "map.kml")
+    delta.close()
+    update = ET.parse(output).getroot().find(f"{KML}NetworkLinkControl/{KML}Update")
+    assert update is not None
+    assert update.findtext(f"{KML}targetHref") == "map.kml"
+    return update
+
+
+def _operations(update):
+    return [child.tag.removeprefix(KML) for child in update][1:]
+
+
+def test_first_build_has_no_changes(tmp_path):
+    assert _operations(_update(tmp_path, _build(None, BEFORE))) == []
+
+
+def test_unchanged_build_has_no_changes(tmp_path):
+    snapshot = _build(None, BEFORE, [("Nakasendo", ROUTE)]).snapshot()
+    delta = _build(snapshot, reversed(BEFORE), [("Nakasendo", ROUTE)])
+    assert _operations(_update(tmp_path, delta)) == []
+
+
+def test_changes(tmp_path):
+    snapshot = _build(None, BEFORE, [("Nakasendo", ROUTE)]).snapshot()
+    update = _update(tmp_path, _build(snapshot, AFTER))
+
+    assert _operations(update) == [
+        "Delete",
+        "Create",
+        "Create",
+        "Create",
+        "Change",
+    ]
+    ghibli = kml_writer.point_id("Ghibli Museum", 139.57, 35.69)
+    assert [
+        (element.tag.removeprefix(KML), element.get("targetId"))
+        for element in update.find(f"{KML}Delete")
+    ] == sorted(
+        [
+            ("Placemark", kml_writer.point_id("Nara Park", 135.84, 34.68)),
+            ("Placemark", kml_writer.placemark_id("Nakasendo", ROUTE)),
+        ]
+    ) + [
+        ("Placemark", ghibli),
+        ("Folder", kml_writer.folder_id("Park")),
+        ("Folder", kml_writer.folder_id("Routes")),
+    ]
+
+    document, *folders = (create[0] for create in update.findall(f"{KML}Create"))
+    assert document.get("targetId") == kml_writer.DOCUMENT_ID
+    assert sorted(style.get("id") for style in document.findall(f"{KML}StyleMap")) == [
+        "icon-1577-f57c00-map",
+        "icon-1599-0288d1-map",
+        "icon-1636-0288d1-map",
+    ]
+    assert [
+        folder.findtext(f"{KML}name") for folder in document.findall(f"{KML}Folder")
+    ] == [
+        "Museum",
+        "Food",
+    ]
+    assert [
+        (folder.get("targetId"), placemark.get("id"), placemark.findtext(f"{KML}name"))
+        for folder in folders
+        for placemark in folder
+    ] == [
+        (kml_writer.folder_id("Museum"), ghibli, "Ghibli Museum"),
+        (
+            kml_writer.folder_id("Food"),
+            kml_writer.point_id("Nishiki Market", 135.76, 35.00),
+            "Nishiki Market",
+        ),
+    ]
+
+    change = update.find(f"{KML}Change/{KML}Placemark")
+    assert change is not None
+    assert change.get("targetId") == kml_writer.point_id("Himeji Castle", 134.69, 34.84)
+    assert change.findtext(f"{KML}styleUrl") == "#icon-1599-0288d1-map"
+
+
+def test_update_targets_the_ids_in_the_map(tmp_path):
+    output = tmp_path / "map.kml"
+    with kml_writer.open_map(output, ["1598-0288d1"], [STYLE]) as kml:
+        with kml.folder("Castle"):
+            kml.placemark("Himeji Castle", 134.69, 34.84, "1598-0288d1")
+        with kml.folder("Routes"):
+            kml.line("Nakasendo", ROUTE, STYLE)
+
+    snapshot = _build(None, BEFORE[:1], [("Nakasendo", ROUTE)]).snapshot()
+    update = _update(tmp_path, _build(snapshot, []))
+    document = ET.parse(output).getroot().find(f"{KML}Document")
+    assert document is not None
+    assert document.get("id") == kml_writer.DOCUMENT_ID
+
+    ids = {element.get("id") for element in document.iter() if element.get("id")}
+    deleted = [element.get("targetId") for element in update.find(f"{KML}Delete")]
+    assert len(deleted) == 4
+    assert set(deleted) <= ids
+
+
+@pytest.mark.parametrize(
+    "output, expected", [("map.kml", "map.update.kml"), ("map.kmz", "map.update.kml")]
+)
+def test_update_path(tmp_path, output, expected):
+    assert kml_delta.update_path(tmp_path / output) == tmp_path / expected
@@ -0,0 +1,164 @@
+import xml.etree.ElementTree as ET
+import zipfile
+
+import pytest
+
+from trip_planner import kml_writer
+from trip_planner.trip_planner import Coords
+
+KML = "{http://www.opengis.net/kml/2.2}"
+
+
+def _write(output):
+    with kml_writer.open_map(output, ["1899-c2185b", "1716-1a237e"]) as kml:
+        with kml.folder("Default"):
+            kml.placemark("Nara & <Park>", lon=135.8, lat=34.6, icon_code="1899-c2185b")
+        with kml.folder("Travel"):
+            kml.placemark("Kyoto Station", lon=135.7, lat=34.9, icon_code="1716-1a237e")
+
+
+def _check(root: ET.Element):
+    document = root.find(f"{KML}Document")
+    assert document is not None
+
+    style_ids = [style.get("id") for style in document.iter(f"{KML}Style")]
+    assert "icon-1899-c2185b" in style_ids
+    assert "icon-1716-1a237e" in style_ids
+
+    folders = document.findall(f"{KML}Folder")
+    assert [folder.findtext(f"{KML}name") for folder in folders] == [
+        "Default",
+        "Travel",
+    ]
+    placemark = folders[0].find(f"{KML}Placemark")
+    assert placemark is not None
+    assert placemark.findtext(f"{KML}name") == "Nara & <Park>"
+    assert placemark.findtext(f"{KML}Point/{KML}coordinates") == "135.8,34.6,0.0"
+
+    style_url = placemark.findtext(f"{KML}styleUrl", default="")
+    style_map = document.find(f"{KML}StyleMap[@id='{style_url.removeprefix('#')}']")
+    assert style_map is not None
+    assert style_map.findtext(f"{KML}Pair/{KML}styleUrl") == "#icon-1899-c2185b"
+
+
+def test_kml(tmp_path):
+    output = tmp_path / "map.kml"
+    _write(output)
+    _check(ET.parse(output).getroot())
+
+
+@pytest.mark.parametrize("name", ["map.kmz", "map.KMZ"])
+def test_kmz(tmp_path, name):
+    output = tmp_path / name
+    _write(output)
+    with zipfile.ZipFile(output) as archive:
+        assert archive.namelist() == ["doc.kml"]
+        _check(ET.fromstring(archive.read("doc.kml")))
+
+
+def test_line(tmp_path):
+    output = tmp_path / "map.kml"
+    style = kml_writer.LineStyle(color="0288D1", width=5)
+    with kml_writer.open_map(output, [], [style]) as kml, kml.folder("Routes"):
+        kml.line(
+            "Nakasendo",
+            [Coords(lon=137.57, lat=35.53), Coords(lon=137.59, lat=35.57)],
+            style,
+        )
+
+    document = ET.parse(output).getroot().find(f"{KML}Document")
+    assert document is not None
+    line_style = document.find(f"{KML}Style[@id='line-0288D1-5000']")
+    assert line_style is not None
+    # KML colors are aabbggrr.
+    assert line_style.findtext(f"{KML}LineStyle/{KML}color") == "ffD18802"
+    placemark = document.find(f"{KML}Folder/{KML}Placemark")
+    assert placemark is not None
+    assert placemark.findtext(f"{KML}styleUrl") == "#line-0288D1-5000"
+    assert (
+        placemark.findtext(f"{KML}LineString/{KML}coordinates")
+        == "137.57,35.53,0.0 137.59,35.57,0.0"
+    )
+
+
+@pytest.mark.parametrize("max_memory", [10, kml_writer.DEFAULT_SPOOL_MEMORY])
+def test_spooled_folders_match_direct_writes(tmp_path, max_memory):
+    direct = tmp_path / "direct.kml"
+    _write(direct)
+
+    spooled = tmp_path / "spooled.kml"
+    spools = {
+        name: kml_writer.FolderSpool(max_memory) for name in ["Default", "Travel"]
+    }
+    spools["Travel"].writer.placemark(
+        "Kyoto Station", lon=135.7, lat=34.9, icon_code="1716-1a237e"
+    )
+    spools["Default"].writer.placemark(
+        "Nara & <Park>", lon=135.8, lat=34.6, icon_code="1899-c2185b"
+    )
+    with kml_writer.open_map(spooled, ["1899-c2185b", "1716-1a237e"]) as kml:
+        for name, spool in spools.items():
+            kml.spooled_folder(name, spool)
+            spool.close()
+
+    assert spooled.read_text() == direct.read_text()
+
+
+def test_styles_are_sorted_and_written_once(tmp_path):
+    output = tmp_path / "map.kml"
+    style = kml_writer.LineStyle(color="0288D1", width=5)
+    with kml_writer.open_map(
+        output, ["1716-1a237e", "1899-c2185b", "1716-1a237e"], [style, style]
+    ):
+        pass
+
+    document = ET.parse(output).getroot().find(f"{KML}Document")
+    assert document is not None
+    assert [style.get("id") for style in document.iter(f"{KML}Style")] == [
+        "icon-1716-1a237e",
+        "icon-1716-1a237e-highlight",
+        "icon-1899-c2185b",
+        "icon-1899-c2185b-highlight",
+        "line-0288D1-5000",
+    ]
+
+
+def test_registry_renders_each_style_once():
+    registry = kml_writer.StyleRegistry()
+    style = kml_writer.LineStyle(color="0288D1", width=5)
+
+    assert registry.icon_style("1899-c2185b") is registry.icon_style("1899-c2185b")
+    assert registry.line_style(style) is registry.line_style(style)
+    assert registry.icon_style("1899-c2185b") != registry.icon_style("1716-1a237e")
+
+
+def test_registry_renders_styles_at_each_depth():
+    registry = kml_writer.StyleRegistry()
+    top = registry.icon_style("1899-c2185b")
+    created = registry.icon_style("1899-c2185b", kml_writer.CREATED_CONTENT_DEPTH)
+
+    assert created is registry.icon_style(
+        "1899-c2185b", kml_writer.CREATED_CONTENT_DEPTH
+    )
+    assert created != top
+    assert created.split() == top.split()
+
+
+@pytest.mark.parametrize("name", ["map.kml", "map.kmz"])
+def test_output_is_byte_stable(tmp_path, name):
+    first, second = tmp_path / "first", tmp_path / "second"
+    first.mkdir()
+    second.mkdir()
+
+    _write(first / name)
+    with kml_writer.open_map(
+        second / name,
+        ["1716-1a237e", "1899-c2185b"],
+        registry=kml_writer.StyleRegistry(),
+    ) as kml:
+        with kml.folder("Default"):
+            kml.placemark("Nara & <Park>", lon=135.8, lat=34.6, icon_code="1899-c2185b")
+        with kml.folder("Travel"):
+            kml.placemark("Kyoto Station", lon=135.7, lat=34.9, icon_code="1716-1a237e")
+
+    assert (first / name).read_bytes() == (second / name).read_bytes()
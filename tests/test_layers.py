@@ -0,0 +1,164 @@
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+import pytest
+
+from trip_planner import kml_writer, layers
+from trip_planner.layers import Layer, SplitBy, Splitter
+from trip_planner.trip_planner import Coords
+
+KML = "{http://www.opengis.net/kml/2.2}"
+STYLE = kml_writer.LineStyle(color="0288D1", width=5)
+
+
+def _assign(splitter, features):
+    return [splitter.layer(headings, category).name for headings, category in features]
+
+
+FEATURES = [
+    (["Day 1", "Kyoto"], "Museum"),
+    (["Day 1"], "Default"),
+    (["Day 2"], "Museum"),
+    ([], "Default"),
+    (["Day 1"], "Museum"),
+]
+
+
+@pytest.mark.parametrize(
+    "split_by, max_features, expected",
+    [
+        (SplitBy.Nothing, None, ["", "", "", "", ""]),
+        (SplitBy.Heading, None, ["Day 1", "Day 1", "Day 2", "Other", "Day 1"]),
+        (SplitBy.Category, None, ["Museum", "Default", "Museum", "Default", "Museum"]),
+        (SplitBy.Nothing, 2, ["Part 1", "Part 1", "Part 2", "Part 2", "Part 3"]),
+        (SplitBy.Heading, 2, ["Day 1", "Day 1", "Day 2", "Other", "Day 1 (2)"]),
+    ],
+)
+def test_splitter(split_by, max_features, expected):
+    with Splitter(split_by, max_features) as splitter:
+        assert _assign(splitter, FEATURES) == expected
+        assert sum(layer.size for layer in splitter.layers.values()) == len(FEATURES)
+
+
+@pytest.mark.parametrize(
+    "name, expected",
+    [
+        ("Day 1", "trip-01-day-1.kml"),
+        ("Kyoto & Nara (2)", "trip-01-kyoto-nara-2.kml"),
+        ("京都", "trip-01-京都.kml"),
+        ("!!!", "trip-01-layer.kml"),
+    ],
+)
+def test_layer_path(name, expected):
+    assert layers.layer_path(Path("out/trip.kml"), 1, name) == Path("out", expected)
+
+
+def _root(path):
+    return ET.parse(path).getroot()
+
+
+def test_write_layers(tmp_path):
+    output = tmp_path / "trip.kml"
+    with Splitter(SplitBy.Heading, routes_folder="Routes") as splitter:
+        splitter.layer(["Day 1"], "Museum").placemark(
+            "Museum", "Ghibli Museum", lon=139.5, lat=35.6, icon_code="1636-d55322"
+        )
+        splitter.layer(["Day 1"], "Routes").line(
+            "Walk", (Coords(lon=139.5, lat=35.6), Coords(lon=139.6, lat=35.7)), STYLE
+        )
+        splitter.layer(["Day 2"], "Default").placemark(
+            "Default", "Nara Park", lon=135.8, lat=34.6, icon_code="1899-c2185b"
+        )
+        paths = layers.write_layers(output, splitter)
+
+    assert [path.name for path in paths] == ["trip-01-day-1.kml", "trip-02-day-2.kml"]
+
+    links = _root(output).iter(f"{KML}NetworkLink")
+    assert [
+        (link.findtext(f"{KML}name"), link.findtext(f"{KML}Link/{KML}href"))
+        for link in links
+    ] == [("Day 1", "trip-01-day-1.kml"), ("Day 2", "trip-02-day-2.kml")]
+
+    for path, folders in zip(paths, [["Museum", "Routes"], ["Default"]]):
+        document = _root(path).find(f"{KML}Document")
+        assert document is not None
+        assert [
+            folder.findtext(f"{KML}name") for folder in document.iter(f"{KML}Folder")
+        ] == folders
+        # Every file defines the styles its own placemarks use, and no others.
+        defined = {
+            f"#{element.get('id')}" for element in document.iter(f"{KML}StyleMap")
+        } | {
+            f"#{element.get('id')}"
+            for element in document.iter(f"{KML}Style")
+            if element.get("id", "").startswith("line-")
+        }
+        used = {
+            url.text
+            for placemark in document.iter(f"{KML}Placemark")
+            for url in placemark.iter(f"{KML}styleUrl")
+        }
+        assert used == defined
+
+
+def test_unsplit_map_is_written_to_the_output(tmp_path):
+    output = tmp_path / "trip.kml"
+    with Splitter() as splitter:
+        assert layers.write_layers(output, splitter) == [output]
+
+    assert _root(output).find(f"{KML}Document") is not None
+
+
+def _folders(element):
+    return {
+        folder.findtext(f"{KML}name"): (
+            [
+                placemark.findtext(f"{KML}name")
+                for placemark in folder.findall(f"{KML}Placemark")
+            ],
+            _folders(folder),
+        )
+        for folder in element.findall(f"{KML}Folder")
+    }
+
+
+def test_folders_by_heading(tmp_path):
+    output = tmp_path / "trip.kml"
+    layer = Layer("", "Routes", layers.FolderBy.Heading)
+    for headings, name in [
+        (["Day 3", "Kyoto"], "Kiyomizu-dera"),
+        (["Day 3"], "Kyoto Station"),
+        (["Day 4", "Kyoto"], "Fushimi Inari"),
+        ([], "Kansai Airport"),
+        (["Day 3", "Kyoto"], "Gion"),
+    ]:
+        layer.placemark("Default", name, 135.7, 34.9, "1899-c2185b", headings)
+    layer.line(
+        "Walk",
+        (Coords(lon=135.7, lat=34.9), Coords(lon=135.8, lat=35.0)),
+        STYLE,
+        ["Day 3", "Kyoto"],
+    )
+    layer.write(output)
+    layer.close()
+
+    document = _root(output).find(f"{KML}Document")
+    assert document is not None
+    assert [
+        placemark.findtext(f"{KML}name")
+        for placemark in document.findall(f"{KML}Placemark")
+    ] == ["Kansai Airport"]
+    assert _folders(document) == {
+        "Day 3": (
+            ["Kyoto Station"],
+            {"Kyoto": (["Kiyomizu-dera", "Gion", "Walk"], {})},
+        ),
+        "Day 4": ([], {"Kyoto": (["Fushimi Inari"], {})}),
+    }
+    # Folders of the same name in different places are told apart.
+    kyoto_ids = [folder.get("id") for folder in document.iter(f"{KML}Folder")][1::2]
+    assert kyoto_ids == [
+        kml_writer.folder_id("Day 3", "Kyoto"),
+        kml_writer.folder_id("Day 4", "Kyoto"),
+    ]
+    assert kyoto_ids[0] != kyoto_ids[1]
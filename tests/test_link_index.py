@@ -0,0 +1,72 @@
+import concurrent.futures
+
+import pytest
+
+from trip_planner.link_index import Failure, Indexed, LinkIndex, Location
+
+HIMEJI = Location("Place", ((134.69, 34.84),))
+
+
+@pytest.fixture
+def index(tmp_path):
+    now = [1000.0]
+    index = LinkIndex(tmp_path / "links.sqlite3", clock=lambda: now[0])
+    index.now = now  # type: ignore[attr-defined]
+    yield index
+    index.close()
+
+
+def test_lookup_follows_short_links_to_their_locations(index):
+    index.store_resolutions(
+        {"short": ("long", None), "dead": (Failure(reason="404"), 60.0)}
+    )
+    index.store_locations({"long": HIMEJI})
+
+    assert index.lookup(["short", "long", "dead", "unknown", "short"]) == {
+        "short": Indexed(entry="long", location=HIMEJI),
+        "long": Indexed(location=HIMEJI),
+        "dead": Indexed(entry=Failure(reason="404")),
+    }
+
+
+def test_expired_resolutions_are_ignored(index):
+    index.store_resolutions({"short": ("long", 10.0)})
+    index.store_locations({"long": HIMEJI})
+
+    index.now[0] += 10
+    assert index.lookup(["short"]) == {}
+    assert index.lookup(["long"]) == {"long": Indexed(location=HIMEJI)}
+
+
+def test_lookup_of_many_links_at_once(index):
+    urls = [f"https://goo.gl/maps/{i}" for i in range(50_000)]
+    index.store_resolutions({url: (url + "/long", None) for url in urls})
+
+    indexed = index.lookup(urls)
+
+    assert len(indexed) == len(urls)
+    assert indexed[urls[-1]].entry == urls[-1] + "/long"
+
+
+def test_index_persists(tmp_path):
+    first = LinkIndex(tmp_path / "links.sqlite3")
+    first.store_resolutions({"short": ("long", None)})
+    first.store_locations({"long": HIMEJI})
+    first.set_meta("version", "1")
+    first.close()
+
+    second = LinkIndex(tmp_path / "links.sqlite3")
+    assert second.lookup(["short"]) == {"short": Indexed("long", HIMEJI)}
+    assert second.get_meta("version") == "1"
+    assert second.get_meta("other") is None
+    second.close()
+
+
+def test_threads_read_while_another_writes(index):
+    index.store_locations({"long": HIMEJI})
+
+    # Holding the write lock stands for a write in progress.
+    with index._write_lock, concurrent.futures.ThreadPoolExecutor(4) as executor:
+        results = list(executor.map(index.lookup, [["long"]] * 8, timeout=10))
+
+    assert results == [{"long": Indexed(location=HIMEJI)}] * 8
@@ -0,0 +1,310 @@
+import concurrent.futures
+import time
+
+import pytest
+
+from trip_planner import link_resolver, trip_planner
+from trip_planner.document_parser import Link
+from trip_planner.resolver_cache import CacheMiss, Failure
+from trip_planner.trip_planner import MapMaker, Point, get_coords_from_url
+
+PLACE_URLS = [
+    "https://www.google.com/maps/place/Himeji+Castle/@34.8394534,134.6913298,17z/data=!3m1!4b1!4m6!3m5!1s0x3554e003a23324b3:0x7a4f8c2f6eba81b1!8m2!3d34.839449!4d134.6939047!16zL20vMDE4bmN4?entry=ttu",
+    "https://www.google.com/maps/place/Nara+Park/@34.6850514,135.8404371,17z/data=!3m1!4b1!4m6!3m5!1s0x60013996bd8c6061:0xf96cacf357447456!8m2!3d34.685047!4d135.843012!16s%2Fm%2F02pwmjl?entry=ttu",
+    "https://www.google.com/maps/place/Ghibli+Museum/@35.696238,139.5704317,17z/data=!3m1!4b1!4m6!3m5!1s0x6018ee34e5038c2d:0x4de155903f849205!8m2!3d35.696238!4d139.5704317!16zL20vMDY5MDY0?entry=ttu",
+]
+
+
+def test_resolve_maps_links_concurrently(redirect_server):
+    redirect_server.latency = 0.1
+    urls = [f"{redirect_server.address}/maps/{i}" for i in range(20)]
+    for i, url in enumerate(urls):
+        redirect_server.add(url, PLACE_URLS[i % len(PLACE_URLS)])
+
+    latencies: list[float] = []
+    start = time.perf_counter()
+    resolved = link_resolver.resolve_maps_links(
+        urls, concurrency=20, latencies=latencies
+    )
+    elapsed = time.perf_counter() - start
+
+    assert resolved == {
+        url: PLACE_URLS[i % len(PLACE_URLS)] for i, url in enumerate(urls)
+    }
+    # Serially, this would take at least 2 seconds.
+    assert elapsed < 1.0
+    assert len(latencies) == len(urls)
+    assert min(latencies) >= redirect_server.latency
+
+
+def test_features_from_links_matches_serial_order(redirect_server, tmp_path):
+    links = []
+    for i in range(9):
+        short_url = f"https://goo.gl/maps/link{i}"
+        redirect_server.add(short_url, PLACE_URLS[i % len(PLACE_URLS)])
+        links.append(Link(address=short_url, text=f"Place {i}", headings=["Day 1"]))
+    links.append(Link(address=PLACE_URLS[0], text="Direct", headings=[]))
+    links.append(Link(address="https://example.com", text="Not a map", headings=[]))
+
+    expected = [
+        Point(name=link.text, coords=get_coords_from_url(url), headings=link.headings)
+        for link, url in zip(links, [*PLACE_URLS * 3, PLACE_URLS[0]])
+    ]
+
+    with MapMaker.with_cache(
+        tmp_path, transport=redirect_server.transport()
+    ) as map_maker:
+        assert map_maker._features_from_links(links) == expected
+        # Everything is cached now, so no further requests are needed.
+        redirect_server.redirects.clear()
+        assert map_maker._features_from_links(links) == expected
+
+
+def test_unresolvable_links_are_reported_not_raised(redirect_server):
+    good, bad = f"{redirect_server.address}/maps/good", f"{redirect_server.address}/x"
+    redirect_server.add(good, PLACE_URLS[0])
+
+    resolved = link_resolver.resolve_maps_links([good, bad])
+
+    assert resolved[good] == PLACE_URLS[0]
+    assert isinstance(resolved[bad], link_resolver.ResolutionError)
+    assert "404" in str(resolved[bad])
+
+
+def test_failed_links_are_dropped_and_negatively_cached(redirect_server, tmp_path):
+    links = [
+        Link(address="https://goo.gl/maps/good", text="Good", headings=[]),
+        Link(address="https://goo.gl/maps/dead", text="Dead", headings=[]),
+    ]
+    redirect_server.add(links[0].address, PLACE_URLS[0])
+
+    with MapMaker.with_cache(
+        tmp_path, transport=redirect_server.transport()
+    ) as map_maker:
+        assert [f.name for f in map_maker._features_from_links(links)] == ["Good"]
+        assert map_maker.run_stats.unresolved == [links[1].address]
+
+        # The failure is remembered, so the dead link is not requested again.
+        redirect_server.add(links[1].address, PLACE_URLS[1])
+        assert [f.name for f in map_maker._features_from_links(links)] == ["Good"]
+        assert map_maker.link_cache.counters.negative_hits >= 1
+
+
+def test_builds_count_each_link_once(redirect_server, tmp_path):
+    links = [Link(address="https://goo.gl/maps/once", text="Once", headings=[])]
+    redirect_server.add(links[0].address, PLACE_URLS[0])
+
+    with MapMaker.with_cache(
+        tmp_path, transport=redirect_server.transport()
+    ) as map_maker:
+        map_maker._features_from_links(links)
+        assert map_maker.link_cache.counters.misses == 1
+    with MapMaker.with_cache(
+        tmp_path, transport=redirect_server.transport()
+    ) as map_maker:
+        map_maker._features_from_links(links)
+        map_maker._features_from_links(links)
+        counters = map_maker.link_cache.counters
+        assert (counters.disk_hits, counters.memory_hits, counters.misses) == (1, 1, 0)
+    assert redirect_server.requests["/maps/once"] == 1
+
+
+def test_warm_then_build_offline(redirect_server, tmp_path):
+    links = [
+        Link(address=f"https://goo.gl/maps/link{i}", text=f"Place {i}", headings=[])
+        for i in range(3)
+    ]
+    for link, url in zip(links, PLACE_URLS):
+        redirect_server.add(link.address, url)
+    redirect_server.add("https://goo.gl/maps/dead", PLACE_URLS[0])
+
+    with MapMaker.with_cache(
+        tmp_path, transport=redirect_server.transport()
+    ) as map_maker:
+        # Warming retries a cached failure.
+        map_maker._links.set(links[0].address, Failure(reason="earlier 404"))
+        assert map_maker.warm(links) == {
+            link.address: url for link, url in zip(links, PLACE_URLS)
+        }
+
+    with MapMaker.with_cache(tmp_path, offline=True) as map_maker:
+        assert [f.name for f in map_maker._features_from_links(links)] == [
+            "Place 0",
+            "Place 1",
+            "Place 2",
+        ]
+        with pytest.raises(CacheMiss):
+            map_maker._features_from_links(
+                [Link(address="https://goo.gl/maps/dead", text="Dead", headings=[])]
+            )
+
+
+def test_pooled_resolver_is_shared_between_threads(redirect_server):
+    urls = [f"{redirect_server.address}/maps/{i}" for i in range(6)]
+    for i, url in enumerate(urls):
+        redirect_server.add(url, PLACE_URLS[i % len(PLACE_URLS)])
+
+    with (
+        link_resolver.PooledResolver(concurrency=4) as resolver,
+        concurrent.futures.ThreadPoolExecutor(3) as executor,
+    ):
+        results = list(executor.map(resolver.resolve, [urls[:3], urls[3:], []]))
+
+    assert results == [
+        {url: PLACE_URLS[i % len(PLACE_URLS)] for i, url in enumerate(urls[:3])},
+        {url: PLACE_URLS[i % len(PLACE_URLS)] for i, url in enumerate(urls[3:], 3)},
+        {},
+    ]
+
+
+def _policy(retries: int = 3, threshold: int = 5) -> link_resolver.ResolverPolicy:
+    return link_resolver.ResolverPolicy(
+        retry=link_resolver.Retry(retries=retries, backoff=0),
+        breaker=link_resolver.CircuitBreaker(threshold=threshold),
+    )
+
+
+def test_transient_failures_are_retried(redirect_server):
+    url = f"{redirect_server.address}/maps/busy"
+    redirect_server.add(url, PLACE_URLS[0])
+    redirect_server.fail(url, 503, 0, 429)
+
+    assert link_resolver.resolve_maps_links([url], policy=_policy()) == {
+        url: PLACE_URLS[0]
+    }
+    assert redirect_server.requests["/maps/busy"] == 4
+
+
+def test_retries_give_up(redirect_server):
+    url = f"{redirect_server.address}/maps/down"
+    redirect_server.add(url, PLACE_URLS[0])
+    redirect_server.fail(url, 503, 502, 504)
+
+    resolved = link_resolver.resolve_maps_links([url], policy=_policy(retries=2))
+
+    assert isinstance(resolved[url], link_resolver.TransientError)
+    assert "504" in str(resolved[url])
+    assert redirect_server.requests["/maps/down"] == 3
+
+
+def test_circuit_opens_after_repeated_failures(redirect_server):
+    urls = [f"{redirect_server.address}/maps/{i}" for i in range(10)]
+    for url in urls:
+        redirect_server.add(url, PLACE_URLS[0])
+        redirect_server.fail(url, 503)
+
+    resolved = link_resolver.resolve_maps_links(
+        urls, concurrency=1, policy=_policy(retries=0, threshold=3)
+    )
+
+    assert [type(error) for error in resolved.values()] == [
+        *[link_resolver.TransientError] * 3,
+        *[link_resolver.CircuitOpenError] * 7,
+    ]
+    assert sum(redirect_server.requests.values()) == 3
+
+
+def test_rate_limit(redirect_server):
+    urls = [f"{redirect_server.address}/maps/{i}" for i in range(5)]
+    for url in urls:
+        redirect_server.add(url, PLACE_URLS[0])
+
+    start = time.perf_counter()
+    resolved = link_resolver.resolve_maps_links(
+        urls, policy=link_resolver.ResolverPolicy.create(rate_limit=20)
+    )
+
+    assert set(resolved.values()) == {PLACE_URLS[0]}
+    # The first request goes straight away, then one every 50ms.
+    assert time.perf_counter() - start >= 0.2
+
+
+def test_throttled_links_are_unresolved_but_not_cached(redirect_server, tmp_path):
+    links = [
+        Link(address="https://goo.gl/maps/good", text="Good", headings=[]),
+        Link(address="https://goo.gl/maps/busy", text="Busy", headings=[]),
+    ]
+    redirect_server.add(links[0].address, PLACE_URLS[0])
+    redirect_server.add(links[1].address, PLACE_URLS[1])
+    redirect_server.fail(links[1].address, *[429] * 3)
+
+    with MapMaker.with_cache(
+        tmp_path, transport=redirect_server.transport(), retries=2
+    ) as map_maker:
+        assert [f.name for f in map_maker._features_from_links(links)] == ["Good"]
+        assert map_maker.run_stats.unresolved == [links[1].address]
+        # Tried once plus two retries during the prefetch, and not again after it.
+        assert redirect_server.requests["/maps/busy"] == 3
+        assert map_maker.link_cache.get(links[1].address) is None
+
+        # The next build tries again.
+        assert [f.name for f in map_maker._features_from_links(links)] == [
+            "Good",
+            "Busy",
+        ]
+
+
+def test_rate_limiter_spaces_requests():
+    limiter = link_resolver.RateLimiter(rate=4, clock=lambda: 10.0)
+    assert [limiter.reserve() for _ in range(3)] == [0.0, 0.25, 0.5]
+
+
+@pytest.mark.parametrize(
+    "attempt, retry_after, delay",
+    [(0, None, 0.5), (2, None, 2.0), (10, None, 30.0), (1, 5.0, 5.0), (1, 60, 30.0)],
+)
+def test_retry_delay(attempt, retry_after, delay):
+    retry = link_resolver.Retry()
+    assert retry.delay(attempt, retry_after, jitter=lambda: 1.0) == delay
+    if retry_after is None:
+        assert retry.delay(attempt, retry_after, jitter=lambda: 0.0) == 0.0
+
+
+def test_circuit_breaker_lets_one_request_through_after_cooldown():
+    now = 0.0
+    breaker = link_resolver.CircuitBreaker(threshold=2, cooldown=10, clock=lambda: now)
+
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.is_open and not breaker.allow()
+
+    now = 10.0
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    now = 20.0
+    assert breaker.allow()
+    breaker.record_success()
+    assert not breaker.is_open
+    assert breaker.allow() and breaker.allow()
+
+
+def test_locations_are_parsed_once(redirect_server, tmp_path, monkeypatch):
+    redirect_server.add("https://goo.gl/maps/nara", PLACE_URLS[1])
+    links = [
+        Link(address="https://goo.gl/maps/nara", text="Nara Park", headings=[]),
+        Link(address=PLACE_URLS[0], text="Himeji Castle", headings=[]),
+        Link(address=PLACE_URLS[0], text="Himeji again", headings=[]),
+    ]
+    parsed: list[str] = []
+    locate_url = trip_planner.locate_url
+
+    def _spy(url):
+        parsed.append(url)
+        return locate_url(url)
+
+    monkeypatch.setattr(trip_planner, "locate_url", _spy)
+
+    with MapMaker.with_cache(
+        tmp_path, transport=redirect_server.transport()
+    ) as map_maker:
+        first = map_maker._features_from_links(links)
+    assert parsed == [PLACE_URLS[1], PLACE_URLS[0]]
+
+    parsed.clear()
+    with MapMaker.with_cache(tmp_path, offline=True) as map_maker:
+        assert map_maker._features_from_links(links) == first
+    assert parsed == []
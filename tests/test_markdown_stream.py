@@ -0,0 +1,90 @@
+import pytest
+
+from trip_planner import markdown_stream
+from trip_planner.document_parser import Link
+
+
+def _links(tmp_path, text: str) -> list[Link]:
+    path = tmp_path / "trip.md"
+    path.write_text(text, encoding="utf-8")
+    return list(markdown_stream.iter_links_with_headings(path))
+
+
+def test_headings(tmp_path):
+    links = _links(
+        tmp_path,
+        "[Before](https://goo.gl/maps/a)\n"
+        "# Day 1 #\n"
+        "- [Himeji *Castle*](https://goo.gl/maps/b)\n"
+        "## Osaka\n"
+        'Lunch at [Kuromon](https://goo.gl/maps/c "market") then\n'
+        "## Kyoto\n"
+        "### [Station](https://goo.gl/maps/d)\n"
+        "Day 2\n"
+        "=====\n"
+        "Nara\n"
+        "----\n"
+        "<https://goo.gl/maps/e>\n",
+    )
+
+    assert links == [
+        Link(address="https://goo.gl/maps/a", text="Before", headings=[]),
+        Link(address="https://goo.gl/maps/b", text="Himeji Castle", headings=["Day 1"]),
+        Link(
+            address="https://goo.gl/maps/c",
+            text="Kuromon",
+            headings=["Day 1", "Osaka"],
+        ),
+        Link(
+            address="https://goo.gl/maps/d",
+            text="Station",
+            headings=["Day 1", "Kyoto", "Station"],
+        ),
+        Link(
+            address="https://goo.gl/maps/e",
+            text="https://goo.gl/maps/e",
+            headings=["Day 2", "Nara"],
+        ),
+    ]
+
+
+@pytest.mark.parametrize(
+    "text, addresses",
+    [
+        ("See https://goo.gl/maps/a.\n", ["https://goo.gl/maps/a"]),
+        ("(https://goo.gl/maps/a)\n", ["https://goo.gl/maps/a"]),
+        ("[A](<https://goo.gl/maps/a b>)\n", ["https://goo.gl/maps/a b"]),
+        (
+            "[A](https://maps.google.com/?q=(1,2))\n",
+            ["https://maps.google.com/?q=(1,2)"],
+        ),
+        ("![Photo](https://example.com/a.jpg)\n", []),
+        ("`https://goo.gl/maps/a`\n", []),
+        ("```\n[A](https://goo.gl/maps/a)\n```\n", []),
+        ("~~~~\n```\n[A](https://goo.gl/maps/a)\n~~~~\n", []),
+        (
+            "[A](https://goo.gl/maps/a) and [B](https://goo.gl/maps/b)\n",
+            ["https://goo.gl/maps/a", "https://goo.gl/maps/b"],
+        ),
+    ],
+)
+def test_links(tmp_path, text, addresses):
+    assert [link.address for link in _links(tmp_path, text)] == addresses
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "- [A](https://goo.gl/maps/a)\n---\n",
+        "> [A](https://goo.gl/maps/a)\n---\n",
+        "\n---\n[A](https://goo.gl/maps/a)\n",
+    ],
+)
+def test_thematic_breaks_are_not_headings(tmp_path, text):
+    (link,) = _links(tmp_path, text)
+    assert link.headings == []
+
+
+def test_unfinished_paragraph(tmp_path):
+    (link,) = _links(tmp_path, "# Day 1\r\n[A](https://goo.gl/maps/a)")
+    assert link == Link(address="https://goo.gl/maps/a", text="A", headings=["Day 1"])
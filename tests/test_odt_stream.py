@@ -0,0 +1,83 @@
+import xml.etree.ElementTree as ET
+import zipfile
+
+from trip_planner import odt_stream
+from trip_planner.document_parser import Link
+
+CONTENT = """<?xml version="1.0" encoding="UTF-8"?>
+<office:document-content
+    xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0"
+    xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0"
+    xmlns:table="urn:oasis:names:tc:opendocument:xmlns:table:1.0"
+    xmlns:xlink="http://www.w3.org/1999/xlink">
+  <office:body>
+    <office:text>
+      <text:p><text:a xlink:href="https://goo.gl/maps/a">Before</text:a></text:p>
+      <text:h text:outline-level="1">Day<text:s/>1<text:note><text:note-body>
+        <text:p>A footnote</text:p></text:note-body></text:note></text:h>
+      <text:list><text:list-item><text:p>
+        <text:a xlink:href="https://goo.gl/maps/b"><text:span>Himeji</text:span
+        ><text:s text:c="2"/>Castle</text:a>
+      </text:p></text:list-item></text:list>
+      <text:h text:outline-level="2">Osaka</text:h>
+      <table:table><table:table-row><table:table-cell><text:p>
+        <text:a xlink:href="https://goo.gl/maps/c">Kaiyukan</text:a>
+      </text:p></table:table-cell></table:table-row></table:table>
+      <text:h text:outline-level="2"><text:a xlink:href="https://goo.gl/maps/d"
+        >Kyoto</text:a> Station</text:h>
+      <text:h>Day 2</text:h>
+      <text:p><text:a xlink:href="https://goo.gl/maps/e">Nara</text:a></text:p>
+    </office:text>
+  </office:body>
+</office:document-content>
+"""
+
+
+def _write_odt(path, content):
+    with zipfile.ZipFile(path, "w") as package:
+        package.writestr("mimetype", "application/vnd.oasis.opendocument.text")
+        package.writestr("content.xml", content)
+
+
+def test_headings(tmp_path):
+    path = tmp_path / "trip.odt"
+    _write_odt(path, CONTENT)
+
+    assert list(odt_stream.iter_links_with_headings(path)) == [
+        Link(address="https://goo.gl/maps/a", text="Before", headings=[]),
+        Link(
+            address="https://goo.gl/maps/b",
+            text="Himeji  Castle",
+            headings=["Day 1"],
+        ),
+        Link(
+            address="https://goo.gl/maps/c",
+            text="Kaiyukan",
+            headings=["Day 1", "Osaka"],
+        ),
+        Link(
+            address="https://goo.gl/maps/d",
+            text="Kyoto",
+            headings=["Day 1", "Kyoto Station"],
+        ),
+        Link(address="https://goo.gl/maps/e", text="Nara", headings=["Day 2"]),
+    ]
+
+
+def test_finished_content_is_dropped(tmp_path, monkeypatch):
+    roots: list[ET.Element] = []
+    iterparse = ET.iterparse
+
+    def _spy(source, events=None):
+        for event, element in iterparse(source, events):
+            if not roots:
+                roots.append(element)
+            yield event, element
+
+    monkeypatch.setattr(ET, "iterparse", _spy)
+    path = tmp_path / "trip.odt"
+    _write_odt(path, CONTENT)
+
+    assert len(list(odt_stream.iter_links_with_headings(path))) == 5
+    [root] = roots
+    assert len(root) == 0
@@ -0,0 +1,142 @@
+import time
+
+import diskcache
+import pytest
+
+from trip_planner.link_index import Indexed, LinkIndex, Location
+from trip_planner.resolver_cache import Failure, ResolverCache
+
+HIMEJI = Location(kind="Place", coords=((134.6939047, 34.839449),))
+
+
+@pytest.fixture
+def disk(tmp_path):
+    with diskcache.Cache(directory=str(tmp_path / "diskcache")) as cache:
+        yield cache
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = LinkIndex(tmp_path / "links.sqlite3")
+    yield index
+    index.close()
+
+
+def test_memory_hits_skip_the_disk(index):
+    cache = ResolverCache(index)
+    cache.set("a", "long-a")
+
+    assert cache.get("a") == "long-a"
+    assert cache.counters.memory_hits == 1
+    assert cache.counters.disk_hits == 0
+
+
+def test_disk_hits_survive_a_new_cache(index):
+    ResolverCache(index).set("a", "long-a")
+    cache = ResolverCache(index)
+
+    assert cache.get("a") == "long-a"
+    assert cache.get("a") == "long-a"
+    assert (cache.counters.disk_hits, cache.counters.memory_hits) == (1, 1)
+
+
+def test_lru_evicts_least_recently_used(index):
+    cache = ResolverCache(index, memory_size=2)
+    cache.set("a", "long-a")
+    cache.set("b", "long-b")
+    cache.get("a")
+    cache.set("c", "long-c")
+
+    assert cache.counters.evictions == 1
+    # "b" was evicted from memory but is still on disk.
+    assert cache.get("b") == "long-b"
+    assert cache.counters.disk_hits == 1
+
+
+def test_lookup_counts_each_link_once(index, monkeypatch):
+    ResolverCache(index).set("a", "long-a")
+    index.store_locations({"long-a": HIMEJI})
+    cache = ResolverCache(index)
+    cache.set("b", Failure(reason="404"))
+
+    assert cache.lookup(["a", "b", "c", "a"]) == {
+        "a": Indexed("long-a", HIMEJI),
+        "b": Indexed(Failure(reason="404")),
+    }
+    counters = cache.counters
+    assert (counters.memory_hits, counters.disk_hits, counters.misses) == (1, 1, 1)
+    assert counters.negative_hits == 1
+
+    # Everything found is now in memory, so the index is only asked about "c".
+    queried: list[list[str]] = []
+    lookup = index.lookup
+
+    def _spy(urls):
+        queried.append(list(urls))
+        return lookup(urls)
+
+    monkeypatch.setattr(index, "lookup", _spy)
+    assert cache.lookup(["a", "b", "c"])["a"] == Indexed("long-a", HIMEJI)
+    assert queried == [["c"]]
+    assert (counters.memory_hits, counters.disk_hits, counters.misses) == (3, 1, 2)
+
+
+def test_lookup_finds_locations_in_memory(index, monkeypatch):
+    cache = ResolverCache(index)
+    cache.set("a", "long-a")
+    cache.store_locations({"long-a": HIMEJI})
+    monkeypatch.setattr(index, "lookup", None)
+
+    assert cache.lookup(["a"], ["long-a"]) == {
+        "a": Indexed("long-a", HIMEJI),
+        "long-a": Indexed(location=HIMEJI),
+    }
+    assert cache.counters.memory_hits == 1
+
+
+@pytest.mark.parametrize(
+    "entry, ttl, negative_ttl",
+    [
+        ("long-a", 0.05, 60.0),
+        (Failure(reason="404"), None, 0.05),
+    ],
+)
+def test_entries_expire(index, entry, ttl, negative_ttl):
+    cache = ResolverCache(index, ttl=ttl, negative_ttl=negative_ttl)
+    cache.set("a", entry)
+    assert cache.get("a") == entry
+
+    time.sleep(0.1)
+
+    assert cache.get("a") is None
+    assert cache.counters.misses == 1
+
+
+def test_failures_count_as_negative_hits(index):
+    cache = ResolverCache(index)
+    cache.set("a", Failure(reason="404"))
+
+    assert cache.get("a") == Failure(reason="404")
+    assert cache.counters.negative_hits == 1
+
+
+def test_diskcache_entries_are_migrated_once(disk, index):
+    disk.set(("trip_planner.trip_planner.resolve_maps_link", "a", None), "old-a")
+    disk.set(("trip_planner.trip_planner.resolve_maps_link", "b", None), "long-b")
+    disk.set(("resolve", "a"), "long-a")
+    disk.set(("resolve", "c"), Failure(reason="404"))
+    disk.set(("manifest", "map.kml"), "kept")
+
+    cache = ResolverCache(index)
+    assert cache.migrate(disk) == 3
+
+    assert [cache.get(url) for url in "abc"] == [
+        "long-a",
+        "long-b",
+        Failure(reason="404"),
+    ]
+    assert list(disk.iterkeys()) == [("manifest", "map.kml")]
+
+    disk.set(("resolve", "d"), "long-d")
+    assert cache.migrate(disk) == 0
+    assert cache.get("d") is None
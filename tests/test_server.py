@@ -0,0 +1,123 @@
+import concurrent.futures
+import io
+import threading
+import zipfile
+
+import httpx
+import pytest
+
+from support.docx_factory import Heading, Hyperlink, write_document
+from tests.test_link_resolver import PLACE_URLS
+from trip_planner import link_resolver, server, stats
+from trip_planner.trip_planner import DocumentParser, MapMaker
+
+
+@pytest.fixture
+def service(tmp_path, redirect_server):
+    with (
+        link_resolver.PooledResolver(transport=redirect_server.transport()) as resolver,
+        MapMaker.with_cache(tmp_path / "cache", resolver=resolver) as map_maker,
+        server.make_server(
+            server.ConversionApp(map_maker, DocumentParser.Stream, max_upload=100_000),
+            port=0,
+        ) as http_server,
+    ):
+        thread = threading.Thread(target=http_server.serve_forever, daemon=True)
+        thread.start()
+        yield f"http://{server.DEFAULT_HOST}:{http_server.server_port}"
+        http_server.shutdown()
+
+
+@pytest.fixture
+def document(tmp_path, redirect_server):
+    redirect_server.add("https://goo.gl/maps/nara", PLACE_URLS[1])
+    path = write_document(
+        tmp_path / "trip.docx",
+        [
+            Heading(1, "Day 1"),
+            Hyperlink("Himeji Castle", PLACE_URLS[0]),
+            Hyperlink("Nara Park", "https://goo.gl/maps/nara"),
+        ],
+    )
+    return path.read_bytes()
+
+
+def test_convert_to_kml(service, document):
+    response = httpx.post(f"{service}/convert", content=document)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == server.CONTENT_TYPES["kml"]
+    assert "Himeji Castle" in response.text
+    assert "Nara Park" in response.text
+
+
+def test_convert_to_kmz(service, document):
+    response = httpx.post(f"{service}/convert?format=kmz", content=document)
+
+    assert response.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(response.content)) as kmz:
+        assert "Nara Park" in kmz.read("doc.kml").decode()
+
+
+def test_convert_markdown(service):
+    document = f"# Day 1\n\n[Himeji Castle]({PLACE_URLS[0]})\n"
+    response = httpx.post(f"{service}/convert?input=md", content=document.encode())
+
+    assert response.status_code == 200
+    assert "Himeji Castle" in response.text
+
+
+def test_concurrent_conversions(service, document):
+    with concurrent.futures.ThreadPoolExecutor(8) as executor:
+        responses = list(
+            executor.map(
+                lambda _: httpx.post(f"{service}/convert", content=document),
+                range(16),
+            )
+        )
+
+    assert {response.status_code for response in responses} == {200}
+    assert len({response.text for response in responses}) == 1
+
+
+@pytest.mark.parametrize(
+    "method, path, content, status",
+    [
+        ("GET", "/convert", None, 405),
+        ("POST", "/other", b"x", 404),
+        ("POST", "/convert", None, 400),
+        ("POST", "/convert", b"not a document", 400),
+        ("POST", "/convert?format=gpx", b"x", 400),
+        ("POST", "/convert?input=pdf", b"x", 400),
+        ("POST", "/convert?input=odt", b"not a document", 400),
+        ("POST", "/convert", b"x" * 100_001, 413),
+    ],
+)
+def test_bad_requests(service, method, path, content, status):
+    response = httpx.request(method, f"{service}{path}", content=content)
+
+    assert response.status_code == status
+
+
+def test_requests_do_not_accumulate_statistics(tmp_path, redirect_server, document):
+    with (
+        link_resolver.PooledResolver(transport=redirect_server.transport()) as resolver,
+        MapMaker.with_cache(tmp_path / "cache", resolver=resolver) as map_maker,
+    ):
+        app = server.ConversionApp(map_maker, DocumentParser.Stream)
+        with httpx.Client(transport=httpx.WSGITransport(app=app)) as client:
+            for _ in range(2):
+                response = client.post("http://test/convert", content=document)
+                assert response.status_code == 200
+
+        assert map_maker.run_stats == stats.RunStats()
+
+
+def test_links_without_a_location_are_dropped(service):
+    no_coordinates = "https://www.google.com/maps/place/Tokyo+Tower"
+    document = f"[Himeji Castle]({PLACE_URLS[0]})\n[Tokyo Tower]({no_coordinates})\n"
+    response = httpx.post(f"{service}/convert?input=md", content=document.encode())
+
+    assert response.status_code == 200
+    assert "Himeji Castle" in response.text
+    assert "Tokyo Tower" not in response.text
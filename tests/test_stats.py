@@ -0,0 +1,35 @@
+import pytest
+
+from trip_planner.stats import RunStats
+
+
+def test_phases_accumulate():
+    stats = RunStats()
+    with stats.phase("resolve"):
+        pass
+    first = stats.phases["resolve"]
+    with stats.phase("resolve"):
+        pass
+    assert stats.phases["resolve"] >= first
+
+
+def test_latency_percentiles():
+    stats = RunStats(latencies=[i / 100 for i in range(1, 101)])
+    percentiles = stats.latency_percentiles()
+    assert percentiles["p50"] == pytest.approx(0.505)
+    assert percentiles["p99"] == pytest.approx(0.9901)
+    assert percentiles["max"] == 1.0
+
+
+@pytest.mark.parametrize(
+    ("latencies", "expected"),
+    [([], {}), ([0.5], {"p50": 0.5, "p90": 0.5, "p99": 0.5, "max": 0.5})],
+)
+def test_latency_percentiles_few_samples(latencies, expected):
+    assert RunStats(latencies=latencies).latency_percentiles() == expected
+
+
+def test_as_dict():
+    stats = RunStats(links_seen=5, links_kept=3, cache_hits=1, cache_misses=2)
+    assert stats.as_dict()["links"] == {"seen": 5, "kept": 3, "dropped": 2}
+    assert stats.as_dict()["cache"] == {"hits": 1, "misses": 2}
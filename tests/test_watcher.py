@@ -0,0 +1,77 @@
+import os
+
+import pytest
+
+from trip_planner.watcher import Watcher
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _save(path, mtime_ns, content=b"saved"):
+    path.write_bytes(content)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def test_unchanged_files_are_not_reported(tmp_path, clock):
+    document = tmp_path / "trip.docx"
+    _save(document, 1_000)
+    watcher = Watcher([document], debounce=0.5, clock=clock)
+
+    clock.now = 10.0
+    assert watcher.poll() == []
+
+
+def test_changes_are_reported_once_settled(tmp_path, clock):
+    document = tmp_path / "trip.docx"
+    _save(document, 1_000)
+    watcher = Watcher([document], debounce=0.5, clock=clock)
+
+    _save(document, 2_000)
+    assert watcher.poll() == []
+    clock.now = 0.3
+    # Still being written, so the debounce restarts.
+    _save(document, 3_000, b"saved again")
+    assert watcher.poll() == []
+    clock.now = 0.6
+    assert watcher.poll() == []
+    clock.now = 0.8
+    assert watcher.poll() == [document]
+    clock.now = 2.0
+    assert watcher.poll() == []
+
+
+def test_only_changed_files_are_reported(tmp_path, clock):
+    documents = [tmp_path / "a.docx", tmp_path / "b.docx"]
+    for document in documents:
+        _save(document, 1_000)
+    watcher = Watcher(documents, debounce=0.0, clock=clock)
+
+    _save(documents[1], 2_000)
+
+    assert watcher.poll() == []
+    assert watcher.poll() == [documents[1]]
+
+
+def test_deleted_files_are_reported_when_recreated(tmp_path, clock):
+    document = tmp_path / "trip.docx"
+    _save(document, 1_000)
+    watcher = Watcher([document], debounce=0.0, clock=clock)
+
+    document.unlink()
+    assert watcher.poll() == []
+    assert watcher.poll() == []
+
+    _save(document, 2_000)
+    assert watcher.poll() == []
+    assert watcher.poll() == [document]